@@ -2,13 +2,21 @@ import streamlit as st
 import os
 from pathlib import Path
 import time
-from datetime import datetime, timedelta
+import itertools
+from datetime import datetime
 import uuid
-import glob
 
 from config import Config
 from utils.document_processor import DocumentProcessor
-from utils.ai_summarizer import AISummarizer
+from utils.ai_summarizer import AISummarizer, run_analysis
+from utils.extraction_cache import ExtractionCache
+from utils.qa_index import QAIndexStore
+from utils.batch_processor import BatchProcessor
+from utils.token_budget import count_tokens
+from utils.conversion_jobs import ConversionJobManager, get_job_manager
+from utils.file_store import get_file_store
+from utils.warmup import start_warmup
+from utils import metrics
 
 
 # Page configuration
@@ -134,13 +142,31 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+Config.ensure_directories()
+
+# Shared across sessions and reruns; entries persist on disk between restarts
+extraction_cache = ExtractionCache()
+qa_indexes = QAIndexStore()
+
+# Uploads and outputs are indexed, bounded in size and expired by a background sweeper
+file_store = get_file_store()
+file_store.start_sweeper()
+
+# PDF, conversion and OpenAI libraries load on first use; import them in the background meanwhile
+if Config.WARMUP_ENABLED:
+    start_warmup()
+
+# Prometheus metrics exporter; a no-op after the first script run in this process
+if Config.METRICS_ENABLED:
+    metrics.start_metrics_server()
+
 
 def initialize_session_state():
     """Initialize session state variables"""
-    if 'uploaded_file_path' not in st.session_state:
-        st.session_state.uploaded_file_path = None
     if 'extracted_text' not in st.session_state:
         st.session_state.extracted_text = None
+    if 'document_hash' not in st.session_state:
+        st.session_state.document_hash = None
     if 'summary' not in st.session_state:
         st.session_state.summary = None
     if 'document_info' not in st.session_state:
@@ -151,54 +177,40 @@ def initialize_session_state():
     # Track uploaded files for cleanup
     if 'uploaded_files' not in st.session_state:
         st.session_state.uploaded_files = []
+    # Background PDF→DOCX job shown in the Convert tab
+    if 'conversion_job_id' not in st.session_state:
+        st.session_state.conversion_job_id = None
+    # Result rows of the last batch run, kept for the download buttons
+    if 'batch_results' not in st.session_state:
+        st.session_state.batch_results = None
+    # Token counts of analyzed texts, so the cost estimate is not recounted on every rerun
+    if 'token_counts' not in st.session_state:
+        st.session_state.token_counts = {}
 
 
-def cleanup_old_files(max_age_hours: int = 24):
+def save_uploaded_file(uploaded_file, content_hash: str = None):
     """
-    Clean up temporary files older than specified hours.
-    This prevents disk space from filling up with old uploads.
+    Save uploaded file to disk under a content-addressed name.
+    Identical uploads map to the same file, so reruns and other sessions
+    reuse the existing copy instead of writing a new one. Only needed where
+    a path is required (PDF conversion); text is extracted from memory.
     """
     try:
-        cutoff_time = datetime.now() - timedelta(hours=max_age_hours)
-        
-        # Clean upload folder
-        for folder in [Config.UPLOAD_FOLDER, Config.OUTPUT_FOLDER]:
-            if os.path.exists(folder):
-                for file_path in glob.glob(os.path.join(folder, '*')):
-                    if os.path.isfile(file_path):
-                        file_modified = datetime.fromtimestamp(os.path.getmtime(file_path))
-                        if file_modified < cutoff_time:
-                            try:
-                                os.remove(file_path)
-                            except Exception:
-                                pass  # Ignore errors for files in use
-    except Exception:
-        pass  # Don't crash app if cleanup fails
-
-
-def save_uploaded_file(uploaded_file):
-    """
-    Save uploaded file to disk with unique naming to support multiple users.
-    Uses session ID and UUID to prevent file collisions.
-    """
-    try:
-        # Generate unique filename using session ID and UUID
-        session_id = st.session_state.get('session_id', str(uuid.uuid4())[:8])
-        unique_id = str(uuid.uuid4())[:8]
-        
-        # Parse original filename
-        original_name = uploaded_file.name
-        name_parts = os.path.splitext(original_name)
+        if content_hash is None:
+            content_hash = ExtractionCache.hash_content(uploaded_file.getbuffer())
         
-        # Create unique filename: originalname_sessionid_uniqueid.extension
-        unique_filename = f"{name_parts[0]}_{session_id}_{unique_id}{name_parts[1]}"
+        # Create content-addressed filename: hash.extension
+        extension = os.path.splitext(uploaded_file.name)[1]
+        file_path = os.path.join(Config.UPLOAD_FOLDER, f"{content_hash}{extension}")
         
-        file_path = os.path.join(Config.UPLOAD_FOLDER, unique_filename)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        if not os.path.exists(file_path):
+            with open(file_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
         
-        # Track file for potential cleanup
-        st.session_state.uploaded_files.append(file_path)
+        # Owned by this session, and released when it ends
+        if file_path not in st.session_state.uploaded_files:
+            st.session_state.uploaded_files.append(file_path)
+        file_store.add(file_path, st.session_state.session_id)
         
         return file_path
     except Exception as e:
@@ -206,11 +218,54 @@ def save_uploaded_file(uploaded_file):
         return None
 
 
+def render_summary_card(placeholder, summary_text: str):
+    """Render summary text inside the styled card, replacing the placeholder content"""
+    placeholder.markdown(f"""
+    <div class="custom-card">
+        {summary_text}
+    </div>
+    """, unsafe_allow_html=True)
+
+
+def get_active_text():
+    """
+    Return the text to analyze: pasted text if present, otherwise the
+    uploaded document's text loaded from the extraction cache on demand.
+    """
+    if st.session_state.extracted_text:
+        return st.session_state.extracted_text
+    if st.session_state.document_hash:
+        text = extraction_cache.get_text(st.session_state.document_hash)
+        if text:
+            return text.strip()
+    return None
+
+
+def get_active_hash():
+    """Content hash of the active text, which keys its Q&A index"""
+    if st.session_state.extracted_text:
+        return ExtractionCache.hash_content(st.session_state.extracted_text.encode('utf-8'))
+    return st.session_state.document_hash
+
+
+def get_active_token_count():
+    """Token count of the active text, counted once per document"""
+    key = hash(st.session_state.extracted_text) if st.session_state.extracted_text else st.session_state.document_hash
+    if key not in st.session_state.token_counts:
+        st.session_state.token_counts[key] = count_tokens(get_active_text() or '')
+    return st.session_state.token_counts[key]
+
+
+def profile_requested() -> bool:
+    """Whether this request should be profiled (open the app with ?profile=1)"""
+    return st.experimental_get_query_params().get('profile', ['0'])[0] == '1'
+
+
 def main():
     initialize_session_state()
     
-    # Clean up old temporary files (runs once per session)
-    cleanup_old_files(max_age_hours=24)
+    # Keeps this session's files alive; cleanup itself runs in the background sweeper
+    file_store.heartbeat(st.session_state.session_id)
     
     # Header
     col1, col2 = st.columns([3, 1])
@@ -226,7 +281,7 @@ def main():
         
         # API Key input
         api_key = Config.OPENAI_API_KEY or ""
-
+        
         st.markdown("---")
         
         # Summary type selection
@@ -258,10 +313,17 @@ def main():
             help="Maximum length of the summary"
         )
         
-        st.markdown("---")
+        # Key points run concurrently with the summary
+        include_key_points = st.checkbox(
+            "Also extract key points",
+            value=False,
+            help="Extract key points in parallel with the summary"
+        )
         
+        st.markdown("---")
+    
     # Main content
-    tab1, tab2 = st.tabs(["📤 Upload & Analyze", "🔄 Convert PDF to DOCX"])
+    tab1, tab2, tab3 = st.tabs(["📤 Upload & Analyze", "🔄 Convert PDF to DOCX", "📚 Batch Process"])
     
     with tab1:
         st.markdown("### 📝 Analyze Your Document or Text")
@@ -280,20 +342,30 @@ def main():
             )
             
             if uploaded_file:
-                # Save file
-                file_path = save_uploaded_file(uploaded_file)
+                file_extension = Path(uploaded_file.name).suffix
+                content_hash = ExtractionCache.hash_content(uploaded_file.getbuffer())
+                doc_info = extraction_cache.get_info(content_hash)
+                
+                if doc_info is None:
+                    # New content: parse the upload buffer in place and stream the text into the cache
+                    with st.spinner("🔍 Extracting text from document..."), \
+                            metrics.profiled('extract', enabled=profile_requested()):
+                        try:
+                            # Cheap pypdf open for page count and metadata; text is streamed separately
+                            doc_info = extraction_cache.extract(uploaded_file, file_extension, content_hash)
+                        except Exception as e:
+                            st.error(f"❌ Error extracting text: {str(e)}")
                 
-                if file_path:
-                    st.session_state.uploaded_file_path = file_path
-                    file_extension = Path(uploaded_file.name).suffix
+                if doc_info:
+                    doc_info = dict(doc_info, file_name=uploaded_file.name)
+                    st.session_state.document_info = doc_info
+                    # Only the content hash is kept per session; the text stays in the cache
+                    st.session_state.document_hash = content_hash
+                    st.session_state.extracted_text = None
                     
                     # Display file info
                     col1, col2, col3 = st.columns(3)
                     
-                    # Get document info
-                    doc_info = DocumentProcessor.get_document_info(file_path, file_extension)
-                    st.session_state.document_info = doc_info
-                    
                     with col1:
                         st.metric("File Name", doc_info['file_name'])
                     with col2:
@@ -306,27 +378,30 @@ def main():
                     
                     st.markdown("---")
                     
-                    # Extract text
-                    with st.spinner("🔍 Extracting text from document..."):
-                        try:
-                            extracted_text = DocumentProcessor.extract_text(file_path, file_extension)
-                            st.session_state.extracted_text = extracted_text
-                            
-                            # Display text preview
-                            with st.expander("📖 Document Preview", expanded=False):
-                                st.text_area(
-                                    "Extracted Text",
-                                    extracted_text[:2000] + ("..." if len(extracted_text) > 2000 else ""),
-                                    height=300,
-                                    disabled=True,
-                                    key="preview_uploaded"
-                                )
-                                st.caption(f"Total characters: {len(extracted_text):,}")
-                            
-                            st.success("✅ Text extracted successfully!")
-                            
-                        except Exception as e:
-                            st.error(f"❌ Error extracting text: {str(e)}")
+                    # Display text preview
+                    with st.expander("📖 Document Preview", expanded=False):
+                        char_count = doc_info.get('char_count', 0)
+                        preview = DocumentProcessor.preview_text(
+                            extraction_cache.text_path(content_hash), 'txt', max_chars=2000
+                        )
+                        st.text_area(
+                            "Extracted Text",
+                            preview + ("..." if char_count > 2000 else ""),
+                            height=300,
+                            disabled=True,
+                            key="preview_uploaded"
+                        )
+                        st.caption(f"Total characters: {char_count:,}")
+                    
+                    st.success("✅ Text extracted successfully!")
+                    if doc_info.get('pages_reused'):
+                        st.caption(f"♻️ {doc_info['pages_reused']} of {doc_info['page_count']} pages were unchanged "
+                                   f"from an earlier upload and not extracted again")
+                    engine_pages = doc_info.get('extraction', {}).get('pages', {})
+                    if any(engine_pages.values()):
+                        st.caption("📄 Text engines: " + ", ".join(
+                            f"{engine} {count} page{'s' if count != 1 else ''}"
+                            for engine, count in engine_pages.items() if count))
         
         with input_tab2:
             st.markdown("**Enter or paste your text directly**")
@@ -363,56 +438,107 @@ def main():
         st.markdown("---")
         
         # Summarize button (works for both upload and pasted text)
-        if st.session_state.extracted_text:
+        if st.session_state.extracted_text or st.session_state.document_hash:
+            # Pre-flight estimate, computed locally before anything is sent
+            estimate = AISummarizer.estimate_cost(
+                get_active_token_count(),
+                summary_type=summary_type,
+                max_tokens=max_tokens,
+                language=language,
+                include_key_points=include_key_points
+            )
+            st.caption(
+                f"💰 Estimated cost: up to ${estimate['cost_usd']:.4f} "
+                f"({estimate['input_tokens']:,} input tokens, {estimate['requests']} request(s))"
+            )
+            if not estimate['fits']:
+                if Config.INPUT_POLICY == 'reject':
+                    st.warning(f"⚠️ This document is over the {Config.MAX_PROMPT_TOKENS:,}-token prompt budget and will be rejected")
+                elif Config.INPUT_POLICY == 'truncate':
+                    st.info(f"ℹ️ This document is over the {Config.MAX_PROMPT_TOKENS:,}-token prompt budget; only its beginning and end will be sent")
+                else:
+                    st.info(f"ℹ️ This document is over the {Config.MAX_PROMPT_TOKENS:,}-token prompt budget; its most representative sections will be sent")
+            
             if st.button("🤖 Generate AI Summary", type="primary", use_container_width=True):
                 if not api_key:
                     st.error("⚠️ Please provide an OpenAI API key in the sidebar")
                 else:
-                    with st.spinner("🧠 AI is analyzing your document..."):
+                    with metrics.profiled('summarize', enabled=profile_requested()):
                         try:
-                            summarizer = AISummarizer(api_key=api_key)
+                            summarizer = AISummarizer(api_key=api_key, session_id=st.session_state.session_id)
                             
-                            # Progress bar for effect
-                            progress_bar = st.progress(0)
-                            for i in range(100):
-                                time.sleep(0.01)
-                                progress_bar.progress(i + 1)
+                            # Display summary header up front so streamed text lands below it
+                            st.markdown("### 📋 Summary")
+                            col_a, col_b = st.columns(2)
+                            with col_a:
+                                st.markdown(f"**Type:** {summary_type.replace('_', ' ').title()}")
+                            with col_b:
+                                lang_display = {
+                                    'en': '🇬🇧 English',
+                                    'km': '🇰🇭 ខ្មែរ (Khmer)',
+                                    'both': '🌐 Both Languages'
+                                }.get(language, 'English')
+                                st.markdown(f"**Language:** {lang_display}")
                             
-                            result = summarizer.summarize(
-                                st.session_state.extracted_text,
-                                summary_type=summary_type,
-                                max_tokens=max_tokens,
-                                language=language
-                            )
+                            summary_placeholder = st.empty()
+                            
+                            key_points_result = None
+                            result = None
+                            if include_key_points:
+                                # Summary and key points are requested concurrently
+                                with st.spinner("🧠 AI is analyzing your document..."):
+                                    analysis = run_analysis(
+                                        get_active_text(),
+                                        api_key=api_key,
+                                        session_id=st.session_state.session_id,
+                                        summary_types=[summary_type],
+                                        max_tokens=max_tokens,
+                                        language=language
+                                    )
+                                result = analysis['summaries'][summary_type]
+                                key_points_result = analysis['key_points']
+                            else:
+                                # Render tokens as they arrive
+                                streamed = ""
+                                with st.spinner("🧠 AI is analyzing your document..."):
+                                    events = summarizer.summarize_stream(
+                                        get_active_text(),
+                                        summary_type=summary_type,
+                                        max_tokens=max_tokens,
+                                        language=language
+                                    )
+                                    first_event = next(events)
+                                for event in itertools.chain([first_event], events):
+                                    if event['type'] == 'delta':
+                                        streamed += event['text']
+                                        render_summary_card(summary_placeholder, streamed + " ▌")
+                                    else:
+                                        result = event['result']
                             
                             if result['success']:
                                 st.session_state.summary = result
-                                
-                                # Display summary
-                                st.markdown("### 📋 Summary")
-                                col_a, col_b = st.columns(2)
-                                with col_a:
-                                    st.markdown(f"**Type:** {result['summary_type'].replace('_', ' ').title()}")
-                                with col_b:
-                                    lang_display = {
-                                        'en': '🇬🇧 English',
-                                        'km': '🇰🇭 ខ្មែរ (Khmer)',
-                                        'both': '🌐 Both Languages'
-                                    }.get(result.get('language', 'en'), 'English')
-                                    st.markdown(f"**Language:** {lang_display}")
-                                
-                                summary_container = st.container()
-                                with summary_container:
-                                    st.markdown(f"""
-                                    <div class="custom-card">
-                                        {result['summary']}
-                                    </div>
-                                    """, unsafe_allow_html=True)
+                                render_summary_card(summary_placeholder, result['summary'])
                                 
                                 # Metadata
                                 col1, col2 = st.columns(2)
                                 with col1:
                                     st.metric("Tokens Used", result['tokens_used'])
+                                    if result.get('cached'):
+                                        st.caption("⚡ Served from cache, no new tokens spent")
+                                    if result.get('compression'):
+                                        compression = result['compression']
+                                        st.caption(f"🗜️ Compressed locally from {compression['original_tokens']:,} to "
+                                                   f"{compression['compressed_tokens']:,} tokens (headers, footers and "
+                                                   f"duplicate paragraphs removed)")
+                                    if result.get('input_policy'):
+                                        st.caption(f"✂️ Sent {result['sent_tokens']:,} of {result['input_tokens']:,} "
+                                                   f"document tokens ({result['input_policy']} policy)")
+                                if result.get('chunks'):
+                                    with col2:
+                                        st.metric("Sections Summarized", result['chunks'])
+                                        if result.get('chunks_reused'):
+                                            st.caption(f"♻️ {result['chunks_reused']} unchanged sections reused; "
+                                                       f"only the rest and the final combine were re-run")
                                 # with col2:
                                 #     st.metric("Model", result['model'])
                                 
@@ -424,11 +550,61 @@ def main():
                                     mime="text/plain"
                                 )
                                 
+                                if key_points_result:
+                                    st.markdown("### 🔑 Key Points")
+                                    if key_points_result['success']:
+                                        st.markdown(key_points_result['key_points'])
+                                    else:
+                                        st.error(f"❌ {key_points_result['error']}")
+                            
                             else:
+                                summary_placeholder.empty()
                                 st.error(f"❌ {result['error']}")
-                            
+                        
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
+            
+            # Questions are answered from a few retrieved passages, never the whole document
+            st.markdown("---")
+            st.markdown("### 💬 Ask the Document")
+            question = st.text_input(
+                "Your question",
+                placeholder="e.g. When can either party terminate the contract?",
+                key="qa_question"
+            )
+            if question and st.button("🔎 Ask", use_container_width=True):
+                if not api_key:
+                    st.error("⚠️ Please provide an OpenAI API key in the sidebar")
+                else:
+                    try:
+                        summarizer = AISummarizer(api_key=api_key, session_id=st.session_state.session_id)
+                        embed = summarizer.embed if Config.QA_EMBEDDINGS_ENABLED else None
+                        with st.spinner("🔎 Searching the document..."):
+                            # Built once per document, then reused for every follow-up question
+                            index, _ = qa_indexes.get(get_active_hash(), get_active_text, embed)
+                            passages = []
+                            if index is not None:
+                                query_vector = embed([question])[0] if embed and index.vectors is not None else None
+                                passages = index.search(question, query_vector=query_vector)
+                        
+                        if not passages:
+                            st.warning("🤷 No part of the document matches this question; try other wording")
+                        else:
+                            with st.spinner("🧠 Answering..."):
+                                answer = summarizer.answer(question, [passage['text'] for passage in passages],
+                                                           language=language)
+                            if answer['success']:
+                                st.markdown(answer['answer'])
+                                st.caption(f"Answered from {len(passages)} passages "
+                                           f"({answer['tokens_used']:,} tokens)")
+                                with st.expander("📚 Sources"):
+                                    for number, passage in enumerate(passages, start=1):
+                                        st.markdown(f"**[{number}]** {passage['text']}")
+                            else:
+                                st.error(f"❌ {answer['error']}")
+                    
+                    except Exception as e:
+                        st.error(f"❌ Error: {str(e)}")
         else:
             st.info("👆 Please either **upload a file** or **paste text** above to get started!")
     
@@ -442,38 +618,172 @@ def main():
             help="Upload a PDF file to convert to DOCX format"
         )
         
-        if pdf_file:
+        submitted = False
+        if pdf_file and st.button("🔄 Convert to DOCX", type="primary", use_container_width=True):
+            # pdf2docx needs a file on disk; written only once a conversion is requested
             pdf_path = save_uploaded_file(pdf_file)
             
-            if st.button("🔄 Convert to DOCX", type="primary", use_container_width=True):
-                with st.spinner("Converting PDF to DOCX..."):
-                    # Use unique filename for output to prevent collisions
-                    session_id = st.session_state.get('session_id', str(uuid.uuid4())[:8])
-                    unique_id = str(uuid.uuid4())[:8]
-                    output_filename = f"converted_{Path(pdf_file.name).stem}_{session_id}_{unique_id}.docx"
-                    output_path = os.path.join(Config.OUTPUT_FOLDER, output_filename)
-                    
-                    # Track output file for cleanup
-                    st.session_state.uploaded_files.append(output_path)
-                    
-                    result = DocumentProcessor.convert_pdf_to_docx(pdf_path, output_path)
-                    
-                    if result['success']:
-                        st.success(f"✅ {result['message']}")
-                        
-                        # Provide download button
-                        with open(output_path, 'rb') as f:
-                            st.download_button(
-                                "📥 Download DOCX",
-                                data=f,
-                                file_name=output_filename,
-                                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                            )
-                    else:
-                        st.error(f"❌ {result['message']}")
+            if pdf_path:
+                # Use unique filename for output to prevent collisions
+                session_id = st.session_state.get('session_id', str(uuid.uuid4())[:8])
+                unique_id = str(uuid.uuid4())[:8]
+                output_filename = f"converted_{Path(pdf_file.name).stem}_{session_id}_{unique_id}.docx"
+                output_path = os.path.join(Config.OUTPUT_FOLDER, output_filename)
+                
+                # Track output file for cleanup
+                st.session_state.uploaded_files.append(output_path)
+                file_store.add(output_path, session_id)
+                
+                # Conversion runs in a background worker process; this session just polls it
+                st.session_state.conversion_job_id = get_job_manager().submit(
+                    pdf_path, output_path, download_name=output_filename
+                )
+                submitted = True
+        
+        with st.expander("🔎 Look up a conversion by job ID"):
+            lookup_id = st.text_input("Job ID", key="conversion_job_lookup").strip()
+            if lookup_id:
+                st.session_state.conversion_job_id = lookup_id
+        
+        if st.session_state.conversion_job_id:
+            # Only the run that submitted the job waits on it; later reruns show a refresh button
+            render_conversion_job(st.session_state.conversion_job_id, poll=submitted)
     
+    with tab3:
+        st.markdown("### Summarize Many Documents")
+        st.markdown("Upload several files or a ZIP archive; duplicates are detected and summarized once.")
+        
+        batch_files = st.file_uploader(
+            "Choose files or a ZIP archive",
+            type=['pdf', 'docx', 'txt', 'zip'],
+            accept_multiple_files=True,
+            key="batch_uploader",
+            help=f"Up to {Config.BATCH_MAX_FILES} documents per batch"
+        )
+        
+        if batch_files and st.button("🚀 Process Batch", type="primary", use_container_width=True):
+            if not api_key:
+                st.error("⚠️ Please provide an OpenAI API key in the sidebar")
+            else:
+                progress_bar = st.progress(0.0, text="Preparing batch...")
+                stage_labels = {'extract': "Extracting", 'summarize': "Summarizing"}
+                
+                def report_progress(stage: str, done: int, total: int):
+                    # Extraction fills the first half of the bar, summarization the second
+                    offset = 0.0 if stage == 'extract' else 0.5
+                    fraction = done / total if total else 1.0
+                    progress_bar.progress(offset + 0.5 * fraction,
+                                          text=f"{stage_labels[stage]} {done} of {total} documents...")
+                
+                try:
+                    processor = BatchProcessor(api_key=api_key, extraction_cache=extraction_cache,
+                                               session_id=st.session_state.session_id)
+                    st.session_state.batch_results = processor.run(
+                        [(f.name, f.getvalue()) for f in batch_files],
+                        progress_callback=report_progress,
+                        summary_type=summary_type,
+                        max_tokens=max_tokens,
+                        language=language,
+                        include_key_points=include_key_points
+                    )
+                    progress_bar.empty()
+                except Exception as e:
+                    progress_bar.empty()
+                    st.error(f"❌ Batch failed: {str(e)}")
+        
+        rows = st.session_state.batch_results
+        if rows:
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Documents", len(rows))
+            with col2:
+                st.metric("Summarized", sum(1 for row in rows if row.get('status') == 'done'))
+            with col3:
+                st.metric("Duplicates", sum(1 for row in rows if row.get('status') == 'duplicate'))
+            with col4:
+                st.metric("Tokens Used", sum(row.get('tokens_used') or 0 for row in rows))
+            
+            st.dataframe(
+                [{'File': row['file_name'], 'Status': row.get('status'),
+                  'Summary': (row.get('summary') or row.get('error') or '')[:200]} for row in rows],
+                use_container_width=True
+            )
+            
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    "📥 Download CSV",
+                    data=BatchProcessor.to_csv(rows),
+                    file_name=f"batch_summaries_{timestamp}.csv",
+                    mime="text/csv",
+                    use_container_width=True
+                )
+            with col2:
+                st.download_button(
+                    "📥 Download JSONL",
+                    data=BatchProcessor.to_jsonl(rows),
+                    file_name=f"batch_summaries_{timestamp}.jsonl",
+                    mime="application/jsonl",
+                    use_container_width=True
+                )
+
+
+def render_conversion_job(job_id: str, poll: bool = False):
+    """
+    Show progress for a conversion job
+    
+    Args:
+        job_id: Conversion job ID
+        poll: Update the progress bar in place until the job finishes; otherwise
+            show the current state with a button to refresh it
+    """
+    job_manager = get_job_manager()
+    job = job_manager.get(job_id)
+    if job is None:
+        st.error(f"❌ Unknown conversion job: {job_id}")
+        return
+    
+    st.caption(f"Job ID: `{job_id}`")
     
-     
+    # Polling redraws only this placeholder, so results elsewhere on the page stay put
+    status_placeholder = st.empty()
+    while job['status'] in ('queued', 'running'):
+        if job['page_count']:
+            label = f"{job['stage'].title()} page {job['pages_done']} of {job['page_count']}..."
+        else:
+            label = "Waiting for a conversion worker..." if job['status'] == 'queued' else "Opening document..."
+        status_placeholder.progress(job['progress'], text=label)
+        
+        if not poll:
+            st.button("🔄 Refresh status", key="conversion_refresh")
+            return
+        time.sleep(1)
+        job = job_manager.get(job_id)
+        if job is None:
+            status_placeholder.error(f"❌ Conversion job {job_id} has expired.")
+            return
+    status_placeholder.empty()
+    
+    if job['status'] == 'done':
+        # Read from this host's outputs, or from the shared backend if another host converted it
+        output = ConversionJobManager.read_output(job)
+        if output is None:
+            st.error("❌ This converted file has expired. Please convert the PDF again.")
+            return
+        
+        st.success(f"✅ {job['message']}")
+        file_store.touch(job['output_path'])
+        
+        # Provide download button
+        st.download_button(
+            "📥 Download DOCX",
+            data=output,
+            file_name=job['download_name'],
+            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        )
+    else:
+        st.error(f"❌ {job['message']}")
 
 
 if __name__ == "__main__":
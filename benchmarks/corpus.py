@@ -0,0 +1,72 @@
+"""Synthetic document corpora for benchmarks"""
+import os
+import random
+from docx import Document
+from docx.enum.text import WD_BREAK
+
+
+LINES_PER_PAGE = 40
+WORDS = (
+    "agreement party contract payment term clause notice liability service report "
+    "revenue quarter growth analysis market customer product delivery schedule risk "
+    "compliance policy section schedule annex obligation warranty termination budget"
+).split()
+
+
+def page_lines(page: int, rng: random.Random):
+    """Deterministic pseudo-text for one page"""
+    lines = [f"Synthetic Report - Page {page + 1}"]
+    for _ in range(LINES_PER_PAGE - 1):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)))
+    return lines
+
+
+def make_pdf(path: str, pages: int) -> None:
+    import fitz  # PyMuPDF, installed with pdf2docx
+    
+    rng = random.Random(pages)
+    doc = fitz.open()
+    for page in range(pages):
+        pdf_page = doc.new_page()
+        pdf_page.insert_text((50, 50), "\n".join(page_lines(page, rng)), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def make_docx(path: str, pages: int) -> None:
+    rng = random.Random(pages)
+    doc = Document()
+    for page in range(pages):
+        for line in page_lines(page, rng):
+            doc.add_paragraph(line)
+        if page < pages - 1:
+            doc.paragraphs[-1].add_run().add_break(WD_BREAK.PAGE)
+    doc.save(path)
+
+
+def make_txt(path: str, pages: int) -> None:
+    rng = random.Random(pages)
+    with open(path, 'w', encoding='utf-8') as f:
+        for page in range(pages):
+            f.write("\n".join(page_lines(page, rng)) + "\n\n")
+
+
+BUILDERS = {'pdf': make_pdf, 'docx': make_docx, 'txt': make_txt}
+
+
+def build_corpus(corpus_dir: str, sizes, formats=('pdf', 'docx', 'txt')):
+    """
+    Create (or reuse) one document per format and page count
+    
+    Returns:
+        Dictionary mapping (format, pages) to file path
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    corpus = {}
+    for fmt in formats:
+        for pages in sizes:
+            path = os.path.join(corpus_dir, f"synthetic_{pages}p.{fmt}")
+            if not os.path.exists(path):
+                BUILDERS[fmt](path, pages)
+            corpus[(fmt, pages)] = path
+    return corpus
@@ -0,0 +1,94 @@
+"""
+Benchmark cold-start import times
+
+Usage:
+    python -m benchmarks.import_time --repeat 5
+    python -m benchmarks.import_time --max-seconds 0.3
+
+Each module is imported in a fresh interpreter, so nothing is cached in
+sys.modules. The report lists the median import time and any of
+utils.warmup.HEAVY_MODULES the import pulled in; with --max-seconds, a
+slower import or a heavy module loaded eagerly fails the run.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from utils.warmup import HEAVY_MODULES
+
+
+DEFAULT_MODULES = ('utils.document_processor', 'utils.ai_summarizer', 'utils.extraction_cache', 'utils.conversion_jobs')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = '''
+import sys, json, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def measure_import(module, repeat):
+    """Median import time of a module over repeat fresh interpreters"""
+    samples = []
+    heavy = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        samples.append(probe['seconds'])
+        heavy = probe['heavy']
+    samples.sort()
+    result = {
+        'module': module,
+        'p50_s': round(samples[len(samples) // 2], 4),
+        'min_s': round(samples[0], 4),
+        'heavy_loaded': heavy
+    }
+    loaded = f"  loads {', '.join(heavy)}" if heavy else ''
+    print(f"{module:<28} p50={result['p50_s']:.4f}s  min={result['min_s']:.4f}s{loaded}", file=sys.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Document AI cold-start imports')
+    parser.add_argument('--modules', nargs='+', default=list(DEFAULT_MODULES), help='Modules to import')
+    parser.add_argument('--repeat', type=int, default=5, help='Fresh interpreters per module')
+    parser.add_argument('--max-seconds', type=float, help='Fail if a median import is slower or loads a heavy module')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    args = parser.parse_args(argv)
+    
+    results = [measure_import(module, args.repeat) for module in args.modules]
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    
+    if args.max_seconds is None:
+        return 0
+    failures = [result for result in results if result['p50_s'] > args.max_seconds or result['heavy_loaded']]
+    for result in failures:
+        print(f"SLOW IMPORT {result['module']}: {result['p50_s']}s, loads {result['heavy_loaded']}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
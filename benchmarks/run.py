@@ -0,0 +1,174 @@
+"""
+Benchmark the extraction, conversion and summarization hot paths
+
+Usage:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --sizes 10 100 --baseline bench.json
+
+Synthetic PDF/DOCX/TXT corpora are generated once under benchmarks/.corpus.
+Summarization runs against a local OpenAI-compatible stub server, so no API
+key or network access is needed. Results are reported as JSON; with
+--baseline, p50 latencies are compared and regressions fail the run.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+
+from config import Config
+from utils.document_processor import DocumentProcessor
+from utils.ai_summarizer import AISummarizer
+from benchmarks.corpus import build_corpus
+from benchmarks.stub_openai import start_stub_server
+
+
+DEFAULT_SIZES = (10, 100, 1000)
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.corpus')
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(name, pages, path, func, repeat, measure_memory=True):
+    """Time func repeatedly and record latency percentiles, throughput and peak memory"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    
+    # Memory is measured in a separate run, since tracing skews timings
+    peak = None
+    if measure_memory:
+        tracemalloc.start()
+        func()
+        peak = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+    
+    p50 = percentile(timings, 0.5)
+    size_mb = os.path.getsize(path) / (1024 * 1024) if path else 0
+    result = {
+        'name': name,
+        'pages': pages,
+        'repeat': repeat,
+        'p50_s': round(p50, 4),
+        'p95_s': round(percentile(timings, 0.95), 4),
+        'mean_s': round(sum(timings) / len(timings), 4),
+        'pages_per_s': round(pages / p50, 2) if p50 else None,
+        'mb_per_s': round(size_mb / p50, 2) if p50 and size_mb else None,
+        'peak_traced_mb': peak
+    }
+    memory = f"  peak={peak}MB" if peak is not None else ""
+    print(f"{name:<28} {pages:>5}p  p50={result['p50_s']:.4f}s  p95={result['p95_s']:.4f}s{memory}", file=sys.stderr)
+    return result
+
+
+def run_benchmarks(sizes, repeat, skip, stub_latency, measure_memory=True):
+    corpus = build_corpus(CORPUS_DIR, sizes)
+    results = []
+    
+    if 'extract' not in skip:
+        for (fmt, pages), path in sorted(corpus.items()):
+            results.append(measure(f'extract_text[{fmt}]', pages, path,
+                                   lambda: DocumentProcessor.extract_text(path, fmt), repeat, measure_memory))
+            results.append(measure(f'get_document_info[{fmt}]', pages, path,
+                                   lambda: DocumentProcessor.get_document_info(path, f'.{fmt}'), repeat, measure_memory))
+            results.append(measure(f'analyze[{fmt}]', pages, path,
+                                   lambda: DocumentProcessor.analyze(path, fmt), repeat, measure_memory))
+    
+    if 'convert' not in skip:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for pages in sizes:
+                path = corpus[('pdf', pages)]
+                output_path = os.path.join(tmp_dir, f'{pages}.docx')
+                results.append(measure('convert_pdf_to_docx', pages, path,
+                                       lambda: DocumentProcessor.convert_pdf_to_docx(path, output_path), repeat, measure_memory))
+    
+    if 'summarize' not in skip:
+        server = start_stub_server(latency=stub_latency)
+        Config.OPENAI_BASE_URL = f'http://127.0.0.1:{server.server_port}/v1'
+        Config.RESPONSE_CACHE_ENABLED = False  # Measure the request path, not cache hits
+        summarizer = AISummarizer(api_key='benchmark')
+        try:
+            for pages in sizes:
+                path = corpus[('txt', pages)]
+                text = DocumentProcessor.extract_text(path, 'txt')
+                results.append(measure('summarize', pages, path,
+                                       lambda: summarizer.summarize(text), repeat, measure_memory))
+        finally:
+            server.shutdown()
+    
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return p50 regressions beyond threshold (e.g. 0.2 = 20% slower) versus the baseline"""
+    previous = {(r['name'], r['pages']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        before = previous.get((result['name'], result['pages']))
+        if not before or not before['p50_s']:
+            continue
+        change = (result['p50_s'] - before['p50_s']) / before['p50_s']
+        result['p50_change'] = round(change, 3)
+        if change > threshold:
+            regressions.append({'name': result['name'], 'pages': result['pages'],
+                                'baseline_p50_s': before['p50_s'], 'p50_s': result['p50_s'],
+                                'change': round(change, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Document AI hot paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='Page counts to generate')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark')
+    parser.add_argument('--skip', nargs='*', default=[], choices=['extract', 'convert', 'summarize'],
+                        help='Benchmark groups to skip')
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='Stub API latency per request, seconds')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the traced peak-memory run')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--baseline', help='Saved report to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p50 slowdown versus baseline')
+    args = parser.parse_args(argv)
+    
+    results = run_benchmarks(args.sizes, args.repeat, set(args.skip), args.stub_latency, not args.no_memory)
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+    
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        report['regressions'] = regressions
+    
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+    
+    for regression in regressions:
+        print(f"REGRESSION {regression['name']} {regression['pages']}p: "
+              f"{regression['baseline_p50_s']}s -> {regression['p50_s']}s (+{regression['change']:.0%})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
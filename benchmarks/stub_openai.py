@@ -0,0 +1,89 @@
+"""Minimal local OpenAI-compatible chat completions and embeddings server for benchmarks"""
+import json
+import time
+import zlib
+import threading
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    reply = "This is a stub summary of the document. " * 5
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.endswith('/embeddings'):
+            return self._embeddings(request)
+        prompt_chars = sum(len(m.get('content', '')) for m in request.get('messages', []))
+        usage = {
+            'prompt_tokens': prompt_chars // 4,
+            'completion_tokens': len(self.reply) // 4,
+            'total_tokens': prompt_chars // 4 + len(self.reply) // 4
+        }
+        time.sleep(self.latency)
+        
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for word in self.reply.split(' '):
+                chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': request.get('model'),
+                         'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': request.get('model'),
+                     'choices': [], 'usage': usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n".encode())
+            return
+        
+        body = json.dumps({
+            'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': request.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.reply}, 'finish_reason': 'stop'}],
+            'usage': usage
+        }).encode()
+        self._send_json(body)
+    
+    def _embeddings(self, request):
+        """Bag-of-words vectors hashed to 64 dimensions, so similar texts get similar embeddings"""
+        inputs = request.get('input', [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        data = []
+        for index, text in enumerate(inputs):
+            vector = [0.0] * 64
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode()) % 64] += 1.0
+            data.append({'object': 'embedding', 'index': index, 'embedding': vector})
+        tokens = sum(len(text) // 4 for text in inputs)
+        time.sleep(self.latency)
+        self._send_json(json.dumps({
+            'object': 'list', 'data': data, 'model': request.get('model'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}
+        }).encode())
+    
+    def _send_json(self, body: bytes):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server(latency: float = 0.0, port: int = 0, reply: Optional[str] = None) -> ThreadingHTTPServer:
+    """
+    Start the stub server in a background thread
+    
+    Args:
+        latency: Seconds each response is delayed
+        port: Port to listen on (0 picks a free one)
+        reply: Completion text returned for every chat request
+    
+    Returns:
+        The server; its base URL is http://127.0.0.1:<server.server_port>/v1
+    """
+    handler = type('StubHandler', (_StubHandler,), {'latency': latency, 'reply': reply or _StubHandler.reply})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,164 @@
+"""Minimal local Redis-compatible server (RESP2), a stand-in for STATE_BACKEND=redis"""
+import time
+import argparse
+import threading
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+
+
+class _Store:
+    """In-memory keyspace with expiry, shared by all connections"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.deadlines = {}
+    
+    def live(self, key):
+        deadline = self.deadlines.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.values.pop(key, None)
+            self.deadlines.pop(key, None)
+        return self.values.get(key)
+
+
+class _StubHandler(StreamRequestHandler):
+    store = None
+    
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # Inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+    
+    def _bulk(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+    
+    def _array(self, values):
+        return b'*%d\r\n' % len(values) + b''.join(self._bulk(value) for value in values)
+    
+    def _container(self, key):
+        """The hash or sorted set (a dict) at key, created if missing"""
+        container = self.store.live(key)
+        if container is None:
+            container = self.store.values[key] = {}
+        return container
+    
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            with self.store.lock:
+                reply = self._execute(args[0].upper(), args[1:])
+            self.wfile.write(reply)
+    
+    def _execute(self, command, args):
+        store = self.store
+        if command == b'PING':
+            return b'+PONG\r\n'
+        if command in (b'CLIENT', b'SELECT'):
+            return b'+OK\r\n'
+        if command == b'GET':
+            return self._bulk(store.live(args[0]))
+        if command == b'MGET':
+            return self._array([store.live(key) for key in args])
+        if command == b'SET':
+            key, value = args[0], args[1]
+            store.values[key] = value
+            store.deadlines.pop(key, None)
+            options = [option.upper() for option in args[2:]]
+            for unit, scale in ((b'EX', 1.0), (b'PX', 0.001)):
+                if unit in options:
+                    store.deadlines[key] = time.monotonic() + int(args[2 + options.index(unit) + 1]) * scale
+            return b'+OK\r\n'
+        if command == b'DEL':
+            removed = sum(1 for key in args if store.live(key) is not None)
+            for key in args:
+                store.values.pop(key, None)
+                store.deadlines.pop(key, None)
+            return b':%d\r\n' % removed
+        if command == b'INCRBY':
+            value = int(store.live(args[0]) or 0) + int(args[1])
+            store.values[args[0]] = b'%d' % value
+            return b':%d\r\n' % value
+        if command == b'HINCRBY':
+            fields = self._container(args[0])
+            fields[args[1]] = b'%d' % (int(fields.get(args[1], 0)) + int(args[2]))
+            return b':%s\r\n' % fields[args[1]]
+        if command == b'HSET':
+            fields = self._container(args[0])
+            added = sum(1 for field in args[1::2] if field not in fields)
+            fields.update(zip(args[1::2], args[2::2]))
+            return b':%d\r\n' % added
+        if command == b'HGET':
+            return self._bulk((store.live(args[0]) or {}).get(args[1]))
+        if command == b'HMGET':
+            fields = store.live(args[0]) or {}
+            return self._array([fields.get(field) for field in args[1:]])
+        if command == b'HDEL':
+            fields = store.live(args[0]) or {}
+            return b':%d\r\n' % sum(1 for field in args[1:] if fields.pop(field, None) is not None)
+        if command == b'HLEN':
+            return b':%d\r\n' % len(store.live(args[0]) or {})
+        if command == b'HGETALL':
+            fields = store.live(args[0]) or {}
+            return self._array([item for field, value in fields.items() for item in (field, value)])
+        if command == b'ZADD':
+            options = []
+            while args[1 + len(options)].upper() in (b'NX', b'XX', b'GT', b'LT', b'CH'):
+                options.append(args[1 + len(options)].upper())
+            members = self._container(args[0])
+            pairs = args[1 + len(options):]
+            added = 0
+            for score, member in zip(pairs[::2], pairs[1::2]):
+                if (b'XX' in options and member not in members) or (b'NX' in options and member in members):
+                    continue
+                added += member not in members
+                members[member] = float(score)
+            return b':%d\r\n' % added
+        if command == b'ZRANGE':
+            members = sorted((store.live(args[0]) or {}).items(), key=lambda item: (item[1], item[0]))
+            start, stop = int(args[1]), int(args[2])
+            stop = len(members) + stop if stop < 0 else stop
+            return self._array([member for member, _ in members[start:stop + 1]])
+        if command == b'ZREM':
+            members = store.live(args[0]) or {}
+            return b':%d\r\n' % sum(1 for member in args[1:] if members.pop(member, None) is not None)
+        if command == b'FLUSHDB':
+            store.values.clear()
+            store.deadlines.clear()
+            return b'+OK\r\n'
+        return b'-ERR unknown command \'%s\'\r\n' % command
+
+
+def start_stub_server(port: int = 0) -> ThreadingTCPServer:
+    """
+    Start the stub server in a background thread
+    
+    Returns:
+        The server; its URL is redis://127.0.0.1:<server.server_address[1]>/0
+    """
+    handler = type('StubHandler', (_StubHandler,), {'store': _Store()})
+    server = ThreadingTCPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--port', type=int, default=6379)
+    args = parser.parse_args()
+    server = start_stub_server(args.port)
+    print(f'Stub Redis listening on redis://127.0.0.1:{server.server_address[1]}/0')
+    threading.Event().wait()
@@ -9,6 +9,7 @@ class Config:
     
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # Optional OpenAI-compatible endpoint
     
     # File upload settings
     UPLOAD_FOLDER = 'uploads'
@@ -16,15 +17,115 @@ class Config:
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt'}
     
+    # Cache settings
+    CACHE_FOLDER = 'cache'
+    EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+    PAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024  # 128MB of PDF page text, reused by revised uploads
+    
+    # Shared state (extraction results, LLM responses, conversion jobs)
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')  # 'sqlite' (processes on one host) or 'redis' (several hosts)
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    REDIS_KEY_PREFIX = os.getenv('REDIS_KEY_PREFIX', 'document_ai:')  # Lets several deployments share one server
+    REDIS_TIMEOUT = 5  # Seconds per Redis connect or command
+    
+    # Upload/output file store (indexed in CACHE_FOLDER)
+    FILE_STORE_MAX_BYTES = int(os.getenv('FILE_STORE_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2GB, LRU eviction beyond
+    FILE_STORE_TTL = 24 * 3600  # Files unused this long are deleted
+    FILE_STORE_SESSION_TTL = 2 * 3600  # Sessions idle this long have ended; their files are released
+    FILE_STORE_GRACE_SECONDS = 15 * 60  # Files used this recently are never evicted (in-flight conversions)
+    FILE_STORE_SWEEP_INTERVAL = 300  # Seconds between background sweeps
+    
+    # Extraction settings
+    PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = 20  # Smaller PDFs are extracted in-process
+    PDF_ENGINE = os.getenv('PDF_ENGINE', 'auto')  # 'auto' (per page), 'pypdf' (fast) or 'pdfplumber' (layout-aware)
+    PDF_LAYOUT_MIN_PATH_OPS = 12  # Pages drawing this many rectangles/lines/curves (tables, boxes) use pdfplumber
+    PDF_ENGINE_SAMPLE_PAGES = 3  # Pages extracted with both engines to check that pypdf reads the document well
+    PDF_ENGINE_MIN_AGREEMENT = 0.9  # Below this word-level similarity on a sample page, all pages use pdfplumber
+    TEXT_BLOCK_SIZE = 64 * 1024  # Characters per streamed text block
+    TEXT_SAMPLE_BYTES = 64 * 1024  # Leading bytes of a TXT file used to pick its encoding
+    
+    # Conversion settings
+    CONVERSION_WORKERS = int(os.getenv('CONVERSION_WORKERS', 2))  # Background PDF→DOCX processes
+    CONVERSION_SHARD_WORKERS = int(os.getenv('CONVERSION_SHARD_WORKERS', max(1, (os.cpu_count() or 1) // max(1, CONVERSION_WORKERS))))  # Processes per conversion; the CPUs are split between the conversion workers
+    CONVERSION_SHARD_MIN_PAGES = 30  # Smaller PDFs are converted in one process
+    
+    # Cold start: heavy libraries (PDF, DOCX conversion, OpenAI) are imported on first use
+    WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'  # Import them in a background thread after startup
+    WARM_CONVERSION_POOL = os.getenv('WARM_CONVERSION_POOL', 'false').lower() == 'true'  # Also pre-fork the conversion workers
+    
     # AI Settings
     AI_MODEL = 'gpt-4.1-nano'
     MAX_TOKENS = 1000
     TEMPERATURE = 0.7
     
+    # Long-document summarization (map-reduce)
+    SUMMARY_MAX_INPUT_TOKENS = 12000  # Longer texts are summarized in chunks
+    SUMMARY_CHUNK_TOKENS = 6000  # Token budget per chunk / reduce request
+    SUMMARY_SECTION_MAX_TOKENS = 400  # Response length per chunk summary
+    SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', 4))
+    KEY_POINTS_MAX_TOKENS = 800  # Response length for key point extraction
+    
+    # Token budgets, checked before any request is sent
+    MODEL_CONTEXT_TOKENS = int(os.getenv('MODEL_CONTEXT_TOKENS', 1047576))  # Prompt + response limit of AI_MODEL
+    MAX_PROMPT_TOKENS = int(os.getenv('MAX_PROMPT_TOKENS', 128000))  # Document tokens sent per summary or key point run
+    INPUT_POLICY = os.getenv('INPUT_POLICY', 'salient')  # Over budget: 'reject', 'truncate' (head/tail) or 'salient'
+    TOKENIZER_ENCODING = 'o200k_base'  # tiktoken fallback when AI_MODEL is unknown to it
+    MODEL_INPUT_PRICE_PER_1M = float(os.getenv('MODEL_INPUT_PRICE_PER_1M', 0.10))  # USD per 1M prompt tokens
+    MODEL_OUTPUT_PRICE_PER_1M = float(os.getenv('MODEL_OUTPUT_PRICE_PER_1M', 0.40))  # USD per 1M response tokens
+    
+    # Extractive pre-compression of long documents (local, before any request)
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'false').lower() == 'true'  # Opt-in: it drops repeated short lines and paragraphs
+    COMPRESSION_MIN_TOKENS = 4000  # Shorter texts are sent as-is
+    COMPRESSION_RATIO = float(os.getenv('COMPRESSION_RATIO', 0))  # Share of tokens kept by TextRank (0 = off)
+    DEDUP_THRESHOLD = 0.8  # MinHash similarity at which a paragraph counts as a duplicate
+    HEADER_MAX_WORDS = 12  # Longer lines are never treated as running headers/footers
+    HEADER_MIN_REPEATS = 3  # Repeats needed before a line counts as a header/footer
+    HEADER_MIN_GAP_LINES = 10  # Headers repeat once per page, not on consecutive lines
+    
+    # Document Q&A over a local retrieval index (cached per document in CACHE_FOLDER)
+    QA_PASSAGE_WORDS = 120  # Words per indexed passage
+    QA_PASSAGE_OVERLAP = 20  # Words shared by consecutive passages
+    QA_TOP_K = 5  # Passages sent with each question
+    QA_MAX_TOKENS = 500  # Response length for answers
+    QA_EMBEDDINGS_ENABLED = os.getenv('QA_EMBEDDINGS_ENABLED', 'false').lower() == 'true'  # Rank by embeddings too (API cost)
+    EMBEDDING_MODEL = 'text-embedding-3-small'
+    EMBEDDING_BATCH_SIZE = 256  # Passages per embeddings request
+    QA_INDEX_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+    
+    # Batch processing
+    BATCH_MAX_FILES = 500
+    BATCH_EXTRACT_WORKERS = int(os.getenv('BATCH_EXTRACT_WORKERS', os.cpu_count() or 1))  # Documents extracted at once
+    BATCH_SUMMARY_CONCURRENCY = int(os.getenv('BATCH_SUMMARY_CONCURRENCY', 8))  # Documents summarized at once
+    
+    # LLM response cache
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+    RESPONSE_CACHE_TTL = 7 * 24 * 3600  # 7 days
+    RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 64MB
+    
+    # OpenAI rate limits, shared by all sessions in this process (0 = unlimited)
+    OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', 500))
+    OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', 200000))
+    OPENAI_BURST_SECONDS = 10  # Quota that may be spent at once, in seconds' worth
+    OPENAI_MAX_RETRIES = 5  # Retries for 429s, timeouts and 5xx errors
+    OPENAI_RETRY_BASE_DELAY = 1.0  # seconds, doubled per retry (with jitter)
+    OPENAI_RETRY_MAX_DELAY = 60.0  # seconds
+    
+    # HTTP connection pool for the OpenAI client
+    HTTP_MAX_CONNECTIONS = 20
+    HTTP_TIMEOUT = 120  # seconds
+    
+    # Metrics and profiling
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # Prometheus scrape endpoint: /metrics
+    PROFILE_FOLDER = 'profiles'  # cProfile output for requests run with ?profile=1
+    
     # App Settings
     APP_NAME = "Document AI Assistant"
     APP_VERSION = "1.0.0"
-
-# Create necessary directories
-os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(Config.OUTPUT_FOLDER, exist_ok=True)
+    
+    @classmethod
+    def ensure_directories(cls):
+        """Create the upload, output and cache folders (not done on import)"""
+        for folder in (cls.UPLOAD_FOLDER, cls.OUTPUT_FOLDER, cls.CACHE_FOLDER):
+            os.makedirs(folder, exist_ok=True)
@@ -0,0 +1,6 @@
+"""
+Headless entry point for Document AI
+
+Run `python -m document_ai --help` for the command line interface. It reuses
+DocumentProcessor and AISummarizer from utils/ without importing Streamlit.
+"""
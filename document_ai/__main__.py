@@ -0,0 +1,6 @@
+import sys
+
+from document_ai.cli import main
+
+
+sys.exit(main())
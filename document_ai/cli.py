@@ -0,0 +1,324 @@
+"""
+Command line interface for bulk extraction, summarization and conversion
+
+Usage:
+    python -m document_ai extract filings/ -o texts.jsonl
+    python -m document_ai summarize "filings/**/*.pdf" -o summaries.jsonl --manifest summaries.manifest
+    python -m document_ai key-points filings/ --concurrency 8 -o key_points.jsonl
+    python -m document_ai convert scans/ --output-dir converted/ --workers 4
+
+Inputs may be files, directories (searched recursively) or glob patterns.
+Results are written as JSON Lines, one object per document. With --manifest,
+content hashes are recorded as documents complete and skipped on later runs,
+so an interrupted job resumes where it stopped; --output is then appended to
+rather than overwritten. Identical files are processed once per run.
+"""
+import os
+import sys
+import glob
+import json
+import asyncio
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Callable, Awaitable
+
+from config import Config
+from utils.document_processor import DocumentProcessor
+from utils.extraction_cache import ExtractionCache
+
+
+def find_documents(patterns: List[str], extensions: Optional[set] = None) -> List[str]:
+    """Expand files, directories and glob patterns into document paths, in a stable order"""
+    extensions = extensions or Config.ALLOWED_EXTENSIONS
+    found = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = sorted(os.path.join(root, name) for root, _, names in os.walk(pattern) for name in names)
+        elif os.path.isfile(pattern):
+            candidates = [pattern]
+        else:
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        
+        for path in candidates:
+            extension = os.path.splitext(path)[1].lower().replace('.', '')
+            if extension in extensions and os.path.isfile(path) and path not in seen:
+                seen.add(path)
+                found.append(path)
+    return found
+
+
+class Manifest:
+    """Append-only record of completed content hashes, scoped to a command and its options"""
+    
+    def __init__(self, path: Optional[str], scope: str):
+        """
+        Load completed hashes for this scope
+        
+        Args:
+            path: Manifest file (None disables resuming)
+            scope: Identifies the command and options, so e.g. a brief summary
+                run does not skip documents done by a comprehensive one
+        """
+        self.path = path
+        self.scope = scope
+        self.completed = set()
+        self._file = None
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line_scope, _, content_hash = line.strip().partition(' ')
+                    if line_scope == scope and content_hash:
+                        self.completed.add(content_hash)
+    
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self.completed
+    
+    def add(self, content_hash: str) -> None:
+        """Record a completed document; written immediately so a crash loses nothing"""
+        self.completed.add(content_hash)
+        if not self.path:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(f'{self.scope} {content_hash}\n')
+        self._file.flush()
+    
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _scope(command: str, **options) -> str:
+    """Manifest scope: the command plus a short digest of the options that shape its output"""
+    digest = hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return f'{command}:{digest}'
+
+
+def _extract_worker(file_path: str, content_hash: str, cache_dir: str) -> Dict:
+    """Extract one document into the extraction cache (runs in a worker process)"""
+    # Documents are extracted in parallel, so each one uses a single process
+    return ExtractionCache(cache_dir).extract(file_path, os.path.splitext(file_path)[1], content_hash, workers=1)
+
+
+def _convert_worker(pdf_path: str, output_path: str, shard_workers: int) -> Dict:
+    """Convert one PDF (runs in a worker process)"""
+    return DocumentProcessor.convert_pdf_to_docx(pdf_path, output_path, workers=shard_workers)
+
+
+async def run_pipeline(
+    paths: List[str],
+    process: Callable[[str, str], Awaitable[Dict]],
+    manifest: Manifest,
+    output,
+    concurrency: int
+) -> int:
+    """
+    Hash each document, skip completed ones, process the rest concurrently
+    
+    Rows are written to output as each document finishes, and successful
+    documents are added to the manifest right after their row is flushed.
+    
+    Args:
+        paths: Documents to process
+        process: Coroutine taking (path, content_hash) and returning the row fields;
+            a row with an 'error' field counts as failed
+        manifest: Completed hashes to skip and record
+        output: Text stream receiving JSON Lines
+        concurrency: Documents in flight at once
+    
+    Returns:
+        Number of failed documents
+    """
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    
+    # Hash first, so the progress total counts only the documents that will be processed
+    hashes = await asyncio.gather(*[loop.run_in_executor(None, ExtractionCache.hash_file, path) for path in paths])
+    pending = []
+    claimed = set()
+    for path, content_hash in zip(paths, hashes):
+        if content_hash not in manifest and content_hash not in claimed:
+            claimed.add(content_hash)
+            pending.append((path, content_hash))
+    counts = {'done': 0, 'skipped': len(paths) - len(pending), 'failed': 0}
+    
+    async def handle(path: str, content_hash: str) -> None:
+        async with slots:
+            try:
+                row = {'path': path, 'content_hash': content_hash, **await process(path, content_hash)}
+            except Exception as e:
+                row = {'path': path, 'content_hash': content_hash, 'error': str(e)}
+            
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+            output.flush()
+            if row.get('error'):
+                counts['failed'] += 1
+                status = f"failed: {row['error']}"
+            else:
+                manifest.add(content_hash)
+                counts['done'] += 1
+                status = 'ok'
+            finished = counts['done'] + counts['failed']
+            print(f"[{finished}/{len(pending)}] {path}: {status}", file=sys.stderr)
+    
+    await asyncio.gather(*[handle(path, content_hash) for path, content_hash in pending])
+    print(f"{counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped "
+          f"(already completed or duplicate)", file=sys.stderr)
+    return counts['failed']
+
+
+def _document_fields(info: Dict) -> Dict:
+    return {
+        'file_type': info.get('file_type'),
+        'page_count': info.get('page_count'),
+        'char_count': info.get('char_count')
+    }
+
+
+def cmd_extract(args, manifest: Manifest, output) -> int:
+    cache = ExtractionCache()
+    
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        async def process(path: str, content_hash: str) -> Dict:
+            info = cache.get_info(content_hash)
+            if info is None:
+                info = await asyncio.get_running_loop().run_in_executor(
+                    pool, _extract_worker, path, content_hash, cache.cache_dir
+                )
+            return dict(_document_fields(info), text=cache.get_text(content_hash))
+        
+        return asyncio.run(run_pipeline(args.paths, process, manifest, output, args.workers))
+
+
+def cmd_summarize(args, manifest: Manifest, output) -> int:
+    # Imported here so extract and convert runs never load the OpenAI client
+    from utils.ai_summarizer import AsyncAISummarizer
+    
+    cache = ExtractionCache()
+    
+    async def run(pool) -> int:
+        async with AsyncAISummarizer(api_key=args.api_key) as summarizer:
+            async def process(path: str, content_hash: str) -> Dict:
+                info = cache.get_info(content_hash)
+                if info is None:
+                    info = await asyncio.get_running_loop().run_in_executor(
+                        pool, _extract_worker, path, content_hash, cache.cache_dir
+                    )
+                row = _document_fields(info)
+                text = (cache.get_text(content_hash) or '').strip()
+                if not text:
+                    return dict(row, error='No text could be extracted from this document')
+                
+                if args.command == 'key-points':
+                    result = await summarizer.extract_key_points(text)
+                    fields = {'key_points': result.get('key_points')}
+                else:
+                    result = await summarizer.summarize(text, args.summary_type, args.max_tokens, args.language)
+                    fields = {'summary': result.get('summary'), 'summary_type': args.summary_type,
+                              'language': args.language}
+                row.update(fields, tokens_used=result.get('tokens_used', 0), cached=bool(result.get('cached')))
+                if not result['success']:
+                    row['error'] = result['error']
+                return row
+            
+            return await run_pipeline(args.paths, process, manifest, output, args.concurrency)
+    
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        return asyncio.run(run(pool))
+
+
+def cmd_convert(args, manifest: Manifest, output) -> int:
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        async def process(path: str, content_hash: str) -> Dict:
+            # The short hash keeps same-named PDFs from different folders apart
+            stem = os.path.splitext(os.path.basename(path))[0]
+            output_path = os.path.join(args.output_dir, f'{stem}_{content_hash[:8]}.docx')
+            result = await asyncio.get_running_loop().run_in_executor(
+                pool, _convert_worker, path, output_path, args.shard_workers
+            )
+            row = {'output_path': result['output_path'], 'page_count': result.get('page_count')}
+            if not result['success']:
+                row['error'] = result['message']
+            return row
+        
+        return asyncio.run(run_pipeline(args.paths, process, manifest, output, args.workers))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m document_ai',
+        description='Extract, summarize and convert documents in bulk'
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('paths', nargs='+', help='Files, directories or glob patterns')
+    common.add_argument('-o', '--output', help='JSON Lines output file (default: stdout)')
+    common.add_argument('--manifest', help='Record completed hashes here and skip them on later runs')
+    common.add_argument('--workers', type=int, default=Config.BATCH_EXTRACT_WORKERS,
+                        help='Extraction/conversion worker processes')
+    
+    commands.add_parser('extract', parents=[common], help='Extract text from documents')
+    
+    ai = argparse.ArgumentParser(add_help=False)
+    ai.add_argument('--concurrency', type=int, default=Config.BATCH_SUMMARY_CONCURRENCY,
+                    help='Documents summarized at once')
+    ai.add_argument('--api-key', default=Config.OPENAI_API_KEY, help='OpenAI API key (default: OPENAI_API_KEY)')
+    
+    summarize = commands.add_parser('summarize', parents=[common, ai], help='Summarize documents')
+    summarize.add_argument('--summary-type', default='comprehensive',
+                           choices=['comprehensive', 'brief', 'bullet_points', 'executive'])
+    summarize.add_argument('--language', default='en', choices=['en', 'km', 'both'])
+    summarize.add_argument('--max-tokens', type=int, default=Config.MAX_TOKENS)
+    
+    commands.add_parser('key-points', parents=[common, ai], help='Extract key points from documents')
+    
+    convert = commands.add_parser('convert', parents=[common], help='Convert PDFs to DOCX')
+    convert.add_argument('--output-dir', default=Config.OUTPUT_FOLDER, help='Where DOCX files are written')
+    convert.add_argument('--shard-workers', type=int, default=1,
+                         help='Processes per conversion (large PDFs are split into page ranges)')
+    
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    
+    extensions = {'pdf'} if args.command == 'convert' else None
+    args.paths = find_documents(args.paths, extensions)
+    if not args.paths:
+        print('No matching documents found', file=sys.stderr)
+        return 1
+    
+    if args.command in ('summarize', 'key-points') and not args.api_key:
+        print('OpenAI API key is required (set OPENAI_API_KEY or pass --api-key)', file=sys.stderr)
+        return 1
+    
+    if args.command == 'summarize':
+        scope = _scope(args.command, model=Config.AI_MODEL, summary_type=args.summary_type,
+                       language=args.language, max_tokens=args.max_tokens)
+    elif args.command == 'key-points':
+        scope = _scope(args.command, model=Config.AI_MODEL)
+    elif args.command == 'convert':
+        scope = _scope(args.command, output_dir=os.path.abspath(args.output_dir))
+    else:
+        scope = _scope(args.command)
+    manifest = Manifest(args.manifest, scope)
+    
+    # Resumed runs extend the previous output instead of replacing it
+    output = open(args.output, 'a' if args.manifest else 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        handler = {'extract': cmd_extract, 'summarize': cmd_summarize,
+                   'key-points': cmd_summarize, 'convert': cmd_convert}[args.command]
+        failed = handler(args, manifest, output)
+    finally:
+        manifest.close()
+        if output is not sys.stdout:
+            output.close()
+    
+    return 1 if failed else 0
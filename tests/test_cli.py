@@ -0,0 +1,53 @@
+import json
+import pytest
+from config import Config
+from utils import state_backend
+from document_ai.cli import main
+
+
+@pytest.fixture
+def documents(tmp_path, monkeypatch):
+    """Three text files, one a copy of another, with caches kept under tmp_path"""
+    monkeypatch.setattr(Config, 'CACHE_FOLDER', str(tmp_path / 'cache'))
+    monkeypatch.setattr(state_backend, '_backend', None)
+    folder = tmp_path / 'docs'
+    folder.mkdir()
+    (folder / 'a.txt').write_text('The first document.\n' * 50)
+    (folder / 'b.txt').write_text('The second document.\n' * 50)
+    (folder / 'copy_of_a.txt').write_text('The first document.\n' * 50)
+    (folder / 'notes.md').write_text('Not a supported document')
+    return folder
+
+
+def run(capsys, *argv):
+    code = main(list(argv))
+    return code, capsys.readouterr().err.splitlines()
+
+
+def test_extract_counts_only_documents_it_processes(documents, tmp_path, capsys):
+    output = tmp_path / 'texts.jsonl'
+    manifest = tmp_path / 'texts.manifest'
+    
+    code, progress = run(capsys, 'extract', str(documents), '-o', str(output),
+                         '--manifest', str(manifest), '--workers', '1')
+    
+    assert code == 0
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row['text'] for row in rows) == ['The first document.\n' * 50, 'The second document.\n' * 50]
+    assert sorted(line.split(']')[0] for line in progress[:-1]) == ['[1/2', '[2/2']
+    assert progress[-1].startswith('2 done, 0 failed, 1 skipped')
+    
+    # A resumed run skips everything in the manifest and appends nothing
+    code, progress = run(capsys, 'extract', str(documents), '-o', str(output),
+                         '--manifest', str(manifest), '--workers', '1')
+    
+    assert code == 0
+    assert progress == ['0 done, 0 failed, 3 skipped (already completed or duplicate)']
+    assert len(output.read_text().splitlines()) == 2
+
+
+def test_no_matching_documents(tmp_path, capsys):
+    code, progress = run(capsys, 'extract', str(tmp_path / 'missing'))
+    
+    assert code == 1
+    assert progress == ['No matching documents found']
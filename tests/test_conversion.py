@@ -0,0 +1,26 @@
+import os
+from config import Config
+from utils.document_processor import DocumentProcessor
+from utils.docx_text import iter_docx_paragraphs
+from benchmarks.corpus import make_pdf
+
+
+def test_sharded_conversion_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'CONVERSION_SHARD_MIN_PAGES', 2)
+    pdf_path = str(tmp_path / 'report.pdf')
+    output_path = str(tmp_path / 'report.docx')
+    make_pdf(pdf_path, 6)
+    progress = []
+    
+    result = DocumentProcessor.convert_pdf_to_docx(
+        pdf_path, output_path, workers=3, progress_callback=lambda done, total: progress.append((done, total))
+    )
+    
+    assert result['success'], result['message']
+    assert result['page_count'] == 6
+    assert progress[-1] == (6, 6) and len(progress) == 3
+    # Shards are merged in page order and removed
+    text = '\n'.join(iter_docx_paragraphs(output_path))
+    positions = [text.index(f'Synthetic Report - Page {page}') for page in range(1, 7)]
+    assert positions == sorted(positions)
+    assert sorted(os.listdir(tmp_path)) == ['report.docx', 'report.pdf']
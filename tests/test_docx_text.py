@@ -0,0 +1,53 @@
+import io
+from docx import Document
+from docx.enum.text import WD_BREAK
+from utils.docx_text import iter_docx_paragraphs, docx_core_properties
+
+
+def sample_docx():
+    """A DOCX with a header, footer, line breaks and a table, as python-docx writes it"""
+    document = Document()
+    document.core_properties.title = 'Service Agreement'
+    section = document.sections[0]
+    section.header.paragraphs[0].text = 'ACME Confidential'
+    section.footer.paragraphs[0].text = 'Footer: internal use only'
+    
+    document.add_paragraph('Opening paragraph')
+    paragraph = document.add_paragraph('First line')
+    run = paragraph.add_run()
+    run.add_break()
+    run.add_text('Second line')
+    run.add_break(WD_BREAK.PAGE)
+    run.add_text('After the page break')
+    
+    table = document.add_table(rows=2, cols=2)
+    for row, values in zip(table.rows, [('Party', 'Role'), ('ACME', 'Supplier')]):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    table.rows[1].cells[1].add_paragraph('Second paragraph in cell')
+    document.add_paragraph('Closing paragraph')
+    
+    data = io.BytesIO()
+    document.save(data)
+    data.seek(0)
+    return data
+
+
+def test_headers_body_tables_and_footers_in_order():
+    paragraphs = list(iter_docx_paragraphs(sample_docx()))
+    
+    assert paragraphs[0] == 'ACME Confidential'
+    assert paragraphs[-1] == 'Footer: internal use only'
+    body = paragraphs[1:-1]
+    assert body.index('Opening paragraph') < body.index('Party\tRole') < body.index('Closing paragraph')
+    assert 'ACME\tSupplier Second paragraph in cell' in body
+
+
+def test_line_breaks_become_newlines_but_page_breaks_do_not():
+    paragraphs = list(iter_docx_paragraphs(sample_docx()))
+    
+    assert 'First line\nSecond lineAfter the page break' in paragraphs
+
+
+def test_core_properties():
+    assert docx_core_properties(sample_docx())['title'] == 'Service Agreement'
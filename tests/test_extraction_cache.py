@@ -0,0 +1,45 @@
+import os
+from utils.extraction_cache import ExtractionCache
+from utils.state_backend import SQLiteBackend
+
+
+def make_cache(tmp_path, max_bytes):
+    return ExtractionCache(str(tmp_path / 'extraction'), max_bytes=max_bytes,
+                           backend=SQLiteBackend(str(tmp_path / 'state.sqlite3')))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=2500)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key * 1000, {'name': key})
+        cache.get_info('a')  # Keep 'a' in use
+    
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c')['text'] == 'c' * 1000
+    assert not os.path.exists(cache.text_path('b'))
+
+
+def test_running_total_tracks_rewrites_and_evictions(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=10 ** 6)
+    cache.put('a', 'x' * 1000, {})
+    cache.put('a', 'x' * 10, {})
+    cache.put('b', 'y' * 500, {})
+    
+    with cache._connect() as conn:
+        total = conn.execute('SELECT size FROM usage').fetchone()[0]
+    on_disk = sum(os.path.getsize(path) for key in ('a', 'b') for path in cache._entry_paths(key))
+    assert total == on_disk
+
+
+def test_entries_from_before_the_index_are_adopted(tmp_path):
+    cache_dir = tmp_path / 'extraction'
+    cache_dir.mkdir()
+    (cache_dir / 'old.txt').write_text('z' * 4000)
+    (cache_dir / 'old.json').write_text('{}')
+    
+    cache = make_cache(tmp_path, max_bytes=3000)
+    cache.put('new', 'n' * 100, {})
+    
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
@@ -0,0 +1,90 @@
+import pytest
+from config import Config
+from utils.ai_summarizer import AISummarizer, split_into_chunks
+from utils.rate_limiter import RequestScheduler
+from utils.response_cache import ResponseCache
+from utils.state_backend import SQLiteBackend
+from benchmarks.stub_openai import start_stub_server
+
+
+CHUNK_TOKENS = 600
+
+
+def document(paragraphs=300, insert_after=None):
+    """Distinct paragraphs of about 50 tokens, optionally with an edit inserted"""
+    lines = [f'Paragraph {n}: ' + ' '.join(f'term{(n * 7 + k) % 97}' for k in range(25)) for n in range(paragraphs)]
+    if insert_after is not None:
+        lines.insert(insert_after + 1, 'An inserted sentence that was not in the first version of the document.')
+    return '\n'.join(lines)
+
+
+@pytest.fixture
+def summarizer(monkeypatch, tmp_path):
+    """Factory of summarizers backed by the stub API, with map-reduce above 2,000 tokens"""
+    monkeypatch.setattr(Config, 'SUMMARY_MAX_INPUT_TOKENS', 2000)
+    monkeypatch.setattr(Config, 'SUMMARY_CHUNK_TOKENS', CHUNK_TOKENS)
+    monkeypatch.setattr(Config, 'COMPRESSION_ENABLED', False)
+    servers = []
+    cache = ResponseCache(SQLiteBackend(str(tmp_path / 'state.sqlite3')))
+    
+    def make(reply=None):
+        server = start_stub_server(reply=reply)
+        servers.append(server)
+        monkeypatch.setattr(Config, 'OPENAI_BASE_URL', f'http://127.0.0.1:{server.server_port}/v1')
+        summarizer = AISummarizer(api_key='test', cache=cache, scheduler=RequestScheduler(0, 0))
+        summarizer.requests = 0
+        complete = summarizer._complete
+        
+        def counted(*args, **kwargs):
+            summarizer.requests += 1
+            return complete(*args, **kwargs)
+        
+        summarizer._complete = counted
+        return summarizer
+    
+    yield make
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_chunk_boundaries_survive_an_insertion_near_the_start():
+    original = split_into_chunks(document(), CHUNK_TOKENS)
+    edited = split_into_chunks(document(insert_after=3), CHUNK_TOKENS)
+    
+    assert len(original) > 10
+    changed = [chunk for chunk in original if chunk not in edited]
+    assert len(changed) <= 2
+    assert original[-1] == edited[-1]
+
+
+def test_revised_document_reuses_unchanged_chunk_summaries(summarizer):
+    ai = summarizer()
+    
+    first = ai.summarize(document())
+    assert first['success'] and first['chunks_reused'] == 0
+    second = ai.summarize(document(insert_after=3))
+    
+    assert second['success']
+    assert second['chunks'] - second['chunks_reused'] <= 2
+
+
+def test_partial_summaries_are_condensed_in_rounds(summarizer):
+    ai = summarizer()
+    
+    result = ai.summarize(document(paragraphs=600))
+    
+    assert result['success']
+    assert result['reduce_rounds'] >= 2
+    assert ai.requests > result['chunks'] + 1
+
+
+def test_condensing_stops_when_a_partial_alone_is_over_budget(summarizer):
+    # Every partial summary is longer than a whole chunk, so grouping them can't shrink anything
+    ai = summarizer(reply='An overlong partial summary. ' * 200)
+    
+    result = ai.summarize(document())
+    
+    assert result['success']
+    assert result['reduce_rounds'] == 1
+    assert ai.requests == result['chunks'] + 1
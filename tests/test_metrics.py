@@ -0,0 +1,41 @@
+import pytest
+from utils import metrics
+from utils.document_processor import DocumentProcessor
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.MetricsRegistry()
+    monkeypatch.setattr(metrics, 'registry', registry)
+    return registry
+
+
+def label_sets(registry, name):
+    return {tuple(key for key, _ in labels) for metric, labels in registry._histograms if metric == name}
+
+
+def test_streamed_and_whole_extraction_share_label_sets(registry, tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('Line one\nLine two\n', encoding='utf-8')
+    
+    DocumentProcessor.extract_text(str(path), 'txt')
+    ''.join(DocumentProcessor.iter_text(str(path), 'txt'))
+    
+    assert label_sets(registry, 'document_extract_seconds') == {('format',)}
+
+
+def test_streamed_extraction_errors_use_the_extract_operation(registry):
+    with pytest.raises(ValueError):
+        list(DocumentProcessor.iter_text(b'', 'odt'))
+    
+    assert [labels for name, labels in registry._counters if name == 'errors_total'] == [
+        (('operation', 'extract_text'), ('type', 'ValueError'))
+    ]
+
+
+def test_label_values_are_escaped(registry):
+    registry.inc('document_uploads_total', file='report "final"\\v2\nscan.pdf')
+    
+    line = next(line for line in registry.render().splitlines() if line.startswith('document_uploads_total{'))
+    
+    assert line == 'document_uploads_total{file="report \\"final\\"\\\\v2\\nscan.pdf"} 1'
@@ -0,0 +1,60 @@
+import os
+from utils.qa_index import QAIndex, split_passages, terms
+from utils.ai_summarizer import AISummarizer
+
+
+TOPICS = ['payment schedule invoices', 'termination notice period', 'confidential information disclosure']
+
+
+def document(paragraphs=30):
+    """Paragraphs that each discuss one topic, in rotation"""
+    return '\n\n'.join(
+        f'Clause {n} covers the {TOPICS[n % len(TOPICS)]}. ' + ' '.join(['The parties agree as follows.'] * 20)
+        for n in range(paragraphs)
+    )
+
+
+def test_passages_cover_the_text():
+    text = document()
+    passages = split_passages(text, words=50, overlap=10)
+    
+    assert passages[0] == text[:len(passages[0])]
+    assert text.endswith(passages[-1])
+    assert all(passage in text for passage in passages)
+
+
+def test_khmer_words_are_indexed_as_bigrams():
+    assert terms('កិច្ចសន្យា') == ['កិ', 'ិច', 'ច្', '្ច', 'ចស', 'សន', 'ន្', '្យ', 'យា']
+    assert terms('Payment TERMS') == ['payment', 'terms']
+
+
+def test_bm25_ranks_matching_passages_first(tmp_path):
+    index = QAIndex.build(document(), str(tmp_path / 'index'))
+    
+    results = index.search('termination notice', k=3)
+    
+    assert len(results) == 3
+    assert all('termination notice' in result['text'] for result in results)
+    assert [result['score'] for result in results] == sorted((result['score'] for result in results), reverse=True)
+    assert index.search('unrelated zebra') == []
+
+
+def test_index_reopens_from_disk(tmp_path):
+    index_dir = str(tmp_path / 'index')
+    built = QAIndex.build(document(), index_dir)
+    
+    reopened = QAIndex(index_dir)
+    
+    assert reopened.passage_count == built.passage_count
+    assert reopened.search('invoices', k=2) == built.search('invoices', k=2)
+    assert not os.path.exists(os.path.join(index_dir, 'vectors.npy'))
+
+
+def test_answer_prompt_names_the_output_language():
+    passages = ['Payment is due in 30 days.']
+    
+    khmer = AISummarizer.answer_messages('When is payment due?', passages, language='km')
+    english = AISummarizer.answer_messages('When is payment due?', passages, language='en')
+    
+    assert khmer != english
+    assert 'Khmer' in ' '.join(message['content'] for message in khmer)
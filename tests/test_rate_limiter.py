@@ -0,0 +1,138 @@
+import random
+import httpx
+import openai
+import pytest
+from config import Config
+from utils import rate_limiter
+from utils.rate_limiter import TokenBucket, RequestScheduler, retry_delay
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping advances the clock instantly"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def api_error(status, headers=None):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    error_class = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return error_class('error', response=response, body=None)
+
+
+def test_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(per_minute=60, burst_seconds=10)
+    assert bucket.capacity == 10
+    
+    assert bucket.wait_time(10, clock.now) == 0
+    bucket.consume(10)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, clock.now, rate_factor=0.5) == pytest.approx(2.0)
+    
+    clock.now += 3
+    assert bucket.wait_time(3, clock.now) == 0
+    clock.now += 1000
+    bucket.wait_time(0, clock.now)
+    assert bucket.level == bucket.capacity
+
+
+def test_oversized_request_waits_for_a_full_bucket_then_leaves_debt(clock):
+    bucket = TokenBucket(per_minute=60, burst_seconds=10)
+    bucket.consume(5)
+    
+    assert bucket.wait_time(50, clock.now) == pytest.approx(5.0)
+    clock.now += 5
+    assert bucket.wait_time(50, clock.now) == 0
+    bucket.consume(50)
+    assert bucket.wait_time(1, clock.now) == pytest.approx(41.0)
+
+
+def test_sessions_are_served_round_robin(clock):
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0)
+    for session, count in (('big', 4), ('small', 1), ('other', 2)):
+        for _ in range(count):
+            scheduler._enqueue(rate_limiter._Ticket(session, 100, lambda: None))
+    
+    served = []
+    while (ticket := scheduler._head()) is not None:
+        assert scheduler._try_grant(ticket) == 0
+        served.append(ticket.session)
+    
+    assert served == ['big', 'small', 'other', 'big', 'other', 'big', 'big']
+
+
+def test_only_the_head_of_the_line_is_admitted(clock):
+    scheduler = RequestScheduler(requests_per_minute=60, tokens_per_minute=0, burst_seconds=1)
+    first = rate_limiter._Ticket('a', 1, lambda: None)
+    second = rate_limiter._Ticket('b', 1, lambda: None)
+    scheduler._enqueue(first)
+    scheduler._enqueue(second)
+    
+    assert scheduler._try_grant(second) is None
+    assert scheduler._try_grant(first) == 0
+    assert scheduler._try_grant(second) == pytest.approx(1.0)
+    clock.now += 1
+    assert scheduler._try_grant(second) == 0
+
+
+def test_backoff_is_jittered_and_grows_per_attempt():
+    random.seed(0)
+    error = api_error(500)
+    
+    for attempt in range(4):
+        delays = {retry_delay(error, attempt) for _ in range(20)}
+        assert len(delays) > 1
+        assert all(0 <= delay <= Config.OPENAI_RETRY_BASE_DELAY * 2 ** attempt for delay in delays)
+    assert retry_delay(api_error(400), 0) is None
+
+
+def test_retry_after_sets_the_minimum_delay():
+    assert retry_delay(api_error(429, {'retry-after': '7'}), 0) == 7
+    assert retry_delay(api_error(429, {'retry-after-ms': '2500'}), 0) == 2.5
+    assert retry_delay(api_error(429, {'retry-after': '3600'}), 0) == Config.OPENAI_RETRY_MAX_DELAY
+
+
+def test_rate_limited_calls_pause_the_scheduler_and_retry(clock):
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0, max_retries=3)
+    responses = [api_error(429, {'retry-after': '7'}), api_error(429, {'retry-after': '7'}), 'ok']
+    
+    def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+    
+    assert scheduler.call(request, cost=10) == 'ok'
+    assert clock.sleeps == [7, 7]
+    assert scheduler._paused_until == clock.now
+    assert scheduler._rate_factor == pytest.approx(0.25 + rate_limiter._RATE_RECOVERY_STEP)
+
+
+def test_retries_give_up_after_max_retries(clock):
+    scheduler = RequestScheduler(requests_per_minute=0, tokens_per_minute=0, max_retries=2)
+    
+    def request():
+        raise api_error(503)
+    
+    with pytest.raises(openai.InternalServerError):
+        scheduler.call(request, cost=10)
+    assert len(clock.sleeps) == 2
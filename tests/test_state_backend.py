@@ -0,0 +1,83 @@
+import time
+import pytest
+from utils.state_backend import StateBackend, SQLiteBackend, RedisBackend
+from benchmarks.stub_redis import start_stub_server
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def backend(request, tmp_path):
+    """Each test runs against both backends; Redis is the local stand-in server"""
+    if request.param == 'sqlite':
+        yield SQLiteBackend(str(tmp_path / 'state.sqlite3'))
+        return
+    pytest.importorskip('redis')
+    server = start_stub_server()
+    yield RedisBackend(f'redis://127.0.0.1:{server.server_address[1]}/0', prefix='test:')
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_put_and_delete(backend):
+    assert backend.get('ns', 'a') is None
+    backend.put('ns', 'a', b'one')
+    backend.put('other', 'a', b'two')
+    
+    assert backend.get('ns', 'a') == b'one'
+    assert backend.get('other', 'a') == b'two'
+    backend.delete('ns', 'a')
+    assert backend.get('ns', 'a') is None
+    assert backend.get('other', 'a') == b'two'
+
+
+def test_put_many_and_get_many(backend):
+    backend.put_many('ns', [('a', b'1'), ('b', b'2'), ('a', b'3')])
+    
+    assert backend.get_many('ns', ['a', 'b', 'missing', 'a']) == {'a': b'3', 'b': b'2'}
+    assert backend.get_many('ns', []) == {}
+
+
+def test_ttl_expires_values(backend):
+    backend.put('ns', 'short', b'x', ttl=1)
+    backend.put('ns', 'long', b'y', ttl=60)
+    
+    assert backend.get('ns', 'short') == b'x'
+    time.sleep(1.2)
+    assert backend.get_many('ns', ['short', 'long']) == {'long': b'y'}
+
+
+def test_max_bytes_evicts_least_recently_used(backend):
+    backend.put_many('ns', [('a', b'x' * 10), ('b', b'x' * 10)], max_bytes=25)
+    time.sleep(0.01)
+    backend.get('ns', 'a')  # Now b is least recently used
+    time.sleep(0.01)
+    backend.put('ns', 'c', b'x' * 10, max_bytes=25)
+    
+    assert set(backend.get_many('ns', ['a', 'b', 'c'])) == {'a', 'c'}
+    assert backend.usage('ns') == (2, 20)
+    # Overwriting a value counts its new size only
+    backend.put('ns', 'a', b'x' * 5, max_bytes=25)
+    assert backend.usage('ns') == (2, 15)
+
+
+def test_counters(backend):
+    assert backend.counters('ns') == {}
+    assert backend.incr('ns', 'hits') == 1
+    assert backend.incr('ns', 'hits', 4) == 5
+    backend.incr('ns', 'misses')
+    
+    assert backend.counters('ns') == {'hits': 5, 'misses': 1}
+
+
+def test_incomplete_backend_fails_on_creation():
+    class NoCounters(StateBackend):
+        def get_many(self, namespace, keys):
+            return {}
+        
+        def put_many(self, namespace, items, ttl=None, max_bytes=None):
+            pass
+        
+        def delete(self, namespace, key):
+            pass
+    
+    with pytest.raises(TypeError):
+        NoCounters()
@@ -0,0 +1,44 @@
+from utils.text_compressor import strip_repeated_lines, compress_text
+
+
+def contract_lines(articles=7):
+    """Contract-style pages: running header, one numbered article each, page footer"""
+    lines = []
+    for page in range(1, articles + 1):
+        lines.append('ACME Services Agreement')
+        lines.append(f'ARTICLE {page}')
+        lines.extend(f'The supplier shall perform obligation {page}.{clause} in good faith.' for clause in range(12))
+        lines.append(f'Page {page} of {articles}')
+    return lines
+
+
+def test_running_headers_and_page_footers_are_removed():
+    lines, removed = strip_repeated_lines(contract_lines())
+    
+    assert removed == 14
+    assert 'ACME Services Agreement' not in lines
+    assert not any(line.startswith('Page ') for line in lines)
+
+
+def test_numbered_headings_survive():
+    lines, _ = strip_repeated_lines(contract_lines())
+    
+    assert [line for line in lines if line.startswith('ARTICLE')] == [f'ARTICLE {n}' for n in range(1, 8)]
+
+
+def test_numbered_headings_survive_compression():
+    text = '\n'.join(
+        f'Section {n}\n' + ' '.join(f'Clause {n}.{k} covers topic {n * 13 + k} of the agreement.' for k in range(10))
+        for n in range(1, 8)
+    )
+    
+    compressed, stats = compress_text(text, ratio=0)
+    
+    assert stats['boilerplate_lines'] == 0
+    assert all(f'Section {n}' in compressed for n in range(1, 8))
+
+
+def test_adjacent_repeats_are_kept():
+    lines = ['Item', 'Total'] * 5
+    
+    assert strip_repeated_lines(lines) == (lines, 0)
@@ -0,0 +1,81 @@
+import pytest
+from utils.token_budget import (
+    fit_text, count_tokens, select_salient_sections, TokenBudgetError, OMISSION_MARKER
+)
+
+
+THEME = ('payment invoice termination liability indemnity warranty confidentiality '
+         'jurisdiction arbitration assignment remedies notice').split()
+
+
+def contract():
+    """An introduction, then substantive clauses alternating with filler sections"""
+    sections = ['Introduction. This agreement is made between the parties named below. ' * 20]
+    for number in range(1, 21):
+        if number % 2:
+            sections.append(f'Clause {number}: ' + ' '.join(THEME * 15))
+        else:
+            sections.append(' '.join([f'filler{number}'] * 250))
+    return '\n'.join(sections), sections
+
+
+def test_text_exactly_at_the_budget_is_sent_unchanged():
+    text, _ = contract()
+    budget = count_tokens(text)
+    
+    for policy in ('reject', 'truncate', 'salient'):
+        fitted, info = fit_text(text, budget, policy)
+        assert fitted == text
+        assert info == {'input_tokens': budget, 'sent_tokens': budget, 'policy': None}
+
+
+def test_one_token_over_is_rejected():
+    text, _ = contract()
+    
+    with pytest.raises(TokenBudgetError):
+        fit_text(text, count_tokens(text) - 1, 'reject')
+
+
+@pytest.mark.parametrize('policy', ['truncate', 'salient'])
+def test_one_token_over_is_fitted_within_budget(policy):
+    text, _ = contract()
+    budget = count_tokens(text) - 1
+    
+    fitted, info = fit_text(text, budget, policy)
+    
+    assert info['policy'] == policy
+    assert info['input_tokens'] == budget + 1
+    assert info['sent_tokens'] == count_tokens(fitted) <= budget
+
+
+def test_truncate_keeps_head_and_tail():
+    text, _ = contract()
+    
+    fitted, info = fit_text(text, 1000, 'truncate')
+    
+    head, tail = fitted.split(OMISSION_MARKER)
+    assert text.startswith(head)
+    assert text.endswith(tail)
+    assert info['sent_tokens'] <= 1000
+
+
+def test_salient_sections_keep_the_best_clauses_within_budget():
+    text, sections = contract()
+    marker_tokens = count_tokens(OMISSION_MARKER)
+    clause_tokens = max(count_tokens(section) for section in sections[1::2])
+    budget = count_tokens(sections[0]) + marker_tokens + 4 * (clause_tokens + marker_tokens)
+    
+    fitted = select_salient_sections(text, budget)
+    
+    assert count_tokens(fitted) <= budget
+    assert fitted.startswith(sections[0])
+    assert fitted.count('Clause ') == 4
+    assert 'filler' not in fitted
+    # Kept clauses stay in document order
+    numbers = [int(part.split(':')[0]) for part in fitted.split('Clause ')[1:]]
+    assert numbers == sorted(numbers)
+
+
+def test_unknown_policy_is_an_error():
+    with pytest.raises(ValueError):
+        fit_text('text', 10, 'summarize')
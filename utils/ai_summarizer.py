@@ -1,21 +1,507 @@
-from openai import OpenAI
-from typing import Optional, Dict
+import math
+import time
+import zlib
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Tuple, Iterator, Awaitable, TypeVar
 from config import Config
+from utils.response_cache import ResponseCache
+from utils.rate_limiter import RequestScheduler, get_scheduler
+from utils.token_budget import (
+    TokenBudgetError, estimate_tokens, count_tokens, count_message_tokens,
+    check_request, prompt_budget, fit_text, price_tokens
+)
+from utils import metrics
+
+# openai, httpx and the NumPy-based compressor are imported on first use, so
+# importing this module (e.g. on a cold start) stays cheap
+
+
+# Output language of answers; any other value answers in the language of the question
+ANSWER_LANGUAGES = {
+    'en': "Answer in English.",
+    'km': "Answer in Khmer language (ភាសាខ្មែរ).",
+    'both': "Answer in both English and Khmer language (ភាសាខ្មែរ), clearly separating each language section."
+}
+
+SYSTEM_PROMPT = "You are an expert multilingual document analyst. Provide clear, accurate, and well-structured summaries in the requested language. You are proficient in English, Khmer (ភាសាខ្មែរ), and other languages."
+
+
+# Content-defined chunk boundaries, as shares of the chunk token budget
+CHUNK_MIN_SHARE = 1 / 3  # No boundary before a chunk reaches this size
+CHUNK_ANCHOR_SHARE = 1 / 3  # Mean distance between boundary lines after that
+
+
+def _is_anchor(line: str, line_tokens: int, anchor_tokens: float) -> bool:
+    """Whether a chunk may end after line: true for about one line per anchor_tokens tokens, by content"""
+    return bool(line.strip()) and zlib.crc32(line.encode('utf-8')) < line_tokens / anchor_tokens * 2 ** 32
+
+
+def expected_chunk_tokens(max_tokens: int) -> float:
+    """Mean chunk size of split_into_chunks() on long text, for cost estimates"""
+    min_tokens = max_tokens * CHUNK_MIN_SHARE
+    anchor_tokens = max_tokens * CHUNK_ANCHOR_SHARE
+    return min_tokens + anchor_tokens * (1 - math.exp(-(max_tokens - min_tokens) / anchor_tokens))
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text on paragraph boundaries into chunks of at most max_tokens
+    
+    Boundaries are content-defined: past CHUNK_MIN_SHARE of the budget, a
+    chunk ends after a line whose hash marks it as an anchor. An edit to a
+    document then changes only the chunks around it, and the summaries of
+    all other chunks are reused from the response cache.
+    """
+    min_tokens = max_tokens * CHUNK_MIN_SHARE
+    anchor_tokens = max(1.0, max_tokens * CHUNK_ANCHOR_SHARE)
+    chunks = []
+    current = []
+    current_tokens = 0
+    
+    for paragraph in text.split('\n'):
+        paragraph_tokens = estimate_tokens(paragraph)
+        
+        # Hard-split paragraphs that alone exceed the budget
+        if paragraph_tokens > max_tokens:
+            if current:
+                chunks.append('\n'.join(current))
+                current, current_tokens = [], 0
+            step = max(1, len(paragraph) * max_tokens // paragraph_tokens)
+            for start in range(0, len(paragraph), step):
+                chunks.append(paragraph[start:start + step])
+            continue
+        
+        if current and current_tokens + paragraph_tokens > max_tokens:
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+        if current_tokens >= min_tokens and _is_anchor(paragraph, paragraph_tokens, anchor_tokens):
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+    
+    if current:
+        chunks.append('\n'.join(current))
+    return [chunk for chunk in chunks if chunk.strip()]
+
+
+def next_reduce_groups(partials: List[str]) -> Optional[List[str]]:
+    """
+    Plan the next tree-reduce round of map-reduce summarization
+    
+    Returns:
+        Groups of partial summaries to condense, or None once the partials
+        fit one request (or a round would no longer shrink them)
+    """
+    if len(partials) <= 1 or estimate_tokens('\n\n'.join(partials)) <= Config.SUMMARY_CHUNK_TOKENS:
+        return None
+    groups = split_into_chunks('\n\n'.join(partials), Config.SUMMARY_CHUNK_TOKENS)
+    if len(groups) >= len(partials):
+        return None  # Each partial alone fills a chunk; further rounds won't shrink it
+    return groups
+
+
+def map_reduce_result(
+    summary: str,
+    tokens_used: int,
+    summary_type: str,
+    language: str,
+    condensed: Tuple[List[str], int, int, int, int]
+) -> Dict:
+    """summarize_map_reduce() result from the final summary and the _condense() output"""
+    _, _, chunk_count, chunks_reused, reduce_rounds = condensed
+    return {
+        'success': True,
+        'summary': summary,
+        'model': Config.AI_MODEL,
+        'tokens_used': tokens_used,
+        'summary_type': summary_type,
+        'language': language,
+        'chunks': chunk_count,
+        'chunks_reused': chunks_reused,
+        'reduce_rounds': reduce_rounds
+    }
+
+
+_response_cache = None
+
+
+def default_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None if caching is disabled"""
+    global _response_cache
+    if not Config.RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def budget_fields(fit_info: Dict) -> Dict:
+    """Result fields describing how the input was compressed or fitted (empty if it was sent whole)"""
+    fields = {}
+    compression = fit_info.get('compression')
+    if compression and compression['compressed_tokens'] < compression['original_tokens']:
+        fields['compression'] = compression
+    if fit_info['policy']:
+        fields.update(
+            input_policy=fit_info['policy'],
+            input_tokens=fit_info['input_tokens'],
+            sent_tokens=fit_info['sent_tokens']
+        )
+    return fields
+
+
+def record_usage(usage) -> int:
+    """Count prompt and completion tokens from response.usage, returning the total"""
+    metrics.inc('llm_tokens_total', usage.prompt_tokens, kind='prompt', model=Config.AI_MODEL)
+    metrics.inc('llm_tokens_total', usage.completion_tokens, kind='completion', model=Config.AI_MODEL)
+    return usage.total_tokens
 
 
 class AISummarizer:
     """Handles AI-powered document summarization using OpenAI"""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize OpenAI client"""
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        session_id: str = 'default',
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Initialize OpenAI client
+        
+        Args:
+            api_key: OpenAI API key (defaults to Config.OPENAI_API_KEY)
+            cache: Response cache (defaults to the on-disk cache when Config.RESPONSE_CACHE_ENABLED)
+            session_id: Fair-queuing key for the shared request scheduler
+            scheduler: Rate limiter and retry scheduler (defaults to the process-wide one)
+        """
+        from openai import OpenAI
+        
         self.api_key = api_key or Config.OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
-        self.client = OpenAI(api_key=self.api_key)
+        # Retries are handled by the scheduler, which also respects the shared rate limits
+        self.client = OpenAI(api_key=self.api_key, base_url=Config.OPENAI_BASE_URL, max_retries=0)
+        self.cache = cache or default_response_cache()
+        self.session_id = session_id
+        self.scheduler = scheduler or get_scheduler()
+    
+    @staticmethod
+    def build_prompt(summary_type: str, language: str) -> str:
+        """Build the instruction prompt for a summary type and output language"""
+        # Language-specific instructions
+        language_instructions = {
+            'en': "",
+            'km': "Please provide the summary in Khmer language (ភាសាខ្មែរ). ",
+            'both': "Please provide the summary in both English and Khmer language (ភាសាខ្មែរ), clearly separating each language section. "
+        }
+        
+        lang_instruction = language_instructions.get(language, "")
+        
+        # Prepare prompt based on summary type
+        prompts = {
+            'brief': f"{lang_instruction}Provide a brief 2-3 sentence summary of the following document:",
+            'comprehensive': f"{lang_instruction}Provide a comprehensive summary of the following document, covering all main points and key details:",
+            'bullet_points': f"{lang_instruction}Summarize the following document in clear bullet points, highlighting the main ideas:",
+            'executive': f"{lang_instruction}Create an executive summary of the following document, suitable for business stakeholders:"
+        }
+        
+        return prompts.get(summary_type, prompts['comprehensive'])
+    
+    @staticmethod
+    def summary_messages(text: str, summary_type: str, language: str) -> List[Dict]:
+        """Chat messages for a single-request summary"""
+        prompt = AISummarizer.build_prompt(summary_type, language)
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"{prompt}\n\n{text}"
+            }
+        ]
+    
+    @staticmethod
+    def section_messages(section: str, index: int, total: int) -> List[Dict]:
+        """Chat messages for summarizing one section in the map step"""
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"Summarize part {index} of {total} of a larger document. Keep all main points, key details, names and figures, writing in the same language as the text:\n\n{section}"
+            }
+        ]
+    
+    @staticmethod
+    def reduce_messages(partials: List[str], summary_type: str, language: str) -> List[Dict]:
+        """Chat messages for combining section summaries in the reduce step"""
+        prompt = AISummarizer.build_prompt(summary_type, language)
+        return [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": f"{prompt}\n\n(The document is given as summaries of its consecutive sections.)\n\n" + '\n\n'.join(partials)
+            }
+        ]
+    
+    @staticmethod
+    def key_point_messages(text: str) -> List[Dict]:
+        """Chat messages for key point extraction"""
+        return [
+            {
+                "role": "system",
+                "content": "You are an expert at identifying key information in documents."
+            },
+            {
+                "role": "user",
+                "content": f"Extract the key points, main topics, and important details from this document:\n\n{text}"
+            }
+        ]
+    
+    @staticmethod
+    def answer_messages(question: str, passages: List[str], language: Optional[str] = None) -> List[Dict]:
+        """Chat messages for answering a question from retrieved passages"""
+        excerpts = '\n\n'.join(f'[{number}] {passage}' for number, passage in enumerate(passages, start=1))
+        language_instruction = ANSWER_LANGUAGES.get(language, "Answer in the language of the question.")
+        return [
+            {
+                "role": "system",
+                "content": f"{SYSTEM_PROMPT} Answer questions about a document using only the numbered excerpts given, citing them like [1]. If the excerpts do not contain the answer, say so. {language_instruction}"
+            },
+            {
+                "role": "user",
+                "content": f"Excerpts:\n\n{excerpts}\n\nQuestion: {question}"
+            }
+        ]
+    
+    @staticmethod
+    def summary_cache_key(text: str, summary_type: str, max_tokens: Optional[int], language: str) -> str:
+        """Response cache key for a summary request"""
+        return ResponseCache.make_key(
+            text,
+            task='summary',
+            prompt=AISummarizer.summary_messages('', summary_type, language),
+            summary_type=summary_type,
+            language=language,
+            max_tokens=max_tokens or Config.MAX_TOKENS,
+            model=Config.AI_MODEL,
+            temperature=Config.TEMPERATURE,
+            input_policy=Config.INPUT_POLICY,
+            max_prompt_tokens=Config.MAX_PROMPT_TOKENS,
+            compression_ratio=Config.COMPRESSION_RATIO if Config.COMPRESSION_ENABLED else None,
+            # Long documents are summarized by map-reduce with these settings
+            max_input_tokens=Config.SUMMARY_MAX_INPUT_TOKENS,
+            chunk_tokens=Config.SUMMARY_CHUNK_TOKENS,
+            section_max_tokens=Config.SUMMARY_SECTION_MAX_TOKENS
+        )
+    
+    @staticmethod
+    def section_cache_key(section: str) -> str:
+        """
+        Response cache key for one map-step section summary
+        
+        The part number is left out, so an unchanged section of a revised
+        document is reused even when sections before it were added or removed.
+        """
+        return ResponseCache.make_key(
+            section,
+            task='section',
+            prompt=AISummarizer.section_messages('', 0, 0),
+            max_tokens=Config.SUMMARY_SECTION_MAX_TOKENS,
+            model=Config.AI_MODEL,
+            temperature=Config.TEMPERATURE
+        )
+    
+    @staticmethod
+    def key_points_cache_key(text: str) -> str:
+        """Response cache key for a key point request"""
+        return ResponseCache.make_key(
+            text,
+            task='key_points',
+            prompt=AISummarizer.key_point_messages(''),
+            max_tokens=Config.KEY_POINTS_MAX_TOKENS,
+            model=Config.AI_MODEL,
+            temperature=0.5,
+            input_policy=Config.INPUT_POLICY,
+            max_prompt_tokens=Config.MAX_PROMPT_TOKENS,
+            compression_ratio=Config.COMPRESSION_RATIO if Config.COMPRESSION_ENABLED else None
+        )
+    
+    @staticmethod
+    def compress_input(text: str) -> Tuple[str, Optional[Dict]]:
+        """
+        Compress long document text locally
+        
+        Texts over Config.COMPRESSION_MIN_TOKENS lose running headers,
+        footers and duplicate paragraphs (and, with Config.COMPRESSION_RATIO,
+        their least central paragraphs); see compress_text().
+        
+        Returns:
+            (text, compression stats or None if it was left as is)
+        """
+        if not Config.COMPRESSION_ENABLED or estimate_tokens(text) <= Config.COMPRESSION_MIN_TOKENS:
+            return text, None
+        from utils.text_compressor import compress_text
+        
+        return compress_text(text)
+    
+    @staticmethod
+    def fit_input(text: str, messages: List[Dict], max_tokens: int) -> Tuple[str, Dict]:
+        """
+        Compress long document text, then apply Config.INPUT_POLICY if it is still over the prompt budget
+        
+        Args:
+            text: Document text
+            messages: The request's messages without the document text
+            max_tokens: Response length requested
+        
+        Returns:
+            (text to send, fit info) as returned by fit_text(), plus
+            'compression' stats when the text was compressed
+        
+        Raises:
+            TokenBudgetError: If the text is over budget and the policy is 'reject'
+        """
+        text, compression = AISummarizer.compress_input(text)
+        text, fit_info = fit_text(text, prompt_budget(max_tokens, count_message_tokens(messages)))
+        return text, dict(fit_info, compression=compression)
     
+    @staticmethod
+    def prepare_summary_input(
+        text: str,
+        summary_type: str,
+        max_tokens: Optional[int],
+        language: str
+    ) -> Tuple[str, Dict, bool]:
+        """
+        Compress text for summarize() and choose between one request and map-reduce
+        
+        Texts over Config.SUMMARY_MAX_INPUT_TOKENS are kept whole for
+        map-reduce, whose chunk and reduce requests are each within budget;
+        only a single-request summary is fitted with Config.INPUT_POLICY.
+        
+        Returns:
+            (text, fit info as from fit_input(), whether to map-reduce)
+        
+        Raises:
+            TokenBudgetError: If a single-request text is over budget and the policy is 'reject'
+        """
+        text, compression = AISummarizer.compress_input(text)
+        input_tokens = count_tokens(text)
+        if input_tokens > Config.SUMMARY_MAX_INPUT_TOKENS:
+            return text, {'input_tokens': input_tokens, 'sent_tokens': input_tokens, 'policy': None,
+                          'compression': compression}, True
+        
+        overhead = count_message_tokens(AISummarizer.summary_messages('', summary_type, language))
+        text, fit_info = fit_text(text, prompt_budget(max_tokens or Config.MAX_TOKENS, overhead))
+        return text, dict(fit_info, compression=compression), False
+    
+    @staticmethod
+    def fitted_reduce_messages(partials: List[str], summary_type: str, max_tokens: int, language: str) -> List[Dict]:
+        """
+        reduce_messages() with the partial summaries fitted into the prompt budget
+        
+        The tree reduce stops once further rounds would not shrink the
+        partials, which may leave them over budget.
+        
+        Raises:
+            TokenBudgetError: If the partials are over budget and the policy is 'reject'
+        """
+        overhead = count_message_tokens(AISummarizer.reduce_messages([], summary_type, language))
+        # Text within budget comes back unchanged, and reduce_messages() joins partials the same way
+        joined, _ = fit_text('\n\n'.join(partials), prompt_budget(max_tokens, overhead))
+        return AISummarizer.reduce_messages([joined], summary_type, language)
+    
+    @staticmethod
+    def estimate_cost(
+        text_tokens: int,
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en",
+        include_key_points: bool = True
+    ) -> Dict:
+        """
+        Upper-bound the tokens and cost of analyzing a document, without calling the API
+        
+        Follows the same plan as summarize(): map requests over the whole
+        document plus a reduce beyond Config.SUMMARY_MAX_INPUT_TOKENS (rare
+        extra tree-reduce rounds are not counted), else one request within
+        the input policy's budget. Responses are counted at their maximum length.
+        
+        Args:
+            text_tokens: Document size, from utils.token_budget.count_tokens()
+        
+        Returns:
+            Dictionary with 'input_tokens', 'output_tokens', 'requests',
+            'cost_usd' and 'fits' (False if the document is over the prompt budget)
+        """
+        max_tokens = max_tokens or Config.MAX_TOKENS
+        
+        overhead = count_message_tokens(AISummarizer.summary_messages('', summary_type, language))
+        fits = True
+        if text_tokens > Config.SUMMARY_MAX_INPUT_TOKENS:
+            # Map requests over all chunks, then one reduce over their summaries
+            chunks = math.ceil(text_tokens / expected_chunk_tokens(Config.SUMMARY_CHUNK_TOKENS))
+            section_overhead = count_message_tokens(AISummarizer.section_messages('', chunks, chunks))
+            partials_tokens = chunks * Config.SUMMARY_SECTION_MAX_TOKENS
+            input_tokens = text_tokens + chunks * section_overhead + overhead + partials_tokens
+            output_tokens = partials_tokens + max_tokens
+            requests = chunks + 1
+        else:
+            budget = prompt_budget(max_tokens, overhead)
+            input_tokens = overhead + min(text_tokens, budget)
+            output_tokens = max_tokens
+            requests = 1
+            fits = text_tokens <= budget
+        
+        if include_key_points:
+            overhead = count_message_tokens(AISummarizer.key_point_messages(''))
+            budget = prompt_budget(Config.KEY_POINTS_MAX_TOKENS, overhead)
+            input_tokens += overhead + min(text_tokens, budget)
+            output_tokens += Config.KEY_POINTS_MAX_TOKENS
+            requests += 1
+            fits = fits and text_tokens <= budget
+        
+        return {
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'requests': requests,
+            'cost_usd': price_tokens(input_tokens, output_tokens),
+            'fits': fits
+        }
+    
+    def _complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Tuple[str, int]:
+        """Run one chat completion through the scheduler, returning the content and total tokens used"""
+        @metrics.timed('llm_request_seconds', operation='llm_request', model=Config.AI_MODEL)
+        def request():
+            return self.client.chat.completions.create(
+                model=Config.AI_MODEL,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        
+        # Fail before queueing if the request cannot fit the context window
+        prompt_tokens = check_request(messages, max_tokens)
+        response = self.scheduler.call(request, prompt_tokens + max_tokens, self.session_id)
+        return response.choices[0].message.content.strip(), record_usage(response.usage)
+    
+    @metrics.timed('summarize_seconds', operation='summarize')
     def summarize(
-        self, 
-        text: str, 
+        self,
+        text: str,
         summary_type: str = "comprehensive",
         max_tokens: int = None,
         language: str = "en"
@@ -23,12 +509,15 @@ class AISummarizer:
         """
         Summarize text using OpenAI API with language support
         
+        Texts longer than Config.SUMMARY_MAX_INPUT_TOKENS are summarized
+        with summarize_map_reduce() instead of a single request.
+        
         Args:
             text: The text to summarize
             summary_type: Type of summary ('brief', 'comprehensive', 'bullet_points')
             max_tokens: Maximum tokens for the response
             language: Output language ('en' for English, 'km' for Khmer, etc.)
-            
+        
         Returns:
             Dictionary with summary and metadata
         """
@@ -39,53 +528,90 @@ class AISummarizer:
                 'error': 'No text provided for summarization'
             }
         
-        # Language-specific instructions
-        language_instructions = {
-            'en': "",
-            'km': "Please provide the summary in Khmer language (ភាសាខ្មែរ). ",
-            'both': "Please provide the summary in both English and Khmer language (ភាសាខ្មែរ), clearly separating each language section. "
-        }
-        
-        lang_instruction = language_instructions.get(language, "")
+        cache_key = self.summary_cache_key(text, summary_type, max_tokens, language)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                metrics.inc('llm_cache_hits_total')
+                return dict(cached, cached=True)
         
-        # Prepare prompt based on summary type
-        prompts = {
-            'brief': f"{lang_instruction}Provide a brief 2-3 sentence summary of the following document:",
-            'comprehensive': f"{lang_instruction}Provide a comprehensive summary of the following document, covering all main points and key details:",
-            'bullet_points': f"{lang_instruction}Summarize the following document in clear bullet points, highlighting the main ideas:",
-            'executive': f"{lang_instruction}Create an executive summary of the following document, suitable for business stakeholders:"
-        }
+        try:
+            text, fit_info, map_reduce = self.prepare_summary_input(text, summary_type, max_tokens, language)
+        except TokenBudgetError as e:
+            return {
+                'success': False,
+                'summary': '',
+                'error': str(e)
+            }
         
-        prompt = prompts.get(summary_type, prompts['comprehensive'])
+        if map_reduce:
+            result = self.summarize_map_reduce(text, summary_type, max_tokens, language)
+        else:
+            result = self._summarize_single(text, summary_type, max_tokens, language)
+        result.update(budget_fields(fit_info))
         
+        if self.cache and result['success']:
+            self.cache.put(cache_key, result)
+        return result
+    
+    def _summarize_single(self, text: str, summary_type: str, max_tokens: Optional[int], language: str) -> Dict[str, str]:
+        """Summarize text that fits in one request"""
         try:
-            response = self.client.chat.completions.create(
-                model=Config.AI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert multilingual document analyst. Provide clear, accurate, and well-structured summaries in the requested language. You are proficient in English, Khmer (ភាសាខ្មែរ), and other languages."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"{prompt}\n\n{text}"
-                    }
-                ],
+            summary, tokens_used = self._complete(
+                messages=self.summary_messages(text, summary_type, language),
                 max_tokens=max_tokens or Config.MAX_TOKENS,
                 temperature=Config.TEMPERATURE
             )
             
-            summary = response.choices[0].message.content.strip()
-            
             return {
                 'success': True,
                 'summary': summary,
                 'model': Config.AI_MODEL,
-                'tokens_used': response.usage.total_tokens,
+                'tokens_used': tokens_used,
                 'summary_type': summary_type,
                 'language': language
             }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'summary': '',
+                'error': f'Summarization failed: {str(e)}'
+            }
+    
+    def summarize_map_reduce(
+        self,
+        text: str,
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en"
+    ) -> Dict[str, str]:
+        """
+        Summarize a long document in map-reduce fashion
+        
+        The text is split into token-budgeted chunks that are summarized
+        concurrently (map). The partial summaries are then combined with the
+        requested summary type and language (reduce). If the partials are
+        still too long for one request, they are condensed in further
+        rounds first (tree reduce). Chunk summaries are cached, so for a
+        revised document only changed chunks and the reduce are re-run.
+        
+        Returns:
+            Same dictionary as summarize(), plus 'chunks', 'chunks_reused'
+            and 'reduce_rounds'
+        """
+        try:
+            condensed = self._condense(text)
+            partials, tokens_used = condensed[:2]
+            
+            summary, final_tokens = self._complete(
+                messages=self.fitted_reduce_messages(partials, summary_type, max_tokens or Config.MAX_TOKENS, language),
+                max_tokens=max_tokens or Config.MAX_TOKENS,
+                temperature=Config.TEMPERATURE
+            )
             
+            return map_reduce_result(summary, tokens_used + final_tokens, summary_type, language, condensed)
+        
         except Exception as e:
             return {
                 'success': False,
@@ -93,38 +619,632 @@ class AISummarizer:
                 'error': f'Summarization failed: {str(e)}'
             }
     
+    def _condense(self, text: str) -> Tuple[List[str], int, int, int, int]:
+        """
+        Run the map step and any tree-reduce rounds of map-reduce summarization
+        
+        Returns:
+            (partial summaries, tokens used, chunk count, chunks reused from cache, reduce rounds)
+        """
+        chunks = split_into_chunks(text, Config.SUMMARY_CHUNK_TOKENS)
+        partials, tokens_used, chunks_reused = self._summarize_sections(chunks)
+        
+        # Tree reduce: condense groups of partials until they fit one request
+        reduce_rounds = 1
+        groups = next_reduce_groups(partials)
+        while groups:
+            partials, round_tokens, _ = self._summarize_sections(groups)
+            tokens_used += round_tokens
+            reduce_rounds += 1
+            groups = next_reduce_groups(partials)
+        
+        return partials, tokens_used, len(chunks), chunks_reused, reduce_rounds
+    
+    def summarize_stream(
+        self,
+        text: str,
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en"
+    ) -> Iterator[Dict]:
+        """
+        Stream a summary as it is generated
+        
+        Yields {'type': 'delta', 'text': ...} events while the completion
+        streams, then one {'type': 'result', 'result': ...} event carrying
+        the same dictionary summarize() returns, including token usage.
+        Long texts run the map step first and stream the final reduce.
+        """
+        if not text or len(text.strip()) == 0:
+            yield {'type': 'result', 'result': {
+                'success': False,
+                'summary': '',
+                'error': 'No text provided for summarization'
+            }}
+            return
+        
+        cache_key = self.summary_cache_key(text, summary_type, max_tokens, language)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                metrics.inc('llm_cache_hits_total')
+                yield {'type': 'delta', 'text': cached['summary']}
+                yield {'type': 'result', 'result': dict(cached, cached=True)}
+                return
+        
+        try:
+            text, fit_info, map_reduce = self.prepare_summary_input(text, summary_type, max_tokens, language)
+            tokens_used = 0
+            map_reduce_info = {}
+            if map_reduce:
+                partials, tokens_used, chunk_count, chunks_reused, reduce_rounds = self._condense(text)
+                messages = self.fitted_reduce_messages(partials, summary_type, max_tokens or Config.MAX_TOKENS, language)
+                map_reduce_info = {'chunks': chunk_count, 'chunks_reused': chunks_reused, 'reduce_rounds': reduce_rounds}
+            else:
+                messages = self.summary_messages(text, summary_type, language)
+            
+            # Rate limits and retries apply until the stream opens; mid-stream errors are not retried
+            request_start = time.perf_counter()
+            stream = self.scheduler.call(
+                lambda: self.client.chat.completions.create(
+                    model=Config.AI_MODEL,
+                    messages=messages,
+                    max_tokens=max_tokens or Config.MAX_TOKENS,
+                    temperature=Config.TEMPERATURE,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                ),
+                check_request(messages, max_tokens or Config.MAX_TOKENS) + (max_tokens or Config.MAX_TOKENS),
+                self.session_id
+            )
+            
+            parts = []
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not parts:
+                        metrics.observe('llm_first_token_seconds', time.perf_counter() - request_start,
+                                        model=Config.AI_MODEL)
+                    parts.append(chunk.choices[0].delta.content)
+                    yield {'type': 'delta', 'text': parts[-1]}
+                # Usage arrives on the final chunk, which has no choices
+                if chunk.usage:
+                    tokens_used += record_usage(chunk.usage)
+            metrics.observe('llm_request_seconds', time.perf_counter() - request_start, model=Config.AI_MODEL)
+            
+            result = {
+                'success': True,
+                'summary': "".join(parts).strip(),
+                'model': Config.AI_MODEL,
+                'tokens_used': tokens_used,
+                'summary_type': summary_type,
+                'language': language,
+                **map_reduce_info,
+                **budget_fields(fit_info)
+            }
+        
+        except Exception as e:
+            metrics.record_error('summarize_stream', e)
+            yield {'type': 'result', 'result': {
+                'success': False,
+                'summary': '',
+                'error': f'Summarization failed: {str(e)}'
+            }}
+            return
+        
+        if self.cache:
+            self.cache.put(cache_key, result)
+        yield {'type': 'result', 'result': result}
+    
+    def _summarize_sections(self, sections: List[str]) -> Tuple[List[str], int, int]:
+        """
+        Summarize sections concurrently, reusing cached section summaries
+        
+        Returns:
+            (summaries in section order, tokens used, sections served from the cache)
+        """
+        def summarize_section(indexed_section):
+            index, section = indexed_section
+            cache_key = self.section_cache_key(section)
+            cached = self.cache.get(cache_key) if self.cache else None
+            if cached:
+                metrics.inc('llm_cache_hits_total')
+                return cached['summary'], 0, True
+            summary, tokens_used = self._complete(
+                messages=self.section_messages(section, index, len(sections)),
+                max_tokens=Config.SUMMARY_SECTION_MAX_TOKENS,
+                temperature=Config.TEMPERATURE
+            )
+            if self.cache:
+                self.cache.put(cache_key, {'summary': summary, 'tokens_used': tokens_used})
+            return summary, tokens_used, False
+        
+        with ThreadPoolExecutor(max_workers=Config.SUMMARY_CONCURRENCY) as executor:
+            results = list(executor.map(summarize_section, enumerate(sections, start=1)))
+        
+        return ([summary for summary, _, _ in results], sum(tokens for _, tokens, _ in results),
+                sum(1 for _, _, reused in results if reused))
+    
+    @metrics.timed('key_points_seconds', operation='key_points')
     def extract_key_points(self, text: str) -> Dict[str, any]:
         """Extract key points from the document"""
+        cache_key = self.key_points_cache_key(text)
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                metrics.inc('llm_cache_hits_total')
+                return dict(cached, cached=True)
+        
         try:
-            response = self.client.chat.completions.create(
-                model=Config.AI_MODEL,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an expert at identifying key information in documents."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Extract the key points, main topics, and important details from this document:\n\n{text}"
-                    }
-                ],
-                max_tokens=800,
+            text, fit_info = self.fit_input(text, self.key_point_messages(''), Config.KEY_POINTS_MAX_TOKENS)
+        except TokenBudgetError as e:
+            return {
+                'success': False,
+                'key_points': '',
+                'error': str(e)
+            }
+        
+        try:
+            key_points, tokens_used = self._complete(
+                messages=self.key_point_messages(text),
+                max_tokens=Config.KEY_POINTS_MAX_TOKENS,
                 temperature=0.5
             )
             
-            key_points = response.choices[0].message.content.strip()
+            result = {
+                'success': True,
+                'key_points': key_points,
+                'tokens_used': tokens_used,
+                **budget_fields(fit_info)
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'key_points': '',
+                'error': f'Key point extraction failed: {str(e)}'
+            }
+        
+        if self.cache:
+            self.cache.put(cache_key, result)
+        return result
+    
+    def answer(self, question: str, passages: List[str], language: Optional[str] = None) -> Dict[str, any]:
+        """
+        Answer a question from passages retrieved from the document
+        
+        Only the passages are sent, not the document, so a follow-up
+        question costs a few hundred prompt tokens whatever the document length.
+        
+        Args:
+            question: The user's question
+            passages: Most relevant passages, best first (see utils.qa_index)
+            language: Answer language ('en', 'km' or 'both'; defaults to the
+                language of the question)
+        
+        Returns:
+            Dictionary with 'success', 'answer', 'tokens_used' and 'passages' (the count sent)
+        """
+        if not question or not question.strip():
+            return {
+                'success': False,
+                'answer': '',
+                'error': 'No question provided'
+            }
+        
+        cache_key = ResponseCache.make_key(
+            question.strip(),
+            task='answer',
+            prompt=self.answer_messages('', [], language),
+            passages=passages,
+            max_tokens=Config.QA_MAX_TOKENS,
+            model=Config.AI_MODEL,
+            temperature=0.2
+        )
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached:
+                metrics.inc('llm_cache_hits_total')
+                return dict(cached, cached=True)
+        
+        try:
+            answer, tokens_used = self._complete(
+                messages=self.answer_messages(question.strip(), passages, language),
+                max_tokens=Config.QA_MAX_TOKENS,
+                temperature=0.2
+            )
+            
+            result = {
+                'success': True,
+                'answer': answer,
+                'tokens_used': tokens_used,
+                'passages': len(passages)
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'answer': '',
+                'error': f'Answering failed: {str(e)}'
+            }
+        
+        if self.cache:
+            self.cache.put(cache_key, result)
+        return result
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with Config.EMBEDDING_MODEL, in batches through the scheduler
+        
+        Returns:
+            One vector per text, in order
+        """
+        vectors = []
+        for start in range(0, len(texts), Config.EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + Config.EMBEDDING_BATCH_SIZE]
+            
+            @metrics.timed('llm_request_seconds', operation='embed', model=Config.EMBEDDING_MODEL)
+            def request():
+                return self.client.embeddings.create(model=Config.EMBEDDING_MODEL, input=batch)
+            
+            response = self.scheduler.call(request, sum(estimate_tokens(text) for text in batch), self.session_id)
+            metrics.inc('llm_tokens_total', response.usage.prompt_tokens, kind='prompt', model=Config.EMBEDDING_MODEL)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+
+T = TypeVar('T')
+
+# Process-wide event loop for synchronous callers, and the pooled AsyncOpenAI
+# clients bound to it (one per API key and endpoint)
+_async_loop = None
+_async_clients: Dict[Tuple[str, Optional[str]], object] = {}
+_async_lock = threading.Lock()
+
+
+def _new_async_client(api_key: str):
+    """AsyncOpenAI client with its own pooled HTTP connections"""
+    import httpx
+    from openai import AsyncOpenAI
+    
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=Config.OPENAI_BASE_URL,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_CONNECTIONS
+            ),
+            timeout=Config.HTTP_TIMEOUT
+        ),
+        max_retries=0  # Retries go through the scheduler
+    )
+
+
+def run_async(coroutine: Awaitable[T]) -> T:
+    """
+    Run a coroutine on the process-wide event loop and wait for its result
+    
+    The loop runs in a daemon thread started on first use. AsyncAISummarizer
+    instances created on it share one pooled client, so connections are
+    reused across analyses instead of being opened on every call.
+    """
+    global _async_loop
+    with _async_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            threading.Thread(target=_async_loop.run_forever, name='async-llm', daemon=True).start()
+    future = asyncio.run_coroutine_threadsafe(coroutine, _async_loop)
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()  # E.g. the Streamlit script was stopped while waiting
+        raise
+
+
+class AsyncAISummarizer:
+    """
+    Asynchronous summarizer built on AsyncOpenAI
+    
+    All requests go through one pooled HTTP client, so independent calls for
+    the same document (summaries, key points) run concurrently and a full
+    analysis takes about as long as its slowest request. On the process-wide
+    loop of run_async(), that client is shared by every summarizer; on any
+    other loop (e.g. asyncio.run() in a batch or CLI run) each summarizer
+    owns one and closes it in aclose().
+    
+    Prompt building, budgeting and tree-reduce planning are shared with
+    AISummarizer. Response cache lookups and local text compression run in
+    worker threads, so they never block the event loop.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        session_id: str = 'default',
+        scheduler: Optional[RequestScheduler] = None
+    ):
+        """
+        Initialize the AsyncOpenAI client
+        
+        Args:
+            api_key: OpenAI API key (defaults to Config.OPENAI_API_KEY)
+            cache: Response cache (defaults to the shared cache, if enabled)
+            session_id: Fair-queuing key for the shared request scheduler
+            scheduler: Rate limiter and retry scheduler (defaults to the process-wide one)
+        """
+        self.cache = cache or default_response_cache()
+        self.api_key = api_key or Config.OPENAI_API_KEY
+        if not self.api_key:
+            raise ValueError("OpenAI API key is required")
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        self._owns_client = loop is None or loop is not _async_loop
+        if self._owns_client:
+            self.client = _new_async_client(self.api_key)
+        else:
+            with _async_lock:
+                key = (self.api_key, Config.OPENAI_BASE_URL)
+                if key not in _async_clients:
+                    _async_clients[key] = _new_async_client(self.api_key)
+                self.client = _async_clients[key]
+        self._semaphore = asyncio.Semaphore(Config.SUMMARY_CONCURRENCY)
+        self.session_id = session_id
+        self.scheduler = scheduler or get_scheduler()
+    
+    async def aclose(self):
+        """Close the pooled HTTP client, unless it is the shared one"""
+        if self._owns_client:
+            await self.client.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    async def _cache_get(self, cache_key: str) -> Optional[Dict]:
+        """Look up a cached response in a worker thread, counting hits"""
+        if not self.cache:
+            return None
+        cached = await asyncio.to_thread(self.cache.get, cache_key)
+        if cached:
+            metrics.inc('llm_cache_hits_total')
+        return cached
+    
+    async def _cache_put(self, cache_key: str, result: Dict) -> None:
+        if self.cache:
+            await asyncio.to_thread(self.cache.put, cache_key, result)
+    
+    async def _complete(self, messages: List[Dict], max_tokens: int, temperature: float) -> Tuple[str, int]:
+        """Run one chat completion, returning the content and total tokens used"""
+        # Timed per attempt, so queueing and backoff do not count as API latency
+        @metrics.timed('llm_request_seconds', operation='llm_request', model=Config.AI_MODEL)
+        async def request():
+            return await self.client.chat.completions.create(
+                model=Config.AI_MODEL,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+        
+        prompt_tokens = check_request(messages, max_tokens)
+        async with self._semaphore:
+            response = await self.scheduler.call_async(request, prompt_tokens + max_tokens, self.session_id)
+        return response.choices[0].message.content.strip(), record_usage(response.usage)
+    
+    @metrics.timed('summarize_seconds', operation='summarize')
+    async def summarize(
+        self,
+        text: str,
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en"
+    ) -> Dict[str, str]:
+        """Async counterpart of AISummarizer.summarize()"""
+        if not text or len(text.strip()) == 0:
+            return {
+                'success': False,
+                'summary': '',
+                'error': 'No text provided for summarization'
+            }
+        
+        cache_key = AISummarizer.summary_cache_key(text, summary_type, max_tokens, language)
+        cached = await self._cache_get(cache_key)
+        if cached:
+            return dict(cached, cached=True)
+        
+        try:
+            text, fit_info, map_reduce = await asyncio.to_thread(
+                AISummarizer.prepare_summary_input, text, summary_type, max_tokens, language
+            )
+        except TokenBudgetError as e:
+            return {
+                'success': False,
+                'summary': '',
+                'error': str(e)
+            }
+        
+        if map_reduce:
+            result = await self.summarize_map_reduce(text, summary_type, max_tokens, language)
+        else:
+            result = await self._summarize_single(text, summary_type, max_tokens, language)
+        result.update(budget_fields(fit_info))
+        
+        if result['success']:
+            await self._cache_put(cache_key, result)
+        return result
+    
+    async def _summarize_single(self, text: str, summary_type: str, max_tokens: Optional[int], language: str) -> Dict[str, str]:
+        """Summarize text that fits in one request"""
+        try:
+            summary, tokens_used = await self._complete(
+                messages=AISummarizer.summary_messages(text, summary_type, language),
+                max_tokens=max_tokens or Config.MAX_TOKENS,
+                temperature=Config.TEMPERATURE
+            )
+            
+            return {
+                'success': True,
+                'summary': summary,
+                'model': Config.AI_MODEL,
+                'tokens_used': tokens_used,
+                'summary_type': summary_type,
+                'language': language
+            }
+        
+        except Exception as e:
+            return {
+                'success': False,
+                'summary': '',
+                'error': f'Summarization failed: {str(e)}'
+            }
+    
+    async def summarize_map_reduce(
+        self,
+        text: str,
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en"
+    ) -> Dict[str, str]:
+        """Async counterpart of AISummarizer.summarize_map_reduce()"""
+        try:
+            condensed = await self._condense(text)
+            partials, tokens_used = condensed[:2]
+            
+            summary, final_tokens = await self._complete(
+                messages=AISummarizer.fitted_reduce_messages(partials, summary_type, max_tokens or Config.MAX_TOKENS, language),
+                max_tokens=max_tokens or Config.MAX_TOKENS,
+                temperature=Config.TEMPERATURE
+            )
             
+            return map_reduce_result(summary, tokens_used + final_tokens, summary_type, language, condensed)
+        
+        except Exception as e:
             return {
+                'success': False,
+                'summary': '',
+                'error': f'Summarization failed: {str(e)}'
+            }
+    
+    async def _condense(self, text: str) -> Tuple[List[str], int, int, int, int]:
+        """Async counterpart of AISummarizer._condense()"""
+        chunks = split_into_chunks(text, Config.SUMMARY_CHUNK_TOKENS)
+        partials, tokens_used, chunks_reused = await self._summarize_sections(chunks)
+        
+        reduce_rounds = 1
+        groups = next_reduce_groups(partials)
+        while groups:
+            partials, round_tokens, _ = await self._summarize_sections(groups)
+            tokens_used += round_tokens
+            reduce_rounds += 1
+            groups = next_reduce_groups(partials)
+        
+        return partials, tokens_used, len(chunks), chunks_reused, reduce_rounds
+    
+    async def _summarize_sections(self, sections: List[str]) -> Tuple[List[str], int, int]:
+        """Async counterpart of AISummarizer._summarize_sections()"""
+        async def summarize_section(index: int, section: str) -> Tuple[str, int, bool]:
+            cache_key = AISummarizer.section_cache_key(section)
+            cached = await self._cache_get(cache_key)
+            if cached:
+                return cached['summary'], 0, True
+            summary, tokens_used = await self._complete(
+                messages=AISummarizer.section_messages(section, index, len(sections)),
+                max_tokens=Config.SUMMARY_SECTION_MAX_TOKENS,
+                temperature=Config.TEMPERATURE
+            )
+            await self._cache_put(cache_key, {'summary': summary, 'tokens_used': tokens_used})
+            return summary, tokens_used, False
+        
+        results = await asyncio.gather(*[
+            summarize_section(index, section) for index, section in enumerate(sections, start=1)
+        ])
+        return ([summary for summary, _, _ in results], sum(tokens for _, tokens, _ in results),
+                sum(1 for _, _, reused in results if reused))
+    
+    @metrics.timed('key_points_seconds', operation='key_points')
+    async def extract_key_points(self, text: str) -> Dict[str, any]:
+        """Async counterpart of AISummarizer.extract_key_points()"""
+        cache_key = AISummarizer.key_points_cache_key(text)
+        cached = await self._cache_get(cache_key)
+        if cached:
+            return dict(cached, cached=True)
+        
+        try:
+            text, fit_info = await asyncio.to_thread(
+                AISummarizer.fit_input, text, AISummarizer.key_point_messages(''), Config.KEY_POINTS_MAX_TOKENS
+            )
+        except TokenBudgetError as e:
+            return {
+                'success': False,
+                'key_points': '',
+                'error': str(e)
+            }
+        
+        try:
+            key_points, tokens_used = await self._complete(
+                messages=AISummarizer.key_point_messages(text),
+                max_tokens=Config.KEY_POINTS_MAX_TOKENS,
+                temperature=0.5
+            )
+            
+            result = {
                 'success': True,
                 'key_points': key_points,
-                'tokens_used': response.usage.total_tokens
+                'tokens_used': tokens_used,
+                **budget_fields(fit_info)
             }
-            
+        
         except Exception as e:
             return {
                 'success': False,
                 'key_points': '',
                 'error': f'Key point extraction failed: {str(e)}'
             }
+        
+        await self._cache_put(cache_key, result)
+        return result
+    
+    async def analyze(
+        self,
+        text: str,
+        summary_types: List[str] = ("comprehensive",),
+        max_tokens: int = None,
+        language: str = "en",
+        include_key_points: bool = True
+    ) -> Dict[str, Dict]:
+        """
+        Run several summary types and key point extraction concurrently
+        
+        Returns:
+            Dictionary with 'summaries' (keyed by summary type) and,
+            if requested, 'key_points'
+        """
+        tasks = [self.summarize(text, summary_type, max_tokens, language) for summary_type in summary_types]
+        if include_key_points:
+            tasks.append(self.extract_key_points(text))
+        
+        results = await asyncio.gather(*tasks)
+        
+        analysis = {'summaries': dict(zip(summary_types, results))}
+        if include_key_points:
+            analysis['key_points'] = results[-1]
+        return analysis
+
+
+def run_analysis(text: str, api_key: Optional[str] = None, session_id: str = 'default', **kwargs) -> Dict[str, Dict]:
+    """
+    Run AsyncAISummarizer.analyze() from synchronous code such as Streamlit scripts
+    
+    Runs on the process-wide loop (see run_async()), so every analysis
+    reuses the same pooled connections.
+    """
+    async def _run():
+        async with AsyncAISummarizer(api_key=api_key, session_id=session_id) as summarizer:
+            return await summarizer.analyze(text, **kwargs)
     
-    
\ No newline at end of file
+    return run_async(_run())
@@ -0,0 +1,297 @@
+import io
+import os
+import csv
+import json
+import asyncio
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, Dict, List, Iterable, Tuple, Callable
+from config import Config
+from utils.extraction_cache import ExtractionCache
+from utils.ai_summarizer import AsyncAISummarizer
+
+
+# Columns of the CSV export, in order
+RESULT_FIELDS = [
+    'file_name', 'status', 'duplicate_of', 'content_hash', 'file_type', 'page_count',
+    'char_count', 'summary', 'key_points', 'tokens_used', 'cached', 'error'
+]
+
+
+def _extract_document(data: bytes, file_extension: str, content_hash: str, cache_dir: str) -> Dict:
+    """Extract one document from its bytes into the shared extraction cache (runs in a worker process)"""
+    # Documents are already extracted in parallel, so each one uses a single process
+    return ExtractionCache(cache_dir).extract(data, file_extension, content_hash, workers=1)
+
+
+class BatchProcessor:
+    """
+    Extracts and summarizes many documents in one pipelined run
+    
+    Uploads (including ZIP archives) are de-duplicated by content hash,
+    extracted in a process pool into the extraction cache, then summarized
+    concurrently through one AsyncAISummarizer; the shared request scheduler
+    keeps the batch under the API rate limits and fair to other sessions.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        extraction_cache: Optional[ExtractionCache] = None,
+        workers: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        session_id: str = 'default'
+    ):
+        """
+        Initialize the batch pipeline
+        
+        Args:
+            api_key: OpenAI API key (defaults to Config.OPENAI_API_KEY)
+            extraction_cache: Where extracted text is stored
+            workers: Extraction processes (defaults to Config.BATCH_EXTRACT_WORKERS)
+            concurrency: Documents summarized at once (defaults to Config.BATCH_SUMMARY_CONCURRENCY)
+            session_id: Fair-queuing key for the shared request scheduler
+        """
+        self.api_key = api_key
+        self.extraction_cache = extraction_cache or ExtractionCache()
+        self.workers = workers or Config.BATCH_EXTRACT_WORKERS
+        self.concurrency = concurrency or Config.BATCH_SUMMARY_CONCURRENCY
+        self.session_id = session_id
+        Config.ensure_directories()
+    
+    @staticmethod
+    def expand_uploads(files: Iterable[Tuple[str, bytes]]) -> List[Dict]:
+        """
+        Turn uploaded (name, bytes) pairs into batch items, unpacking ZIP archives
+        
+        ZIP members with unsupported extensions are skipped. Files over
+        Config.MAX_FILE_SIZE and unreadable archives become error rows.
+        
+        Returns:
+            List of {'file_name', 'data'} items, or {'file_name', 'error'} rows
+        """
+        items = []
+        for name, data in files:
+            extension = os.path.splitext(name)[1].lower().replace('.', '')
+            if extension != 'zip':
+                if extension not in Config.ALLOWED_EXTENSIONS:
+                    items.append({'file_name': name, 'error': f'Unsupported file type: {extension}'})
+                elif len(data) > Config.MAX_FILE_SIZE:
+                    items.append({'file_name': name, 'error': 'File exceeds the maximum upload size'})
+                else:
+                    items.append({'file_name': name, 'data': data})
+                continue
+            
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    for member in archive.infolist():
+                        member_extension = os.path.splitext(member.filename)[1].lower().replace('.', '')
+                        if (member.is_dir() or member.filename.startswith('__MACOSX/')
+                                or member_extension not in Config.ALLOWED_EXTENSIONS):
+                            continue
+                        member_name = f'{name}/{member.filename}'
+                        # Check the declared size before inflating anything
+                        if member.file_size > Config.MAX_FILE_SIZE:
+                            items.append({'file_name': member_name, 'error': 'File exceeds the maximum upload size'})
+                            continue
+                        items.append({'file_name': member_name, 'data': archive.read(member)})
+            except (zipfile.BadZipFile, zipfile.LargeZipFile, OSError) as e:
+                items.append({'file_name': name, 'error': f'Could not read ZIP archive: {str(e)}'})
+        
+        return items[:Config.BATCH_MAX_FILES]
+    
+    def extract(
+        self,
+        items: List[Dict],
+        progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[Dict]:
+        """
+        De-duplicate and extract batch items into the extraction cache
+        
+        Each unique document is parsed from its bytes in a worker process,
+        without an upload copy on disk; documents already in the cache are
+        not re-extracted.
+        
+        Returns:
+            One result row per item, with status 'extracted', 'duplicate' or 'error'
+        """
+        rows = []
+        primaries = {}
+        to_extract = []
+        for item in items:
+            row = {'file_name': item['file_name']}
+            rows.append(row)
+            if 'error' in item:
+                row.update(status='error', error=item['error'])
+                continue
+            
+            content_hash = ExtractionCache.hash_content(item['data'])
+            row['content_hash'] = content_hash
+            if content_hash in primaries:
+                row.update(status='duplicate', duplicate_of=primaries[content_hash]['file_name'])
+                continue
+            primaries[content_hash] = row
+            
+            extension = os.path.splitext(item['file_name'])[1].lower()
+            info = self.extraction_cache.get_info(content_hash)
+            if info is not None:
+                self._apply_info(row, info)
+                continue
+            
+            to_extract.append((row, item['data'], extension))
+        
+        done = len(primaries) - len(to_extract)
+        if progress_callback:
+            progress_callback('extract', done, len(primaries))
+        
+        if to_extract:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(to_extract))) as executor:
+                futures = {
+                    executor.submit(_extract_document, data, extension, row['content_hash'],
+                                    self.extraction_cache.cache_dir): row
+                    for row, data, extension in to_extract
+                }
+                for future in as_completed(futures):
+                    row = futures[future]
+                    try:
+                        self._apply_info(row, future.result())
+                    except Exception as e:
+                        row.update(status='error', error=str(e))
+                    done += 1
+                    if progress_callback:
+                        progress_callback('extract', done, len(primaries))
+        
+        return rows
+    
+    @staticmethod
+    def _apply_info(row: Dict, info: Dict) -> None:
+        row.update(
+            status='extracted',
+            file_type=info.get('file_type'),
+            page_count=info.get('page_count'),
+            char_count=info.get('char_count')
+        )
+    
+    def summarize(
+        self,
+        rows: List[Dict],
+        summary_type: str = "comprehensive",
+        max_tokens: int = None,
+        language: str = "en",
+        include_key_points: bool = False,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> List[Dict]:
+        """
+        Summarize all extracted rows concurrently, then fill in duplicates
+        
+        Returns:
+            The same rows, with 'summary' (and 'key_points') added and status
+            'done' or 'error'
+        """
+        asyncio.run(self._summarize_rows(rows, summary_type, max_tokens, language,
+                                         include_key_points, progress_callback))
+        
+        # Duplicates share their original's results
+        originals = {row['content_hash']: row for row in rows if row.get('status') in ('done', 'error')
+                     and row.get('content_hash') and not row.get('duplicate_of')}
+        for row in rows:
+            if row.get('status') == 'duplicate' and row['content_hash'] in originals:
+                original = originals[row['content_hash']]
+                for field in ('file_type', 'page_count', 'char_count', 'summary', 'key_points', 'error'):
+                    if field in original:
+                        row[field] = original[field]
+                row['tokens_used'] = 0
+        return rows
+    
+    async def _summarize_rows(
+        self,
+        rows: List[Dict],
+        summary_type: str,
+        max_tokens: Optional[int],
+        language: str,
+        include_key_points: bool,
+        progress_callback: Optional[Callable[[str, int, int], None]]
+    ) -> None:
+        pending = [row for row in rows if row.get('status') == 'extracted']
+        documents = asyncio.Semaphore(self.concurrency)
+        done = 0
+        if progress_callback:
+            progress_callback('summarize', done, len(pending))
+        
+        async def summarize_row(summarizer: AsyncAISummarizer, row: Dict) -> None:
+            nonlocal done
+            # Texts are loaded only while their document holds a slot
+            async with documents:
+                text = self.extraction_cache.get_text(row['content_hash'])
+                if not text or not text.strip():
+                    row.update(status='error', error='No text could be extracted from this document')
+                else:
+                    analysis = await summarizer.analyze(
+                        text.strip(),
+                        summary_types=(summary_type,),
+                        max_tokens=max_tokens,
+                        language=language,
+                        include_key_points=include_key_points
+                    )
+                    self._apply_analysis(row, analysis['summaries'][summary_type], analysis.get('key_points'))
+            done += 1
+            if progress_callback:
+                progress_callback('summarize', done, len(pending))
+        
+        async with AsyncAISummarizer(api_key=self.api_key, session_id=self.session_id) as summarizer:
+            await asyncio.gather(*[summarize_row(summarizer, row) for row in pending])
+    
+    @staticmethod
+    def _apply_analysis(row: Dict, summary: Dict, key_points: Optional[Dict]) -> None:
+        errors = []
+        row['tokens_used'] = summary.get('tokens_used', 0)
+        row['cached'] = bool(summary.get('cached'))
+        if summary['success']:
+            row['summary'] = summary['summary']
+        else:
+            errors.append(summary['error'])
+        if key_points is not None:
+            row['tokens_used'] += key_points.get('tokens_used', 0)
+            if key_points['success']:
+                row['key_points'] = key_points['key_points']
+            else:
+                errors.append(key_points['error'])
+        
+        row['status'] = 'error' if errors else 'done'
+        if errors:
+            row['error'] = '; '.join(errors)
+    
+    def run(
+        self,
+        files: Iterable[Tuple[str, bytes]],
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        **summary_options
+    ) -> List[Dict]:
+        """
+        Run the full pipeline: unpack, de-duplicate, extract and summarize
+        
+        Args:
+            files: Uploaded (name, bytes) pairs; ZIP archives are unpacked
+            progress_callback: Called with (stage, done, total) for 'extract' and 'summarize'
+            summary_options: summary_type, max_tokens, language, include_key_points
+        
+        Returns:
+            One result row per document, in upload order
+        """
+        rows = self.extract(self.expand_uploads(files), progress_callback)
+        return self.summarize(rows, progress_callback=progress_callback, **summary_options)
+    
+    @staticmethod
+    def to_csv(rows: List[Dict]) -> str:
+        """Render result rows as CSV, one line per document"""
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+        return output.getvalue()
+    
+    @staticmethod
+    def to_jsonl(rows: List[Dict]) -> str:
+        """Render result rows as JSON Lines, one object per document"""
+        return ''.join(json.dumps({field: row.get(field) for field in RESULT_FIELDS}, ensure_ascii=False) + '\n'
+                       for row in rows)
@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict
+from config import Config
+from utils.document_processor import DocumentProcessor
+from utils import metrics
+from utils.file_store import get_file_store
+from utils.state_backend import BackendError, get_state_backend
+
+
+# pdf2docx logs one '(i/n) Page p' record per page in each conversion step
+_PAGE_RECORD = re.compile(r'\((\d+)/(\d+)\) Page \d+')
+
+# Share of overall progress spent parsing pages; the rest is writing the DOCX
+_PARSE_SHARE = 0.9
+
+
+# State backend namespaces of job states and (with a distributed backend) finished outputs
+JOBS_NAMESPACE = 'jobs'
+OUTPUTS_NAMESPACE = 'conversion_outputs'
+
+
+def _write_job(job: Dict) -> None:
+    """Persist job state in the state backend, where any app process can poll it"""
+    job['updated_at'] = time.time()
+    get_state_backend().put(JOBS_NAMESPACE, job['job_id'], json.dumps(job).encode('utf-8'), ttl=Config.FILE_STORE_TTL)
+
+
+def _publish_output(job: Dict) -> None:
+    """Copy a finished DOCX to a distributed backend, so processes on other hosts can serve it"""
+    backend = get_state_backend()
+    if not backend.distributed:
+        return
+    try:
+        with open(job['output_path'], 'rb') as f:
+            backend.put(OUTPUTS_NAMESPACE, job['job_id'], f.read(), ttl=Config.FILE_STORE_TTL)
+    except (OSError, BackendError):
+        pass  # The host that converted it can still serve the download
+
+
+class _ProgressHandler(logging.Handler):
+    """Turns pdf2docx per-page log records into job progress updates"""
+    
+    def __init__(self, job: Dict):
+        super().__init__(level=logging.INFO)
+        self.job = job
+        self.stage = 'opening'
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        message = record.getMessage()
+        if '[3/4]' in message:
+            self.stage = 'parsing'
+        elif '[4/4]' in message:
+            self.stage = 'writing'
+        
+        match = _PAGE_RECORD.search(message)
+        if not match:
+            return
+        done, total = int(match.group(1)), int(match.group(2))
+        if self.stage == 'parsing':
+            progress = _PARSE_SHARE * done / total
+        else:
+            progress = _PARSE_SHARE + (1 - _PARSE_SHARE) * done / total
+        
+        self.job.update(stage=self.stage, pages_done=done, page_count=total, progress=round(progress, 3))
+        try:
+            _write_job(self.job)
+        except BackendError:
+            pass  # Progress is best-effort; the final state is written by the job runner
+
+
+def _preload_worker() -> None:
+    """Import pdf2docx in a worker process (a no-op if it was forked with it already loaded)"""
+    from utils.warmup import preload, CONVERSION_MODULES
+    
+    preload(CONVERSION_MODULES)
+
+
+def _run_conversion_job(job: Dict) -> Dict:
+    """Convert one PDF in a worker process, reporting per-page progress"""
+    job.update(status='running', stage='opening')
+    _write_job(job)
+    start = time.perf_counter()
+    
+    def report_shard_progress(pages_done: int, page_count: int) -> None:
+        # Sharded conversions report whole page ranges as they finish
+        job.update(stage='converting', pages_done=pages_done, page_count=page_count,
+                   progress=round(_PARSE_SHARE * pages_done / page_count, 3))
+        _write_job(job)
+    
+    handler = _ProgressHandler(job)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(handler)
+    try:
+        result = DocumentProcessor.convert_pdf_to_docx(
+            job['pdf_path'], job['output_path'], progress_callback=report_shard_progress
+        )
+    finally:
+        root_logger.removeHandler(handler)
+    
+    job['duration_s'] = round(time.perf_counter() - start, 3)
+    if result['success']:
+        _publish_output(job)
+        job.update(status='done', stage='done', progress=1.0, message=result['message'],
+                   page_count=result['page_count'], pages_done=result['page_count'])
+    else:
+        job.update(status='failed', message=result['message'], error_type=result['error_type'])
+    _write_job(job)
+    return job
+
+
+class ConversionJobManager:
+    """
+    Runs PDF to DOCX conversions as background jobs in a process pool
+    
+    Job states live in the process-wide state backend, so with Redis a job
+    started by one app process can be polled and downloaded through any other.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        Initialize the worker pool
+        
+        Args:
+            max_workers: Number of conversion worker processes (defaults to Config.CONVERSION_WORKERS)
+        """
+        self.max_workers = max_workers or Config.CONVERSION_WORKERS
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+    
+    def prewarm(self) -> None:
+        """
+        Start every worker process now and have it import the conversion
+        libraries, so the first job doesn't pay for either
+        """
+        for _ in range(self.max_workers):
+            self.executor.submit(_preload_worker)
+    
+    def submit(self, pdf_path: str, output_path: str, download_name: Optional[str] = None) -> str:
+        """
+        Queue a conversion and return its job ID
+        
+        Args:
+            pdf_path: PDF file to convert
+            output_path: Where the DOCX result is written
+            download_name: File name offered when the result is downloaded
+        """
+        job = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'stage': 'queued',
+            'progress': 0.0,
+            'pages_done': 0,
+            'page_count': None,
+            'pdf_path': pdf_path,
+            'output_path': output_path,
+            'download_name': download_name or os.path.basename(output_path),
+            'message': '',
+            'created_at': time.time()
+        }
+        _write_job(job)
+        
+        future = self.executor.submit(_run_conversion_job, job)
+        future.add_done_callback(lambda f: self._record_result(job, f))
+        return job['job_id']
+    
+    def _record_result(self, job: Dict, future) -> None:
+        """
+        Record metrics for a finished job in this process
+        
+        Conversions run in worker processes, whose metrics never reach the
+        exporter, so the outcome is counted here from the returned job state.
+        A job whose worker died before writing a final state is marked failed.
+        """
+        error = future.exception()
+        if error is not None:
+            metrics.record_error('convert', error)
+            job.update(status='failed', message=f'Conversion failed: {str(error)}')
+            try:
+                _write_job(job)
+            except BackendError:
+                pass
+            return
+        
+        result = future.result()
+        metrics.observe('document_convert_seconds', result['duration_s'])
+        if result['status'] == 'done':
+            # The output was indexed before it existed; record its size for the disk budget
+            get_file_store().add(result['output_path'])
+            metrics.inc('document_pages_total', result['page_count'], operation='convert', format='pdf')
+            metrics.inc('document_bytes_total', os.path.getsize(result['pdf_path']), operation='convert', format='pdf')
+        else:
+            metrics.inc('errors_total', operation='convert', type=result.get('error_type', 'Exception'))
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the current state of a job, or None if the ID is unknown"""
+        # Job IDs are hex UUIDs; reject anything else before touching the backend
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+            return None
+        try:
+            state = get_state_backend().get(JOBS_NAMESPACE, job_id)
+            return json.loads(state) if state is not None else None
+        except (BackendError, ValueError):
+            return None
+    
+    @staticmethod
+    def read_output(job: Dict) -> Optional[bytes]:
+        """
+        Return a finished job's DOCX, from this host's output folder or, if
+        another host converted it, from a distributed backend
+        
+        Returns:
+            The file contents, or None once it has expired
+        """
+        try:
+            with open(job['output_path'], 'rb') as f:
+                return f.read()
+        except OSError:
+            pass
+        try:
+            return get_state_backend().get(OUTPUTS_NAMESPACE, job['job_id'])
+        except BackendError:
+            return None
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> ConversionJobManager:
+    """Return the process-wide conversion job manager"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = ConversionJobManager()
+    return _job_manager
@@ -1,92 +1,700 @@
-import pdfplumber
-from docx import Document
-from pdf2docx import Converter
+import io
 import os
-from typing import Optional, Dict
+import re
+import math
+import time
+import codecs
+import difflib
+import hashlib
+import shutil
+import tempfile
+from collections import deque, Counter
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib.metadata import version
+from typing import Optional, Dict, List, Iterator, Callable, Union, BinaryIO, Tuple, TYPE_CHECKING
+from config import Config
+from utils.docx_text import iter_docx_paragraphs, docx_core_properties
+from utils import metrics
+
+# pypdf, pdfplumber and pdf2docx (with PyMuPDF, OpenCV and NumPy) are imported
+# where they are first used: together they take most of a cold start, and
+# pasted text never needs them. utils.warmup can load them in the background.
+if TYPE_CHECKING:
+    from pypdf import PdfReader
+
+
+# A document to parse: a path, or its bytes in memory (e.g. an upload buffer)
+DocumentSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+# PDF text engines: pypdf reads text in content stream order (fast); pdfplumber
+# runs layout analysis (slow, but better on tables, boxes and columns)
+PDF_ENGINES = ('pypdf', 'pdfplumber')
+
+# Content stream operators that show text, or draw the rectangles, lines and
+# curves that make up table rulings and boxes
+_PDF_OPERATOR = re.compile(rb'(?<=[\s\)\]>])(Tj|TJ|re|l|c)(?=[\s\[(/]|$)')
+
+
+def _is_path(source: DocumentSource) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def _readable(source: DocumentSource):
+    """
+    What pdfplumber, pypdf and python-docx accept: the path itself, or a
+    binary stream over the in-memory source, rewound to the start
+    """
+    if _is_path(source):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        # BytesIO shares a bytes object's buffer rather than copying it
+        return io.BytesIO(source)
+    source.seek(0)
+    return source
+
+
+def _reopenable(source: DocumentSource) -> DocumentSource:
+    """A source that can be opened twice at once: file-like objects are read into bytes"""
+    if _is_path(source) or isinstance(source, (bytes, bytearray, memoryview)):
+        return source
+    return _readable(source).read()
+
+
+def _source_size(source: DocumentSource) -> int:
+    if _is_path(source):
+        return os.path.getsize(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source).nbytes
+    position = source.tell()
+    size = source.seek(0, io.SEEK_END)
+    source.seek(position)
+    return size
+
+
+def _source_name(source: DocumentSource) -> str:
+    if _is_path(source):
+        return os.path.basename(source)
+    return os.path.basename(getattr(source, 'name', None) or '') or 'document'
+
+
+@contextmanager
+def _on_disk(source: DocumentSource, suffix: str) -> Iterator[str]:
+    """
+    Yield a path to the source, spilling an in-memory source to a temporary
+    file that is removed afterwards (worker processes need a path)
+    """
+    if _is_path(source):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(_readable(source), f)
+        yield path
+    finally:
+        os.remove(path)
+
+
+def _new_engine_report() -> Dict:
+    return {'pages': {engine: 0 for engine in PDF_ENGINES}, 'seconds': {engine: 0.0 for engine in PDF_ENGINES}}
+
+
+def _merge_engine_report(report: Dict, other: Dict) -> None:
+    for engine in PDF_ENGINES:
+        report['pages'][engine] += other['pages'][engine]
+        report['seconds'][engine] += other['seconds'][engine]
+
+
+def _iter_pdf_page_texts(
+    source: DocumentSource,
+    pages: List[int],
+    engines: List[str],
+    report: Dict,
+    reader: Optional['PdfReader'] = None
+) -> Iterator[str]:
+    """
+    Yield the text of pages (sorted, 0-based) in order, each read with its
+    engine from the parallel engines list; pages and seconds per engine are
+    added to report. pypdf pages are read with reader, if given.
+    """
+    layout_pages = [page for page, engine in zip(pages, engines) if engine == 'pdfplumber']
+    if reader is None and len(layout_pages) < len(pages):
+        reader = DocumentProcessor.open_pdf(source)
+    pdf = None
+    if layout_pages:
+        import pdfplumber
+        
+        pdf = pdfplumber.open(_readable(source), pages=[page + 1 for page in layout_pages])
+    try:
+        layout_iter = iter(pdf.pages) if pdf else None
+        for page_number, engine in zip(pages, engines):
+            start = time.perf_counter()
+            if engine == 'pypdf':
+                text = reader.pages[page_number].extract_text() or ""
+            else:
+                page = next(layout_iter)
+                text = page.extract_text() or ""
+                page.flush_cache()
+            elapsed = time.perf_counter() - start
+            report['pages'][engine] += 1
+            report['seconds'][engine] += elapsed
+            metrics.observe('pdf_page_seconds', elapsed, engine=engine)
+            yield text
+    finally:
+        if pdf:
+            pdf.close()
+
+
+def _extract_pdf_pages(file_path: str, pages: List[int], engines: List[str]) -> Tuple[List[str], Dict]:
+    """
+    Extract text from the given pages (0-based) of a PDF with their planned engines.
+    Runs in a worker process, so it opens its own handles.
+    
+    Returns:
+        (page texts, engine report)
+    """
+    report = _new_engine_report()
+    return list(_iter_pdf_page_texts(file_path, pages, engines, report)), report
+
+
+def _text_agreement(first: str, second: str) -> float:
+    """Word-level similarity of two extractions of the same page, from 0 to 1"""
+    return difflib.SequenceMatcher(None, first.split(), second.split(), autojunk=False).ratio()
+
+
+def _stable_value(value, depth: int = 0):
+    """A PDF value with indirect references resolved, for repr() hashing (object reprs vary by reader)"""
+    value = value.get_object() if hasattr(value, 'get_object') else value
+    if depth > 4:
+        return None
+    if isinstance(value, dict):
+        return [(str(key), _stable_value(value[key], depth + 1)) for key in sorted(value)]
+    if isinstance(value, list):
+        return [_stable_value(item, depth + 1) for item in value]
+    return str(value)
+
+
+def _digest_resources(resources, digest, memo: Dict) -> None:
+    """
+    Feed what decides a page's extracted text, besides its content stream,
+    into digest: each font's name, encoding and ToUnicode map, and the
+    content of form XObjects (recursively). Images are skipped. Digests of
+    shared objects are memoized by object number across the document.
+    """
+    resources = resources.get_object() if resources is not None else None
+    if not resources:
+        return
+    
+    fonts = resources.get('/Font')
+    fonts = fonts.get_object() if fonts is not None else {}
+    for name in sorted(fonts):
+        reference = fonts.raw_get(name)
+        key = ('font', getattr(reference, 'idnum', None))
+        if key[1] is None or key not in memo:
+            font = fonts[name]
+            font_digest = hashlib.sha256(
+                repr(_stable_value([font.get('/BaseFont'), font.get('/Encoding')])).encode('utf-8')
+            )
+            to_unicode = font.get('/ToUnicode')
+            if to_unicode is not None:
+                font_digest.update(to_unicode.get_object().get_data())
+            memo[key] = font_digest.digest()
+        digest.update(name.encode('utf-8') + memo[key])
+    
+    xobjects = resources.get('/XObject')
+    xobjects = xobjects.get_object() if xobjects is not None else {}
+    for name in sorted(xobjects):
+        reference = xobjects.raw_get(name)
+        key = ('form', getattr(reference, 'idnum', None))
+        if key[1] is None or key not in memo:
+            xobject = xobjects[name]
+            memo[key] = b''  # Also guards against forms that draw themselves
+            if xobject.get('/Subtype') == '/Form':
+                form_digest = hashlib.sha256(xobject.get_data())
+                _digest_resources(xobject.get('/Resources'), form_digest, memo)
+                memo[key] = form_digest.digest()
+        digest.update(name.encode('utf-8') + memo[key])
+
+
+def _convert_pdf_page_range(pdf_path: str, output_path: str, start: int, end: int) -> str:
+    """Convert pages [start, end) of a PDF to a partial DOCX file in a worker process"""
+    from pdf2docx import Converter
+    
+    cv = Converter(pdf_path)
+    try:
+        cv.convert(output_path, start=start, end=end)
+    finally:
+        cv.close()
+    return output_path
 
 
 class DocumentProcessor:
     """Handles document extraction and conversion"""
     
     @staticmethod
-    def extract_text_from_pdf(file_path: str) -> str:
-        """Extract text from PDF file"""
-        text = ""
+    @metrics.timed('document_extract_seconds', operation='extract_text', format='pdf')
+    def extract_text_from_pdf(source: DocumentSource, workers: Optional[int] = None) -> str:
+        """
+        Extract text from PDF file
+        
+        Large PDFs are split into page ranges that are extracted in parallel
+        worker processes and stitched back together in page order.
+        
+        Args:
+            source: Path to the PDF file, its bytes, or a binary file-like object
+            workers: Number of worker processes (defaults to Config.PDF_EXTRACT_WORKERS)
+        """
         try:
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
+            page_texts = [t for t in DocumentProcessor.iter_pdf_pages(source, workers) if t]
         except Exception as e:
             raise Exception(f"Error extracting text from PDF: {str(e)}")
-        return text.strip()
+        metrics.inc('document_bytes_total', _source_size(source), operation='extract', format='pdf')
+        return "\n".join(page_texts).strip()
+    
+    @staticmethod
+    def iter_pdf_pages(
+        source: DocumentSource,
+        workers: Optional[int] = None,
+        pages: Optional[List[int]] = None,
+        engine: Optional[str] = None,
+        report: Optional[Dict] = None,
+        reader: Optional['PdfReader'] = None
+    ) -> Iterator[str]:
+        """
+        Yield the text of each PDF page in order
+        
+        Each page is read with the engine chosen by plan_pdf_engines(). Page
+        layout caches are flushed as soon as a page has been read, so
+        memory stays bounded by a single page (or a few in-flight page ranges
+        in parallel mode) regardless of document length. In-memory sources
+        are parsed in place; only the parallel path writes them to a
+        temporary file, for the worker processes.
+        
+        Args:
+            source: Path to the PDF file, its bytes, or a binary file-like object
+            workers: Number of worker processes (defaults to Config.PDF_EXTRACT_WORKERS)
+            pages: Sorted 0-based page numbers to extract (defaults to all pages),
+                e.g. only the pages whose text is not cached yet
+            engine: 'auto', 'pypdf' or 'pdfplumber' (defaults to Config.PDF_ENGINE)
+            report: Filled with 'engine', and 'pages' and 'seconds' per engine
+                (plus 'plan' seconds), updated as pages are read
+            reader: The document already opened with open_pdf(), reused for
+                planning and pypdf pages instead of parsing it again
+        """
+        workers = workers or Config.PDF_EXTRACT_WORKERS
+        if pages is not None and not pages:
+            return
+        source = _reopenable(source)
+        
+        start = time.perf_counter()
+        plan = DocumentProcessor.plan_pdf_engines(source, engine, pages, reader)
+        if pages is None:
+            pages = list(range(len(plan)))
+        page_report = _new_engine_report()
+        page_report['seconds']['plan'] = time.perf_counter() - start
+        if report is not None:
+            # Shared, so counts stay current even if the consumer stops early
+            report.update(page_report, engine=engine or Config.PDF_ENGINE)
+        
+        if workers <= 1 or len(pages) < Config.PDF_PARALLEL_MIN_PAGES:
+            for text in _iter_pdf_page_texts(source, pages, plan, page_report, reader):
+                metrics.inc('document_pages_total', operation='extract', format='pdf')
+                yield text
+        else:
+            with _on_disk(source, '.pdf') as file_path:
+                yield from DocumentProcessor._iter_pdf_pages_parallel(file_path, pages, plan, workers, page_report)
+    
+    @staticmethod
+    def plan_pdf_engines(
+        source: DocumentSource,
+        engine: Optional[str] = None,
+        pages: Optional[List[int]] = None,
+        reader: Optional['PdfReader'] = None
+    ) -> List[str]:
+        """
+        Choose the text engine for each page
+        
+        With 'auto', pages whose content streams draw at least
+        Config.PDF_LAYOUT_MIN_PATH_OPS rectangles, lines or curves (tables,
+        boxes, forms) get pdfplumber's layout analysis; other pages get pypdf.
+        A few pypdf pages are then sampled with both engines, and if they
+        disagree (unusual fonts or encodings, column layouts) the whole
+        document falls back to pdfplumber.
+        
+        Args:
+            source: Path to the PDF file, its bytes, or a binary file-like object
+            engine: 'auto', 'pypdf' or 'pdfplumber' (defaults to Config.PDF_ENGINE)
+            pages: Sorted 0-based page numbers to plan (defaults to all pages)
+            reader: The document already opened with open_pdf()
+        
+        Returns:
+            One engine name per planned page
+        """
+        engine = engine or Config.PDF_ENGINE
+        if engine not in PDF_ENGINES and engine != 'auto':
+            raise ValueError(f"Unknown PDF engine: {engine}")
+        if engine in PDF_ENGINES and pages is not None:
+            return [engine] * len(pages)
+        
+        reader = reader or DocumentProcessor.open_pdf(source)
+        if pages is None:
+            pages = list(range(len(reader.pages)))
+        if engine in PDF_ENGINES:
+            return [engine] * len(pages)
+        
+        plan = []
+        text_pages = []
+        for position, page_number in enumerate(pages):
+            contents = reader.pages[page_number].get_contents()
+            operators = Counter(_PDF_OPERATOR.findall(contents.get_data())) if contents is not None else Counter()
+            path_operators = operators[b're'] + operators[b'l'] + operators[b'c']
+            plan.append('pdfplumber' if path_operators >= Config.PDF_LAYOUT_MIN_PATH_OPS else 'pypdf')
+            if plan[-1] == 'pypdf' and operators[b'Tj'] + operators[b'TJ']:
+                text_pages.append(position)
+        
+        # Sample-and-compare, spread over the document
+        step = max(1, len(text_pages) // Config.PDF_ENGINE_SAMPLE_PAGES)
+        sample = text_pages[::step][:Config.PDF_ENGINE_SAMPLE_PAGES]
+        if sample:
+            import pdfplumber
+            
+            with pdfplumber.open(_readable(source), pages=[pages[position] + 1 for position in sample]) as pdf:
+                layout_texts = [page.extract_text() or "" for page in pdf.pages]
+            fast_texts = [reader.pages[pages[position]].extract_text() or "" for position in sample]
+            agreement = min(_text_agreement(fast, layout) for fast, layout in zip(fast_texts, layout_texts))
+            if agreement < Config.PDF_ENGINE_MIN_AGREEMENT:
+                return ['pdfplumber'] * len(pages)
+        return plan
     
     @staticmethod
-    def extract_text_from_docx(file_path: str) -> str:
-        """Extract text from DOCX file"""
+    def pdf_page_hashes(source: DocumentSource, reader: Optional['PdfReader'] = None) -> List[str]:
+        """
+        Fingerprint each PDF page by what its extracted text depends on
+        
+        A page's hash covers its content stream, page boxes and rotation,
+        its fonts' encodings and ToUnicode maps, and its form XObjects, so
+        a page left unchanged in a revised PDF keeps its hash. Reading these
+        with pypdf costs a small fraction of a pdfplumber layout pass. The
+        text engine setting and library versions are part of every hash.
+        
+        Args:
+            source: Path to the PDF file, its bytes, or a binary file-like object
+            reader: The document already opened with open_pdf()
+        
+        Returns:
+            SHA-256 hex digests, one per page in order
+        """
+        reader = reader or DocumentProcessor.open_pdf(source)
+        memo = {}
+        # Versions from package metadata, so hashing doesn't import pdfplumber
+        seed = f'{Config.PDF_ENGINE} pdfplumber {version("pdfplumber")} pypdf {version("pypdf")}'.encode('utf-8')
+        hashes = []
+        for page in reader.pages:
+            digest = hashlib.sha256(seed)
+            digest.update(repr((list(page.mediabox), list(page.cropbox), page.get('/Rotate', 0))).encode('utf-8'))
+            contents = page.get_contents()
+            digest.update(contents.get_data() if contents is not None else b'')
+            _digest_resources(page.get('/Resources'), digest, memo)
+            hashes.append(digest.hexdigest())
+        return hashes
+    
+    @staticmethod
+    def _iter_pdf_pages_parallel(
+        file_path: str,
+        pages: List[int],
+        engines: List[str],
+        workers: int,
+        report: Dict
+    ) -> Iterator[str]:
+        """Extract pages (0-based page numbers) with a process pool, yielding page texts in order"""
+        # Several chunks per worker keeps the pool busy when page costs are uneven
+        chunk_size = max(1, math.ceil(len(pages) / (workers * 4)))
+        ranges = iter([(pages[start:start + chunk_size], engines[start:start + chunk_size])
+                       for start in range(0, len(pages), chunk_size)])
+        
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            # Keep a bounded window of ranges in flight so finished results
+            # never pile up ahead of the consumer
+            pending = deque(executor.submit(_extract_pdf_pages, file_path, *page_range)
+                            for page_range in islice(ranges, workers * 2))
+            while pending:
+                page_texts, range_report = pending.popleft().result()
+                _merge_engine_report(report, range_report)
+                next_range = next(ranges, None)
+                if next_range:
+                    pending.append(executor.submit(_extract_pdf_pages, file_path, *next_range))
+                metrics.inc('document_pages_total', len(page_texts), operation='extract', format='pdf')
+                yield from page_texts
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+    @staticmethod
+    @metrics.timed('document_extract_seconds', operation='extract_text', format='docx')
+    def extract_text_from_docx(source: DocumentSource) -> str:
+        """
+        Extract text from DOCX file (a path, its bytes, or a binary file-like object)
+        
+        Includes tables, text boxes, headers, footers and notes; see
+        utils.docx_text.iter_docx_paragraphs().
+        """
         try:
-            doc = Document(file_path)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+            text = "\n".join(iter_docx_paragraphs(_readable(source)))
         except Exception as e:
             raise Exception(f"Error extracting text from DOCX: {str(e)}")
+        metrics.inc('document_bytes_total', _source_size(source), operation='extract', format='docx')
         return text.strip()
     
     @staticmethod
-    def extract_text_from_txt(file_path: str) -> str:
-        """Extract text from TXT file"""
+    @metrics.timed('document_extract_seconds', operation='extract_text', format='txt')
+    def extract_text_from_txt(source: DocumentSource) -> str:
+        """
+        Extract text from TXT file (a path, its bytes, or a binary file-like object)
+        
+        The bytes are read once; the encoding is chosen from a sample of them.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                text = file.read()
-        except UnicodeDecodeError:
-            # Try with different encoding if UTF-8 fails
-            with open(file_path, 'r', encoding='latin-1') as file:
-                text = file.read()
+            if _is_path(source):
+                with open(source, 'rb') as file:
+                    data = file.read()
+            elif isinstance(source, (bytes, bytearray, memoryview)):
+                data = source
+            else:
+                data = _readable(source).read()
+            encoding = DocumentProcessor._detect_text_encoding(bytes(data[:Config.TEXT_SAMPLE_BYTES]))
+            text = str(data, encoding, 'replace')
         except Exception as e:
             raise Exception(f"Error reading TXT file: {str(e)}")
+        metrics.inc('document_bytes_total', len(data), operation='extract', format='txt')
         return text.strip()
     
     @staticmethod
-    def extract_text(file_path: str, file_extension: str) -> str:
-        """Extract text based on file type"""
+    def iter_text(
+        source: DocumentSource,
+        file_extension: str,
+        block_size: Optional[int] = None,
+        workers: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Lazily yield text blocks based on file type
+        
+        PDFs yield one block per page, DOCX files yield runs of paragraphs and
+        TXT files yield fixed-size chunks. Joining the blocks reproduces the
+        extracted text, so callers can stream it to disk or stop early.
+        
+        Args:
+            source: Path to the document, its bytes, or a binary file-like object
+            file_extension: File extension, with or without the leading dot
+            block_size: Target block size in characters (defaults to Config.TEXT_BLOCK_SIZE)
+            workers: PDF extraction processes (defaults to Config.PDF_EXTRACT_WORKERS)
+        """
+        extension = file_extension.lower().replace('.', '')
+        block_size = block_size or Config.TEXT_BLOCK_SIZE
+        
+        start = time.perf_counter()
+        try:
+            yield from DocumentProcessor._iter_text_blocks(source, extension, block_size, workers)
+        except Exception as e:
+            metrics.record_error('extract_text', e)
+            raise
+        
+        # Only complete passes are timed; previews stop after a few blocks. The labels
+        # match the @metrics.timed extractors, whose operation labels errors_total only
+        metrics.observe('document_extract_seconds', time.perf_counter() - start, format=extension)
+        metrics.inc('document_bytes_total', _source_size(source), operation='extract', format=extension)
+    
+    @staticmethod
+    def _iter_text_blocks(source: DocumentSource, extension: str, block_size: int, workers: Optional[int]) -> Iterator[str]:
+        """Yield text blocks for iter_text() from a normalized extension"""
+        if extension == 'pdf':
+            try:
+                for page_text in DocumentProcessor.iter_pdf_pages(source, workers):
+                    if page_text:
+                        yield page_text + "\n"
+            except Exception as e:
+                raise Exception(f"Error extracting text from PDF: {str(e)}")
+        elif extension == 'docx':
+            try:
+                block = []
+                block_chars = 0
+                for paragraph in iter_docx_paragraphs(_readable(source)):
+                    block.append(paragraph)
+                    block_chars += len(paragraph) + 1
+                    if block_chars >= block_size:
+                        yield "\n".join(block) + "\n"
+                        block = []
+                        block_chars = 0
+                if block:
+                    yield "\n".join(block) + "\n"
+            except Exception as e:
+                raise Exception(f"Error extracting text from DOCX: {str(e)}")
+        elif extension == 'txt':
+            try:
+                file = open(source, 'rb') if _is_path(source) else _readable(source)
+                try:
+                    # One pass: the sample that picks the encoding is also the first block
+                    chunk = file.read(Config.TEXT_SAMPLE_BYTES)
+                    encoding = DocumentProcessor._detect_text_encoding(chunk)
+                    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                    while chunk:
+                        block = decoder.decode(chunk)
+                        if block:
+                            yield block
+                        chunk = file.read(block_size)
+                    block = decoder.decode(b'', final=True)
+                    if block:
+                        yield block
+                finally:
+                    if _is_path(source):
+                        file.close()
+            except Exception as e:
+                raise Exception(f"Error reading TXT file: {str(e)}")
+        else:
+            raise ValueError(f"Unsupported file type: {extension}")
+    
+    @staticmethod
+    def _detect_text_encoding(sample: bytes) -> str:
+        """
+        Pick a text encoding from a sample of the leading bytes
+        
+        A byte order mark decides it; otherwise 'utf-8' if the sample decodes
+        cleanly (a character cut off at the end of the sample is fine), else
+        'latin-1', which accepts any bytes. Invalid UTF-8 after the sample
+        is decoded as replacement characters rather than re-reading the file.
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        try:
+            codecs.getincrementaldecoder('utf-8')().decode(sample)
+        except UnicodeDecodeError:
+            return 'latin-1'
+        return 'utf-8'
+    
+    @staticmethod
+    def preview_text(source: DocumentSource, file_extension: str, max_chars: int = 2000) -> str:
+        """Return the first max_chars characters, pulling only the blocks needed"""
+        parts = []
+        remaining = max_chars
+        blocks = DocumentProcessor.iter_text(source, file_extension)
+        try:
+            for block in blocks:
+                parts.append(block[:remaining])
+                remaining -= len(parts[-1])
+                if remaining <= 0:
+                    break
+        finally:
+            blocks.close()
+        return "".join(parts)
+    
+    @staticmethod
+    def extract_text(source: DocumentSource, file_extension: str) -> str:
+        """Extract text based on file type, from a path, bytes or a binary file-like object"""
         extension = file_extension.lower().replace('.', '')
         
         if extension == 'pdf':
-            return DocumentProcessor.extract_text_from_pdf(file_path)
+            return DocumentProcessor.extract_text_from_pdf(source)
         elif extension == 'docx':
-            return DocumentProcessor.extract_text_from_docx(file_path)
+            return DocumentProcessor.extract_text_from_docx(source)
         elif extension == 'txt':
-            return DocumentProcessor.extract_text_from_txt(file_path)
+            return DocumentProcessor.extract_text_from_txt(source)
         else:
             raise ValueError(f"Unsupported file type: {extension}")
     
     @staticmethod
-    def convert_pdf_to_docx(pdf_path: str, output_path: str) -> Dict[str, str]:
-        """Convert PDF to DOCX format"""
+    @metrics.timed('document_convert_seconds', operation='convert')
+    def convert_pdf_to_docx(
+        pdf_path: str,
+        output_path: str,
+        workers: Optional[int] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, str]:
+        """
+        Convert PDF to DOCX format
+        
+        PDFs with at least Config.CONVERSION_SHARD_MIN_PAGES pages are split
+        into page ranges that are converted in parallel worker processes,
+        then merged into one document in page order.
+        
+        Args:
+            pdf_path: PDF file to convert
+            output_path: Where the DOCX file is written
+            workers: Number of shard worker processes (defaults to Config.CONVERSION_SHARD_WORKERS)
+            progress_callback: Called with (pages_done, page_count) as shards complete
+        """
+        from pdf2docx import Converter
+        
+        workers = workers or Config.CONVERSION_SHARD_WORKERS
         try:
             cv = Converter(pdf_path)
-            cv.convert(output_path)
-            cv.close()
+            page_count = len(cv.fitz_doc)
+            if workers <= 1 or page_count < Config.CONVERSION_SHARD_MIN_PAGES:
+                cv.convert(output_path)
+                cv.close()
+            else:
+                cv.close()
+                DocumentProcessor._convert_pdf_sharded(pdf_path, output_path, page_count, workers, progress_callback)
             
+            metrics.inc('document_pages_total', page_count, operation='convert', format='pdf')
+            metrics.inc('document_bytes_total', os.path.getsize(pdf_path), operation='convert', format='pdf')
             return {
                 'success': True,
                 'output_path': output_path,
-                'message': 'PDF successfully converted to DOCX'
+                'message': 'PDF successfully converted to DOCX',
+                'page_count': page_count
             }
         except Exception as e:
+            metrics.record_error('convert', e)
             return {
                 'success': False,
                 'output_path': None,
-                'message': f'Conversion failed: {str(e)}'
+                'message': f'Conversion failed: {str(e)}',
+                'error_type': type(e).__name__
             }
     
     @staticmethod
-    def get_document_info(file_path: str, file_extension: str) -> Dict:
+    def _convert_pdf_sharded(
+        pdf_path: str,
+        output_path: str,
+        page_count: int,
+        workers: int,
+        progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> None:
+        """Convert page ranges in a process pool and merge the partial DOCX files"""
+        from utils.docx_merge import merge_docx_files
+        
+        shard_size = math.ceil(page_count / workers)
+        ranges = [(start, min(start + shard_size, page_count))
+                  for start in range(0, page_count, shard_size)]
+        shard_paths = [f"{output_path}.part{index}" for index in range(len(ranges))]
+        
+        try:
+            pages_done = 0
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                futures = {executor.submit(_convert_pdf_page_range, pdf_path, shard_path, start, end): end - start
+                           for shard_path, (start, end) in zip(shard_paths, ranges)}
+                for future in as_completed(futures):
+                    future.result()
+                    pages_done += futures[future]
+                    if progress_callback:
+                        progress_callback(pages_done, page_count)
+            
+            merge_docx_files(shard_paths, output_path)
+        finally:
+            for shard_path in shard_paths:
+                if os.path.exists(shard_path):
+                    os.remove(shard_path)
+    
+    @staticmethod
+    def get_document_info(source: DocumentSource, file_extension: str) -> Dict:
         """Get basic information about the document"""
-        file_size = os.path.getsize(file_path)
+        file_size = _source_size(source)
         
         info = {
-            'file_name': os.path.basename(file_path),
+            'file_name': _source_name(source),
             'file_size': file_size,
             'file_size_mb': round(file_size / (1024 * 1024), 2),
             'file_type': file_extension.upper()
@@ -94,10 +702,109 @@ class DocumentProcessor:
         
         # Add page count for PDF
         if file_extension.lower() == '.pdf':
-            try:
-                with pdfplumber.open(file_path) as pdf:
-                    info['page_count'] = len(pdf.pages)
-            except:
-                info['page_count'] = 'Unknown'
+            info['page_count'] = DocumentProcessor.count_pdf_pages(source)
         
         return info
+    
+    @staticmethod
+    def open_pdf(source: DocumentSource) -> 'PdfReader':
+        """
+        Parse a PDF's xref and page tree with pypdf
+        
+        The reader has its own stream over the document, so it can be passed
+        to analyze(), pdf_page_hashes() and iter_pdf_pages() while they open
+        the source again with pdfplumber.
+        """
+        from pypdf import PdfReader
+        
+        return PdfReader(_readable(_reopenable(source)))
+    
+    @staticmethod
+    def count_pdf_pages(source: DocumentSource):
+        """
+        Count PDF pages from the xref and page tree only
+        
+        pypdf does not parse page content here, which makes this far cheaper
+        than opening the document with pdfplumber.
+        """
+        from pypdf import PdfReader
+        
+        try:
+            return len(PdfReader(_readable(source)).pages)
+        except Exception:
+            return 'Unknown'
+    
+    @staticmethod
+    def analyze(
+        source: DocumentSource,
+        file_extension: str,
+        include_text: bool = True,
+        reader: Optional['PdfReader'] = None
+    ) -> Dict:
+        """
+        Collect document info, metadata, text and statistics in one pass
+        
+        PDFs are parsed once with pypdf, for page count, metadata, the engine
+        plan and pypdf pages; pdfplumber opens only the pages it samples or
+        reads (and large PDFs are read by worker processes, which open their
+        own copies). With include_text=False, PDFs are only read with pypdf
+        for page count and metadata, without any layout analysis.
+        
+        Args:
+            source: Path to the document, its bytes, or a binary file-like object
+            file_extension: File extension, with or without the leading dot
+            include_text: Whether to extract text and character statistics
+            reader: For PDFs, the document already opened with open_pdf()
+        
+        Returns:
+            get_document_info() fields plus 'metadata', and when include_text
+            is set: 'pages' (per-page text for PDFs, a single entry otherwise),
+            'text', 'char_count', 'word_count' and 'line_count', and for PDFs
+            'extraction' (engine choice and timings, see iter_pdf_pages())
+        """
+        extension = file_extension.lower().replace('.', '')
+        file_size = _source_size(source)
+        
+        result = {
+            'file_name': _source_name(source),
+            'file_size': file_size,
+            'file_size_mb': round(file_size / (1024 * 1024), 2),
+            'file_type': f'.{extension}'.upper(),
+            'metadata': {}
+        }
+        
+        if extension == 'pdf':
+            try:
+                reader = reader or DocumentProcessor.open_pdf(source)
+                result['metadata'] = {key.lstrip('/'): str(value) for key, value in (reader.metadata or {}).items()}
+                page_count = len(reader.pages)
+                if include_text:
+                    result['extraction'] = {}
+                    pages = list(DocumentProcessor.iter_pdf_pages(source, report=result['extraction'], reader=reader))
+            except Exception as e:
+                raise Exception(f"Error extracting text from PDF: {str(e)}")
+            result['page_count'] = page_count
+        elif extension == 'docx':
+            try:
+                result['metadata'] = docx_core_properties(_readable(source))
+                if include_text:
+                    pages = ["\n".join(iter_docx_paragraphs(_readable(source))).strip()]
+            except Exception as e:
+                raise Exception(f"Error extracting text from DOCX: {str(e)}")
+        elif extension == 'txt':
+            if include_text:
+                pages = [DocumentProcessor.extract_text_from_txt(source)]
+        else:
+            raise ValueError(f"Unsupported file type: {extension}")
+        
+        if include_text:
+            text = "\n".join(page for page in pages if page).strip()
+            result.update(
+                pages=pages,
+                text=text,
+                char_count=len(text),
+                word_count=len(text.split()),
+                line_count=text.count("\n") + 1 if text else 0
+            )
+        
+        return result
@@ -0,0 +1,82 @@
+from copy import deepcopy
+from io import BytesIO
+from typing import List
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+
+
+# Relationship-id attributes that may appear inside copied body content
+_REL_ATTRIBUTES = (qn('r:id'), qn('r:embed'), qn('r:link'))
+
+
+def _copy_relationships(element, source_part, target_part) -> None:
+    """Re-create images and external links referenced by element in the target document"""
+    for node in element.iter():
+        for attribute in _REL_ATTRIBUTES:
+            rel_id = node.get(attribute)
+            if not rel_id or rel_id not in source_part.rels:
+                continue
+            rel = source_part.rels[rel_id]
+            if rel.is_external:
+                node.set(attribute, target_part.relate_to(rel.target_ref, rel.reltype, is_external=True))
+            elif rel.reltype == RT.IMAGE:
+                new_id, _ = target_part.get_or_add_image(BytesIO(rel.target_part.blob))
+                node.set(attribute, new_id)
+
+
+def _strip_header_footer_refs(sect_pr) -> None:
+    """Drop header/footer references, whose parts are not carried across documents"""
+    for tag in ('w:headerReference', 'w:footerReference'):
+        for ref in sect_pr.findall(qn(tag)):
+            sect_pr.remove(ref)
+
+
+def merge_docx_files(paths: List[str], output_path: str) -> None:
+    """
+    Concatenate DOCX files into one document, in the given order
+    
+    Each input keeps its own section (page size, margins, orientation): the
+    previous document's final section is closed with a paragraph-level
+    section break before the next document's body is appended.
+    
+    Args:
+        paths: DOCX files to merge, in order
+        output_path: Where the merged document is written
+    """
+    master = Document(paths[0])
+    body = master.element.body
+    
+    for path in paths[1:]:
+        shard = Document(path)
+        final_sect_pr = body.sectPr
+        
+        # Close the current last section so its page setup is preserved
+        if final_sect_pr is not None:
+            section_break = OxmlElement('w:p')
+            p_pr = OxmlElement('w:pPr')
+            p_pr.append(deepcopy(final_sect_pr))
+            section_break.append(p_pr)
+            final_sect_pr.addprevious(section_break)
+        
+        for element in shard.element.body:
+            if element.tag == qn('w:sectPr'):
+                continue
+            copied = deepcopy(element)
+            _copy_relationships(copied, shard.part, master.part)
+            for sect_pr in copied.iter(qn('w:sectPr')):
+                _strip_header_footer_refs(sect_pr)
+            if final_sect_pr is not None:
+                final_sect_pr.addprevious(copied)
+            else:
+                body.append(copied)
+        
+        # The merged document ends with the last shard's section properties
+        shard_sect_pr = shard.element.body.sectPr
+        if shard_sect_pr is not None and final_sect_pr is not None:
+            new_sect_pr = deepcopy(shard_sect_pr)
+            _strip_header_footer_refs(new_sect_pr)
+            body.replace(final_sect_pr, new_sect_pr)
+    
+    master.save(output_path)
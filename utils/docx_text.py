@@ -0,0 +1,186 @@
+import posixpath
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Iterator, BinaryIO, Union
+from lxml import etree
+
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_MC = '{http://schemas.openxmlformats.org/markup-compatibility/2006}'
+_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_RT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+
+W_P, W_TC, W_TR, W_TBL = _W + 'p', _W + 'tc', _W + 'tr', _W + 'tbl'
+MC_FALLBACK = _MC + 'Fallback'
+
+# Run content that carries text; field codes (w:instrText) and deleted text
+# (w:delText) are left out, like Word's own plain-text export
+W_T, W_BR = _W + 't', _W + 'br'
+_RUN_TEXT = {W_T: '', _W + 'tab': '\t', W_BR: '\n', _W + 'cr': '\n', _W + 'noBreakHyphen': '-'}
+
+_CORE_PROPERTIES = {
+    'title': '{http://purl.org/dc/elements/1.1/}title',
+    'author': '{http://purl.org/dc/elements/1.1/}creator',
+    'subject': '{http://purl.org/dc/elements/1.1/}subject',
+    'created': '{http://purl.org/dc/terms/}created',
+    'modified': '{http://purl.org/dc/terms/}modified'
+}
+
+
+def _paragraph_text(paragraph) -> str:
+    """Text of a paragraph whose nested paragraphs (text boxes) were already cleared"""
+    parts = []
+    for node in paragraph.iter(*_RUN_TEXT):
+        if node.tag == W_T:
+            parts.append(node.text or '')
+        elif node.tag != W_BR or node.get(_W + 'type', 'textWrapping') == 'textWrapping':
+            # Page and column breaks end the line visually only; python-docx drops them too
+            parts.append(_RUN_TEXT[node.tag])
+    return ''.join(parts)
+
+
+def iter_part_paragraphs(xml_file: BinaryIO) -> Iterator[str]:
+    """
+    Stream the paragraphs of one WordprocessingML part, in document order
+    
+    Each table row becomes one line of tab-separated cells (a cell's
+    paragraphs joined by spaces; nested tables flattened into their cell).
+    Text box paragraphs come just before the paragraph they are anchored
+    in. Only the current paragraph or table row is held in memory: every
+    element is cleared once it has been read.
+    
+    Args:
+        xml_file: The part's XML, e.g. an open zip member
+    """
+    cells: List[List[str]] = []
+    rows: List[List[str]] = []
+    fallback_depth = 0
+    for event, element in etree.iterparse(xml_file, events=('start', 'end'),
+                                          tag=(W_P, W_TC, W_TR, W_TBL, MC_FALLBACK)):
+        tag = element.tag
+        if event == 'start':
+            # Legacy copies of text boxes (inside mc:Fallback) repeat the
+            # mc:Choice content, so they are skipped
+            if tag == MC_FALLBACK:
+                fallback_depth += 1
+            elif fallback_depth:
+                pass
+            elif tag == W_TC:
+                cells.append([])
+            elif tag == W_TR:
+                rows.append([])
+            continue
+        
+        if tag == MC_FALLBACK:
+            fallback_depth -= 1
+        elif fallback_depth:
+            pass
+        elif tag == W_P:
+            text = _paragraph_text(element)
+            if cells:
+                if text:
+                    cells[-1].append(text)
+            else:
+                yield text
+        elif tag == W_TC:
+            rows[-1].append(' '.join(cells.pop()))
+        elif tag == W_TR:
+            line = '\t'.join(rows.pop())
+            if cells:
+                cells[-1].append(line)
+            else:
+                yield line
+        
+        element.clear(keep_tail=True)
+        # Drop finished top-level blocks from the tree as well
+        parent = element.getparent()
+        if parent is not None and parent.getparent() is not None and parent.getparent().getparent() is None:
+            while element.getprevious() is not None:
+                del parent[0]
+
+
+def _relationships(archive: zipfile.ZipFile, part: str) -> List[Dict[str, str]]:
+    """Relationships of a package part, with targets resolved to member names"""
+    rels_name = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    try:
+        root = etree.fromstring(archive.read(rels_name))
+    except KeyError:
+        return []
+    base = posixpath.dirname(part)
+    return [{
+        'type': rel.get('Type', ''),
+        'target': posixpath.normpath(posixpath.join(base, rel.get('Target', '')).lstrip('/'))
+    } for rel in root.iter(_REL + 'Relationship') if rel.get('TargetMode') != 'External']
+
+
+def _main_part(archive: zipfile.ZipFile) -> str:
+    for rel in _relationships(archive, ''):
+        if rel['type'] == _RT + 'officeDocument':
+            return rel['target']
+    return 'word/document.xml'
+
+
+def _iter_parts(archive: zipfile.ZipFile, names: List[str], unique: bool) -> Iterator[str]:
+    """Non-empty paragraphs of secondary parts, optionally without repeats"""
+    seen = set()
+    for name in names:
+        with archive.open(name) as xml_file:
+            for text in iter_part_paragraphs(xml_file):
+                if not text.strip() or (unique and text in seen):
+                    continue
+                seen.add(text)
+                yield text
+
+
+def iter_docx_paragraphs(source: Union[str, BinaryIO]) -> Iterator[str]:
+    """
+    Stream the text of a DOCX file paragraph by paragraph
+    
+    Headers come first, then the body in order (tables and text boxes
+    included), then footnotes, endnotes and footers. Header and footer
+    lines repeated across sections are emitted once; empty paragraphs are
+    kept in the body only.
+    
+    Args:
+        source: Path to the DOCX file, or a binary file-like object
+    """
+    with zipfile.ZipFile(source) as archive:
+        members = set(archive.namelist())
+        main = _main_part(archive)
+        related = _relationships(archive, main)
+        
+        def parts(kind: str) -> List[str]:
+            return [rel['target'] for rel in related
+                    if rel['type'] == _RT + kind and rel['target'] in members]
+        
+        yield from _iter_parts(archive, parts('header'), unique=True)
+        with archive.open(main) as xml_file:
+            yield from iter_part_paragraphs(xml_file)
+        yield from _iter_parts(archive, parts('footnotes') + parts('endnotes'), unique=False)
+        yield from _iter_parts(archive, parts('footer'), unique=True)
+
+
+def docx_core_properties(source: Union[str, BinaryIO]) -> Dict[str, str]:
+    """
+    Read title, author, subject, created and modified from docProps/core.xml
+    
+    Returns:
+        The properties that are set, as strings (dates formatted like datetime's str())
+    """
+    with zipfile.ZipFile(source) as archive:
+        try:
+            root = etree.fromstring(archive.read('docProps/core.xml'))
+        except KeyError:
+            return {}
+    properties = {}
+    for name, tag in _CORE_PROPERTIES.items():
+        node = root.find(tag)
+        value = (node.text or '').strip() if node is not None else ''
+        if value and name in ('created', 'modified'):
+            try:
+                value = str(datetime.fromisoformat(value))
+            except ValueError:
+                pass
+        if value:
+            properties[name] = value
+    return properties
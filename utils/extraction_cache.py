@@ -0,0 +1,397 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple
+from config import Config
+from utils.document_processor import DocumentProcessor, DocumentSource
+from utils.state_backend import StateBackend, BackendError, get_state_backend
+from utils import metrics
+
+
+class PageTextCache:
+    """Cache of extracted PDF page text in the shared state backend, keyed by page content hash"""
+    
+    NAMESPACE = 'pages'
+    
+    def __init__(self, backend: Optional[StateBackend] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the cache
+        
+        Args:
+            backend: Where page texts are stored (defaults to the process-wide state backend)
+            max_bytes: Total size budget; least recently used pages are evicted beyond it
+        """
+        self.backend = backend or get_state_backend()
+        self.max_bytes = max_bytes if max_bytes is not None else Config.PAGE_CACHE_MAX_BYTES
+    
+    def get_many(self, page_hashes: Iterable[str]) -> Dict[str, str]:
+        """Return the cached text of each known page hash, marking those pages as used"""
+        try:
+            found = self.backend.get_many(self.NAMESPACE, page_hashes)
+        except BackendError:
+            return {}  # The cache is best-effort; missing pages are simply extracted
+        return {page_hash: text.decode('utf-8') for page_hash, text in found.items()}
+    
+    def put_many(self, pages: Iterable[Tuple[str, str]]) -> None:
+        """Store (page hash, text) pairs, then enforce the size budget"""
+        items = [(page_hash, text.encode('utf-8')) for page_hash, text in pages]
+        if not items:
+            return
+        try:
+            self.backend.put_many(self.NAMESPACE, items, max_bytes=self.max_bytes)
+        except BackendError:
+            pass
+
+
+class ExtractionCache:
+    """
+    On-disk, content-addressed cache of extracted text and document info
+    
+    Entries are files in cache_dir, shared by the processes on a host.
+    A SQLite index in the same directory records each entry's size and
+    last use, plus a running total kept by triggers, so a write finds the
+    least recently used entries to evict without scanning the directory.
+    With a distributed state backend (Redis), each new entry is also
+    published there, and entries missing locally are fetched from it, so
+    app processes on other hosts reuse the extraction.
+    """
+    
+    # Namespace of entries published to a distributed backend
+    NAMESPACE = 'extraction'
+    
+    # New page texts are written to the page cache in batches of this many
+    _PAGE_FLUSH = 64
+    
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        backend: Optional[StateBackend] = None
+    ):
+        """
+        Initialize the cache directory
+        
+        Args:
+            cache_dir: Directory holding cache entries
+            max_bytes: Total size budget; least recently used entries are evicted beyond it
+            backend: State backend for page texts and, if distributed, whole
+                entries (defaults to the process-wide state backend)
+        """
+        self.cache_dir = cache_dir or os.path.join(Config.CACHE_FOLDER, 'extraction')
+        self.max_bytes = max_bytes if max_bytes is not None else Config.EXTRACTION_CACHE_MAX_BYTES
+        self.backend = backend or get_state_backend()
+        self.db_path = os.path.join(self.cache_dir, 'index.sqlite3')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.pages = PageTextCache(self.backend)
+        
+        adopt = not os.path.exists(self.db_path)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' hash TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+            conn.execute('CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY CHECK (id = 0), size INTEGER NOT NULL)')
+            conn.execute('INSERT OR IGNORE INTO usage (id, size) VALUES (0, 0)')
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries '
+                'BEGIN UPDATE usage SET size = size + NEW.size; END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries '
+                'BEGIN UPDATE usage SET size = size + NEW.size - OLD.size; END'
+            )
+            conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries '
+                'BEGIN UPDATE usage SET size = size - OLD.size; END'
+            )
+        if adopt:
+            self._adopt()
+    
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the index safe to share across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    def _adopt(self) -> None:
+        """Index entries written before the index existed, using their info file's mtime as last use"""
+        found = {}
+        for entry in os.scandir(self.cache_dir):
+            key, ext = os.path.splitext(entry.name)
+            if ext not in ('.txt', '.json') or not entry.is_file():
+                continue
+            stat = entry.stat()
+            size, last_used = found.get(key, (0, 0.0))
+            found[key] = (size + stat.st_size, stat.st_mtime if ext == '.json' else last_used)
+        with self._connect() as conn:
+            conn.executemany('INSERT OR IGNORE INTO entries (hash, size, last_used) VALUES (?, ?, ?)',
+                             [(key, size, last_used) for key, (size, last_used) in found.items()])
+    
+    @staticmethod
+    def hash_content(data) -> str:
+        """Return the SHA-256 hex digest used as cache key (of bytes or any buffer, e.g. a memoryview)"""
+        return hashlib.sha256(data).hexdigest()
+    
+    @staticmethod
+    def hash_file(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+        """Return the SHA-256 hex digest of a file, read in chunks"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _entry_paths(self, content_hash: str):
+        base = os.path.join(self.cache_dir, content_hash)
+        return base + '.txt', base + '.json'
+    
+    def text_path(self, content_hash: str) -> str:
+        """Path of the cached text file, for streaming reads"""
+        return self._entry_paths(content_hash)[0]
+    
+    def get_info(self, content_hash: str) -> Optional[Dict]:
+        """
+        Look up cached document info without loading the text
+        
+        Returns:
+            Document info dictionary, or None on a miss
+        """
+        text_path, info_path = self._entry_paths(content_hash)
+        try:
+            with open(info_path, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return self._fetch_shared(content_hash)
+        if not os.path.exists(text_path):
+            return self._fetch_shared(content_hash)
+        
+        # Touch the entry so eviction treats it as recently used
+        try:
+            with self._connect() as conn:
+                conn.execute('UPDATE entries SET last_used = ? WHERE hash = ?', (time.time(), content_hash))
+        except sqlite3.Error:
+            pass
+        
+        return info
+    
+    def get_text(self, content_hash: str) -> Optional[str]:
+        """Load the full cached text, or None on a miss"""
+        try:
+            with open(self.text_path(content_hash), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def get(self, content_hash: str) -> Optional[Dict]:
+        """
+        Look up a cached extraction
+        
+        Returns:
+            Dictionary with 'text' and 'info', or None on a miss
+        """
+        info = self.get_info(content_hash)
+        if info is None:
+            return None
+        text = self.get_text(content_hash)
+        if text is None:
+            return None
+        return {'text': text, 'info': info}
+    
+    def put(self, content_hash: str, text: str, info: Dict) -> None:
+        """Store extracted text and document info, then enforce the size budget"""
+        try:
+            self.put_blocks(content_hash, [text], info)
+        except OSError:
+            pass  # A failed cache write must never break extraction
+    
+    def put_blocks(self, content_hash: str, blocks: Iterable[str], info: Dict, publish: bool = True) -> Dict:
+        """
+        Stream text blocks to the cache, then enforce the size budget
+        
+        Only one block is held in memory at a time. The character count is
+        recorded in the stored info as 'char_count'. Errors raised by the
+        block iterator propagate and leave no partial entry behind.
+        
+        Args:
+            publish: Also publish the entry to a distributed state backend
+        
+        Returns:
+            The stored document info
+        """
+        text_path, info_path = self._entry_paths(content_hash)
+        # Unique temp suffix so concurrent writers of the same entry don't collide
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        char_count = 0
+        try:
+            # Write to temp files and rename so readers never see partial entries
+            with open(text_path + suffix, 'w', encoding='utf-8') as f:
+                for block in blocks:
+                    f.write(block)
+                    char_count += len(block)
+            os.replace(text_path + suffix, text_path)
+            
+            info = dict(info, char_count=char_count)
+            with open(info_path + suffix, 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+            os.replace(info_path + suffix, info_path)
+        except BaseException:
+            for path in (text_path + suffix, info_path + suffix):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        
+        if publish and self.backend.distributed:
+            self._publish(content_hash, info)
+        try:
+            size = os.path.getsize(text_path) + os.path.getsize(info_path)
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO entries (hash, size, last_used) VALUES (?, ?, ?) '
+                    'ON CONFLICT(hash) DO UPDATE SET size = excluded.size, last_used = excluded.last_used',
+                    (content_hash, size, time.time())
+                )
+                self._evict(conn)
+        except (OSError, sqlite3.Error):
+            pass  # The entry is still readable; it is indexed again when next written
+        return info
+    
+    def _publish(self, content_hash: str, info: Dict) -> None:
+        """Copy a local entry to the distributed backend (the text is read back whole)"""
+        try:
+            with open(self.text_path(content_hash), 'rb') as f:
+                text = f.read()
+            self.backend.put_many(self.NAMESPACE, [
+                (content_hash + ':text', text),
+                (content_hash + ':info', json.dumps(info).encode('utf-8'))
+            ], max_bytes=self.max_bytes)
+        except (OSError, BackendError):
+            pass  # Other hosts just extract the document themselves
+    
+    def _fetch_shared(self, content_hash: str) -> Optional[Dict]:
+        """Copy an entry published by another host into the local cache, returning its info"""
+        if not self.backend.distributed:
+            return None
+        try:
+            found = self.backend.get_many(self.NAMESPACE, [content_hash + ':info', content_hash + ':text'])
+            if len(found) < 2:
+                return None
+            info = json.loads(found[content_hash + ':info'])
+            return self.put_blocks(content_hash, [found[content_hash + ':text'].decode('utf-8')], info, publish=False)
+        except (OSError, ValueError, BackendError):
+            return None
+    
+    def extract(self, source: DocumentSource, file_extension: str, content_hash: str, workers: Optional[int] = None) -> Dict:
+        """
+        Extract a document and stream its text into the cache
+        
+        Document info comes from a cheap DocumentProcessor.analyze() pass
+        without text; the text itself is streamed block by block. PDF pages
+        are fingerprinted first and only pages not seen before (in this or
+        any earlier version of the document) are extracted; the info
+        records the count as 'pages_reused', and the text engines used for
+        the rest as 'extraction'.
+        
+        Args:
+            source: Path to the document, its bytes, or a binary file-like object
+                (e.g. an upload, parsed without writing it to disk)
+            file_extension: File extension, with or without the leading dot
+            content_hash: Cache key, normally hash_content() of the file
+            workers: PDF extraction processes (defaults to Config.PDF_EXTRACT_WORKERS)
+        
+        Returns:
+            The stored document info
+        """
+        if file_extension.lower().replace('.', '') != 'pdf':
+            info = DocumentProcessor.analyze(source, file_extension, include_text=False)
+            return self.put_blocks(content_hash, DocumentProcessor.iter_text(source, file_extension, workers=workers), info)
+        
+        # One pypdf parse serves the info, the page hashes and the engine plan
+        try:
+            reader = DocumentProcessor.open_pdf(source)
+            page_hashes = DocumentProcessor.pdf_page_hashes(source, reader)
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        info = DocumentProcessor.analyze(source, file_extension, include_text=False, reader=reader)
+        known = self.pages.get_many(page_hashes)
+        info['pages_reused'] = sum(1 for page_hash in page_hashes if page_hash in known)
+        info['extraction'] = {}
+        blocks = self._iter_pdf_blocks(source, page_hashes, known, workers, info['extraction'], reader)
+        return self.put_blocks(content_hash, blocks, info)
+    
+    def _iter_pdf_blocks(
+        self,
+        source: DocumentSource,
+        page_hashes: List[str],
+        known: Dict[str, str],
+        workers: Optional[int],
+        report: Dict,
+        reader=None
+    ) -> Iterator[str]:
+        """
+        Yield PDF page blocks as DocumentProcessor.iter_text() would, taking
+        known pages from the page cache and extracting only the rest
+        (recording their engines and timings in report) with the already
+        opened pypdf reader
+        """
+        # Each unknown page content is extracted once, even if it repeats
+        missing = []
+        seen = set(known)
+        for page, page_hash in enumerate(page_hashes):
+            if page_hash not in seen:
+                seen.add(page_hash)
+                missing.append(page)
+        
+        fresh = DocumentProcessor.iter_pdf_pages(source, workers, pages=missing, report=report, reader=reader)
+        new_pages = []
+        try:
+            for page_hash in page_hashes:
+                text = known.get(page_hash)
+                if text is None:
+                    text = known[page_hash] = next(fresh)
+                    new_pages.append((page_hash, text))
+                    if len(new_pages) >= self._PAGE_FLUSH:
+                        self.pages.put_many(new_pages)
+                        new_pages = []
+                if text:
+                    yield text + "\n"
+        except Exception as e:
+            raise Exception(f"Error extracting text from PDF: {str(e)}")
+        finally:
+            fresh.close()
+            self.pages.put_many(new_pages)
+        metrics.inc('document_pages_total', len(page_hashes) - len(missing), operation='reuse', format='pdf')
+    
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        with self._connect() as conn:
+            self._evict(conn)
+    
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute('SELECT size FROM usage').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute('SELECT hash, size FROM entries ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany('DELETE FROM entries WHERE hash = ?', evicted)
+        for (key,) in evicted:
+            for path in self._entry_paths(key):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
@@ -0,0 +1,294 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Iterable
+from config import Config
+
+
+class FileStore:
+    """
+    SQLite index of uploaded and generated files, bounded by age and total size
+    
+    Each entry records a file's size, last access and the sessions that
+    own it. Adding a file evicts least recently used entries beyond
+    max_bytes, so disk usage stays bounded under burst load; expiry by age
+    and release of ended sessions' files run in a background sweeper, so
+    requests never scan the upload and output folders.
+    """
+    
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        ttl: Optional[int] = None,
+        session_ttl: Optional[int] = None,
+        grace_seconds: Optional[int] = None
+    ):
+        """
+        Open (or create) the index
+        
+        Args:
+            db_path: SQLite database file
+            max_bytes: Total size budget for indexed files
+            ttl: Seconds a file may go unused before it is deleted
+            session_ttl: Seconds without a heartbeat after which a session counts as ended
+            grace_seconds: Files used this recently are never evicted for space
+                (uploads being extracted, conversions in progress)
+        """
+        self.db_path = db_path or os.path.join(Config.CACHE_FOLDER, 'files.sqlite3')
+        self.max_bytes = max_bytes if max_bytes is not None else Config.FILE_STORE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else Config.FILE_STORE_TTL
+        self.session_ttl = session_ttl if session_ttl is not None else Config.FILE_STORE_SESSION_TTL
+        self.grace_seconds = grace_seconds if grace_seconds is not None else Config.FILE_STORE_GRACE_SECONDS
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+        
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                ' path TEXT PRIMARY KEY, size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS owners ('
+                ' path TEXT NOT NULL, session TEXT NOT NULL, PRIMARY KEY (path, session))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS owners_session ON owners (session)')
+            conn.execute('CREATE TABLE IF NOT EXISTS sessions (session TEXT PRIMARY KEY, last_seen REAL NOT NULL)')
+    
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the store safe to share across threads
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _key(path: str) -> str:
+        return os.path.abspath(path)
+    
+    @staticmethod
+    def _remove_files(conn: sqlite3.Connection, paths: Iterable[str]) -> int:
+        """Delete files from disk and the index, returning the number removed"""
+        removed = []
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue  # In use (e.g. on Windows); retried on the next sweep
+            removed.append((path,))
+        conn.executemany('DELETE FROM files WHERE path = ?', removed)
+        conn.executemany('DELETE FROM owners WHERE path = ?', removed)
+        return len(removed)
+    
+    def add(self, path: str, session: Optional[str] = None) -> None:
+        """
+        Index a file (or refresh its size and last access), then enforce the size budget
+        
+        Args:
+            path: File on disk; may not exist yet, e.g. a conversion output
+            session: Session that owns the file; files can have several owners
+        """
+        key = self._key(path)
+        try:
+            size = os.path.getsize(key)
+        except OSError:
+            size = 0
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO files (path, size, created_at, last_access) VALUES (?, ?, ?, ?) '
+                    'ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access',
+                    (key, size, now, now)
+                )
+                if session:
+                    conn.execute('INSERT OR IGNORE INTO owners (path, session) VALUES (?, ?)', (key, session))
+                self._enforce_quota(conn, now)
+        except sqlite3.Error:
+            pass  # Bookkeeping must never break an upload; the next sweep catches up
+    
+    def touch(self, path: str) -> None:
+        """Mark a file as used, so it is evicted last"""
+        try:
+            with self._connect() as conn:
+                conn.execute('UPDATE files SET last_access = ? WHERE path = ?', (time.time(), self._key(path)))
+        except sqlite3.Error:
+            pass
+    
+    def heartbeat(self, session: str) -> None:
+        """Record that a session is still active (one indexed write per call)"""
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT INTO sessions (session, last_seen) VALUES (?, ?) '
+                    'ON CONFLICT(session) DO UPDATE SET last_seen = excluded.last_seen',
+                    (session, time.time())
+                )
+        except sqlite3.Error:
+            pass
+    
+    def release_session(self, session: str) -> int:
+        """
+        End a session: delete the files it owned that no other session owns
+        
+        Returns:
+            Number of files deleted
+        """
+        with self._connect() as conn:
+            orphans = [path for (path,) in conn.execute(
+                'SELECT path FROM owners WHERE session = ? AND path NOT IN '
+                '(SELECT path FROM owners WHERE session != ?)',
+                (session, session)
+            )]
+            conn.execute('DELETE FROM owners WHERE session = ?', (session,))
+            conn.execute('DELETE FROM sessions WHERE session = ?', (session,))
+            return self._remove_files(conn, orphans)
+    
+    def _enforce_quota(self, conn: sqlite3.Connection, now: float) -> int:
+        """Evict least recently used files until the total fits max_bytes"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM files').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evict = []
+        for path, size in conn.execute(
+            'SELECT path, size FROM files WHERE last_access < ? ORDER BY last_access',
+            (now - self.grace_seconds,)
+        ):
+            if total <= self.max_bytes:
+                break
+            evict.append(path)
+            total -= size
+        return self._remove_files(conn, evict)
+    
+    def adopt(self, folders: Iterable[str]) -> int:
+        """
+        Index files already in folders but unknown to the store, e.g. from
+        before it existed, using their modification time as last access
+        
+        Returns:
+            Number of files adopted
+        """
+        with self._connect() as conn:
+            known = {path for (path,) in conn.execute('SELECT path FROM files')}
+            found = []
+            for folder in folders:
+                try:
+                    entries = list(os.scandir(folder))
+                except OSError:
+                    continue
+                for entry in entries:
+                    key = self._key(entry.path)
+                    if entry.is_file() and key not in known:
+                        stat = entry.stat()
+                        found.append((key, stat.st_size, stat.st_mtime, stat.st_mtime))
+            conn.executemany('INSERT OR IGNORE INTO files (path, size, created_at, last_access) VALUES (?, ?, ?, ?)', found)
+        return len(found)
+    
+    def sweep(self) -> Dict[str, int]:
+        """
+        Release ended sessions, delete expired files, refresh sizes and enforce the size budget
+        
+        Returns:
+            Counts of 'sessions_ended', and files 'released' (by ended sessions),
+            'expired' and 'evicted'
+        """
+        now = time.time()
+        with self._connect() as conn:
+            ended = [session for (session,) in conn.execute(
+                'SELECT session FROM sessions WHERE last_seen < ?', (now - self.session_ttl,)
+            )]
+        released = sum(self.release_session(session) for session in ended)
+        
+        with self._connect() as conn:
+            expired = [path for (path,) in conn.execute(
+                'SELECT path FROM files WHERE last_access < ?', (now - self.ttl,)
+            )]
+            expired_count = self._remove_files(conn, expired)
+            
+            # Outputs are indexed before they are written; pick up their final sizes
+            updates = []
+            missing = []
+            for path, size in conn.execute('SELECT path, size FROM files'):
+                try:
+                    actual = os.path.getsize(path)
+                except OSError:
+                    missing.append((path,))
+                    continue
+                if actual != size:
+                    updates.append((actual, path))
+            conn.executemany('UPDATE files SET size = ? WHERE path = ?', updates)
+            # Files gone from disk but still indexed, past the grace period for pending outputs
+            conn.executemany(
+                'DELETE FROM files WHERE path = ? AND last_access < ?',
+                [(path, now - self.grace_seconds) for (path,) in missing]
+            )
+            
+            evicted = self._enforce_quota(conn, now)
+        
+        return {
+            'sessions_ended': len(ended),
+            'released': released,
+            'expired': expired_count,
+            'evicted': evicted
+        }
+    
+    def start_sweeper(self, interval: Optional[float] = None, folders: Optional[List[str]] = None) -> None:
+        """
+        Sweep in a daemon thread every interval seconds; a no-op if already running
+        
+        Args:
+            interval: Seconds between sweeps (defaults to Config.FILE_STORE_SWEEP_INTERVAL)
+            folders: Folders whose existing files are adopted on the first sweep
+                (defaults to the upload and output folders)
+        """
+        interval = interval or Config.FILE_STORE_SWEEP_INTERVAL
+        folders = folders if folders is not None else [Config.UPLOAD_FOLDER, Config.OUTPUT_FOLDER]
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            
+            def run():
+                try:
+                    self.adopt(folders)
+                except sqlite3.Error:
+                    pass
+                while True:
+                    try:
+                        self.sweep()
+                    except sqlite3.Error:
+                        pass  # Locked or busy; try again next interval
+                    time.sleep(interval)
+            
+            self._sweeper = threading.Thread(target=run, name='file-store-sweeper', daemon=True)
+            self._sweeper.start()
+    
+    def stats(self) -> Dict[str, int]:
+        """Return the indexed file count, total size and active session count"""
+        with self._connect() as conn:
+            files, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files').fetchone()
+            sessions = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return {'files': files, 'size_bytes': size, 'sessions': sessions}
+
+
+_file_store = None
+_file_store_lock = threading.Lock()
+
+
+def get_file_store() -> FileStore:
+    """Return the process-wide file store"""
+    global _file_store
+    with _file_store_lock:
+        if _file_store is None:
+            _file_store = FileStore()
+    return _file_store
@@ -0,0 +1,247 @@
+import os
+import time
+import pstats
+import inspect
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Tuple, Optional
+from config import Config
+
+
+# Default histogram buckets in seconds, from fast cache hits to long conversions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HELP = {
+    'document_extract_seconds': 'Time spent extracting text, by format',
+    'document_convert_seconds': 'Time spent converting PDF to DOCX',
+    'pdf_page_seconds': 'Time spent extracting single PDF pages, by text engine',
+    'document_bytes_total': 'Bytes of documents processed, by operation and format',
+    'document_pages_total': 'Pages of documents processed, by operation and format',
+    'summarize_seconds': 'Time spent in summarize(), including map-reduce and cache lookups',
+    'key_points_seconds': 'Time spent in extract_key_points(), including cache lookups',
+    'llm_request_seconds': 'Time spent in single OpenAI requests',
+    'llm_first_token_seconds': 'Time until the first streamed summary token',
+    'llm_tokens_total': 'OpenAI tokens used, by kind (prompt/completion)',
+    'llm_queue_wait_seconds': 'Time requests waited for rate-limit budget and their turn',
+    'llm_retries_total': 'Retried OpenAI requests, by exception type',
+    'llm_cache_hits_total': 'Summaries, section summaries and key points served from the response cache',
+    'module_import_seconds': 'Time spent importing heavy libraries during warmup, by module',
+    'errors_total': 'Errors, by operation and exception type'
+}
+
+
+def _escape_label_value(value: str) -> str:
+    """Escape a label value as the text exposition format requires (backslash, quote, newline)"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """Thread-safe in-process counters and histograms with Prometheus text output"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], list] = {}
+    
+    @staticmethod
+    def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+    
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add value to a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one histogram observation"""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts, then sum and count
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+    
+    @staticmethod
+    def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+        pairs = labels + extra
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape_label_value(value)}"' for key, value in pairs) + '}'
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(value)) for key, value in self._histograms.items())
+        
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described:
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} counter')
+                described.add(name)
+            lines.append(f'{name}{self._format_labels(labels)} {value}')
+        
+        for (name, labels), histogram in histograms:
+            if name not in described:
+                lines.append(f'# HELP {name} {HELP.get(name, name)}')
+                lines.append(f'# TYPE {name} histogram')
+                described.add(name)
+            for bound, count in zip(self.buckets, histogram):
+                lines.append(f'{name}_bucket{self._format_labels(labels, (("le", str(bound)),))} {count}')
+            lines.append(f'{name}_bucket{self._format_labels(labels, (("le", "+Inf"),))} {histogram[-1]}')
+            lines.append(f'{name}_sum{self._format_labels(labels)} {histogram[-2]}')
+            lines.append(f'{name}_count{self._format_labels(labels)} {histogram[-1]}')
+        
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Add value to a counter in the process-wide registry"""
+    registry.inc(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record a histogram observation in the process-wide registry"""
+    registry.observe(name, value, **labels)
+
+
+def record_error(operation: str, error: BaseException) -> None:
+    """Count an error by operation and exception type"""
+    # Plain Exception wrappers (raise Exception(f"...: {e}")) hide the real
+    # failure; count the original exception type instead
+    if type(error) is Exception and error.__context__ is not None:
+        error = error.__context__
+    inc('errors_total', operation=operation, type=type(error).__name__)
+
+
+class timed:
+    """
+    Time a block or function call into a histogram
+    
+    Usable as a context manager or as a decorator on sync and async
+    functions. Exceptions escaping the block are counted in errors_total,
+    labelled with operation (defaults to the histogram name).
+    
+    Example:
+        @metrics.timed('document_extract_seconds', operation='extract_text', format='pdf')
+        def extract(...): ...
+    """
+    
+    def __init__(self, name: str, operation: Optional[str] = None, **labels):
+        self.name = name
+        self.operation = operation or name
+        self.labels = labels
+        self._start = None
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if isinstance(exc, Exception):
+            record_error(self.operation, exc)
+        observe(self.name, time.perf_counter() - self._start, **self.labels)
+        return False
+    
+    def __call__(self, func):
+        # Each call gets its own timer, so decorated functions stay thread-safe
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(self.name, self.operation, **self.labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.name, self.operation, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+    
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """
+    Serve /metrics from a background thread, once per process
+    
+    Returns:
+        The running server, or None if the port could not be bound
+        (e.g. another app process already exports metrics on it)
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port or Config.METRICS_PORT), _MetricsHandler)
+            except OSError:
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return _server
+
+
+@contextmanager
+def profiled(label: str, enabled: bool = True, top: int = 25):
+    """
+    Profile a block with cProfile when enabled
+    
+    Stats are written to Config.PROFILE_FOLDER as <label>-<timestamp>.prof
+    (loadable with pstats or snakeviz), with the top functions by cumulative
+    time alongside as a .txt report. Only the calling thread is profiled;
+    work in thread or process pools shows up as time spent waiting on them.
+    """
+    if not enabled:
+        yield None
+        return
+    
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Only one profiler can be active per process (Python 3.12+); another
+        # request is already being profiled, so run this one unprofiled
+        yield None
+        return
+    
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(Config.PROFILE_FOLDER, exist_ok=True)
+        base_path = os.path.join(Config.PROFILE_FOLDER, f"{label}-{time.strftime('%Y%m%d_%H%M%S')}")
+        profiler.dump_stats(base_path + '.prof')
+        with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(top)
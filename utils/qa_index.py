@@ -0,0 +1,286 @@
+import os
+import re
+import json
+import math
+import shutil
+import threading
+from collections import Counter
+from typing import Optional, Dict, List, Callable, Tuple
+import numpy as np
+from config import Config
+
+
+# Words, including the combining vowel signs of Thai, Lao, Tibetan, Myanmar and Khmer, which \w excludes
+_TERM = re.compile(r'[\w\u0E00-\u0FFF\u1000-\u109F\u1780-\u17FF\u19E0-\u19FF]+')
+_WORD_SPAN = re.compile(r'\S+')
+
+# BM25 parameters (the usual Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal rank fusion constant for combining BM25 and embedding ranks
+
+
+def terms(text: str) -> List[str]:
+    """
+    Index terms of a text: lowercase words, and character bigrams of words in
+    scripts written without spaces (Thai, Lao, Khmer, CJK, ...), whose
+    "words" are whole phrases
+    """
+    result = []
+    for word in _TERM.findall(text.lower()):
+        if len(word) > 2 and any(ord(char) >= 0x0E00 for char in word):
+            result.extend(word[i:i + 2] for i in range(len(word) - 1))
+        else:
+            result.append(word)
+    return result
+
+
+def split_passages(text: str, words: Optional[int] = None, overlap: Optional[int] = None) -> List[str]:
+    """
+    Split text into overlapping passages of about `words` words
+    
+    Passages are slices of the original text, so line breaks and
+    punctuation are kept for the answer prompt.
+    """
+    words = words or Config.QA_PASSAGE_WORDS
+    overlap = overlap if overlap is not None else Config.QA_PASSAGE_OVERLAP
+    spans = [match.span() for match in _WORD_SPAN.finditer(text)]
+    stride = max(1, words - overlap)
+    passages = []
+    for start in range(0, len(spans), stride):
+        window = spans[start:start + words]
+        passages.append(text[window[0][0]:window[-1][1]])
+        if start + words >= len(spans):
+            break
+    return passages
+
+
+class QAIndex:
+    """
+    Retrieval index over one document's passages
+    
+    BM25 postings (CSR layout: per-term offsets into passage ids and term
+    frequencies) and optional normalized embedding vectors are stored as
+    .npy files and opened memory-mapped, so loading an index for a
+    follow-up question reads only the pages a query touches.
+    """
+    
+    def __init__(self, index_dir: str):
+        """Open an index written by build()"""
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.vocabulary: Dict[str, int] = meta['vocabulary']
+        self.average_length: float = meta['average_length']
+        self.embedding_model: Optional[str] = meta.get('embedding_model')
+        
+        def load(name: str) -> np.ndarray:
+            return np.load(os.path.join(index_dir, name + '.npy'), mmap_mode='r')
+        
+        self.offsets = load('offsets')
+        self.indptr = load('indptr')
+        self.postings = load('postings')
+        self.frequencies = load('frequencies')
+        self.lengths = load('lengths')
+        vectors_path = os.path.join(index_dir, 'vectors.npy')
+        self.vectors = np.load(vectors_path, mmap_mode='r') if os.path.exists(vectors_path) else None
+    
+    @property
+    def passage_count(self) -> int:
+        return len(self.lengths)
+    
+    @staticmethod
+    def build(
+        text: str,
+        index_dir: str,
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ) -> 'QAIndex':
+        """
+        Split text into passages and write their index to index_dir
+        
+        Args:
+            text: Document text
+            index_dir: Directory to create; it must not exist yet
+            embed: Returns one embedding per passage; None builds a BM25-only index
+        """
+        passages = split_passages(text)
+        vocabulary = {}
+        term_ids, passage_ids, frequencies = [], [], []
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for passage_id, passage in enumerate(passages):
+            passage_terms = terms(passage)
+            lengths[passage_id] = len(passage_terms)
+            for term, count in Counter(passage_terms).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                passage_ids.append(passage_id)
+                frequencies.append(count)
+        
+        # Group postings by term: postings[indptr[t]:indptr[t + 1]] are the passages containing term t
+        term_ids = np.array(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind='stable')
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=indptr[1:])
+        
+        encoded = [passage.encode('utf-8') for passage in passages]
+        offsets = np.zeros(len(passages) + 1, dtype=np.int64)
+        np.cumsum([len(passage) for passage in encoded], out=offsets[1:])
+        
+        os.makedirs(index_dir)
+        with open(os.path.join(index_dir, 'passages.txt'), 'wb') as f:
+            f.writelines(encoded)
+        np.save(os.path.join(index_dir, 'offsets.npy'), offsets)
+        np.save(os.path.join(index_dir, 'indptr.npy'), indptr)
+        np.save(os.path.join(index_dir, 'postings.npy'), np.array(passage_ids, dtype=np.int32)[order])
+        np.save(os.path.join(index_dir, 'frequencies.npy'), np.array(frequencies, dtype=np.float32)[order])
+        np.save(os.path.join(index_dir, 'lengths.npy'), lengths)
+        
+        embedding_model = None
+        if embed is not None and passages:
+            vectors = np.asarray(embed(passages), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            np.save(os.path.join(index_dir, 'vectors.npy'), vectors / np.where(norms == 0, 1, norms))
+            embedding_model = Config.EMBEDDING_MODEL
+        
+        with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'vocabulary': vocabulary,
+                'average_length': float(lengths.mean()) if len(passages) else 0.0,
+                'embedding_model': embedding_model,
+                'passage_words': Config.QA_PASSAGE_WORDS,
+                'passage_overlap': Config.QA_PASSAGE_OVERLAP
+            }, f, ensure_ascii=False)
+        return QAIndex(index_dir)
+    
+    def passage(self, passage_id: int) -> str:
+        """Read one passage's text"""
+        start, end = int(self.offsets[passage_id]), int(self.offsets[passage_id + 1])
+        with open(os.path.join(self.index_dir, 'passages.txt'), 'rb') as f:
+            f.seek(start)
+            return f.read(end - start).decode('utf-8')
+    
+    def bm25_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every passage for query"""
+        scores = np.zeros(self.passage_count, dtype=np.float32)
+        count = self.passage_count
+        for term in set(terms(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            passage_ids = self.postings[start:end]
+            frequency = self.frequencies[start:end]
+            idf = math.log(1 + (count - (end - start) + 0.5) / ((end - start) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[passage_ids] / max(self.average_length, 1e-6))
+            # Each passage appears once per term, so plain fancy indexing accumulates correctly
+            scores[passage_ids] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return scores
+    
+    def search(self, query: str, k: Optional[int] = None, query_vector: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Return the k passages most relevant to query, best first
+        
+        With a query embedding (and an index built with embeddings), BM25
+        and cosine-similarity rankings are combined by reciprocal rank
+        fusion; otherwise passages are ranked by BM25 alone.
+        
+        Returns:
+            List of {'id', 'text', 'score'} dictionaries
+        """
+        k = min(k or Config.QA_TOP_K, self.passage_count)
+        if k <= 0:
+            return []
+        bm25 = self.bm25_scores(query)
+        
+        if query_vector is not None and self.vectors is not None:
+            query_vector = np.asarray(query_vector, dtype=np.float32)
+            similarity = self.vectors @ (query_vector / max(float(np.linalg.norm(query_vector)), 1e-12))
+            scores = np.zeros(self.passage_count, dtype=np.float32)
+            for ranking in (bm25, similarity):
+                ranks = np.empty(self.passage_count, dtype=np.float32)
+                ranks[np.argsort(-ranking, kind='stable')] = np.arange(1, self.passage_count + 1)
+                scores += 1 / (RRF_K + ranks)
+        else:
+            scores = bm25
+            k = min(k, int(np.count_nonzero(bm25)))
+            if k == 0:
+                return []
+        
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [{'id': int(passage_id), 'text': self.passage(int(passage_id)), 'score': float(scores[passage_id])}
+                for passage_id in top]
+
+
+class QAIndexStore:
+    """On-disk indexes keyed by document content hash, bounded by total size"""
+    
+    def __init__(self, index_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        """
+        Args:
+            index_dir: Directory holding one subdirectory per indexed document
+            max_bytes: Total size budget; least recently used indexes are removed beyond it
+        """
+        self.index_dir = index_dir or os.path.join(Config.CACHE_FOLDER, 'qa')
+        self.max_bytes = max_bytes if max_bytes is not None else Config.QA_INDEX_MAX_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+    
+    def get(
+        self,
+        content_hash: str,
+        load_text: Callable[[], Optional[str]],
+        embed: Optional[Callable[[List[str]], List[List[float]]]] = None
+    ) -> Tuple[Optional[QAIndex], bool]:
+        """
+        Open the index for a document, building it on first use
+        
+        Args:
+            content_hash: Document content hash
+            load_text: Returns the document text; only called to build the index
+            embed: Passage embedder; an existing BM25-only index is rebuilt
+                with embeddings when one is given
+        
+        Returns:
+            (index, whether it was built now); index is None if there is no text
+        """
+        path = os.path.join(self.index_dir, content_hash)
+        if os.path.exists(os.path.join(path, 'meta.json')):
+            index = QAIndex(path)
+            if embed is None or index.embedding_model == Config.EMBEDDING_MODEL:
+                # Touch the entry so eviction treats it as recently used
+                os.utime(path, None)
+                return index, False
+        
+        text = load_text()
+        if not text or not text.strip():
+            return None, False
+        
+        # Build under a unique name and swap it in, so readers never see a partial index
+        staging = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        QAIndex.build(text, staging, embed)
+        with self._lock:
+            if os.path.exists(path):
+                shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(staging, path)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)  # Another process won the race
+        self.evict()
+        return QAIndex(path), True
+    
+    def evict(self) -> None:
+        """Remove least recently used indexes until the store fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.index_dir):
+                if not entry.is_dir() or entry.name.endswith('.tmp'):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total += size
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
@@ -0,0 +1,322 @@
+import time
+import email.utils
+import random
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Callable, Awaitable, TypeVar
+from config import Config
+from utils import metrics
+
+
+T = TypeVar('T')
+
+# Status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Throughput multiplier bounds after rate-limit responses (AIMD)
+_MIN_RATE_FACTOR = 0.1
+_RATE_RECOVERY_STEP = 0.05
+
+
+class TokenBucket:
+    """
+    Budget of units that refills continuously at a per-minute rate
+    
+    Not thread-safe on its own; RequestScheduler guards it with its lock.
+    Requests larger than the bucket are admitted once it is full and leave
+    it in debt, so they are delayed rather than refused.
+    """
+    
+    def __init__(self, per_minute: float, burst_seconds: float):
+        """
+        Args:
+            per_minute: Refill rate (0 = unlimited)
+            burst_seconds: Bucket capacity, in seconds' worth of refill
+        """
+        self.per_minute = per_minute
+        self.capacity = max(1.0, per_minute * burst_seconds / 60)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def wait_time(self, amount: float, now: float, rate_factor: float = 1.0) -> float:
+        """Seconds until amount can be consumed (0 if it can be now)"""
+        if not self.per_minute:
+            return 0.0
+        rate = self.per_minute * rate_factor / 60
+        self.level = min(self.capacity, self.level + (now - self.updated) * rate)
+        self.updated = now
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / rate
+    
+    def consume(self, amount: float) -> None:
+        if self.per_minute:
+            self.level -= amount
+
+
+class _Ticket:
+    """One queued request"""
+    __slots__ = ('session', 'cost', 'wake')
+    
+    def __init__(self, session: str, cost: int, wake: Callable[[], None]):
+        self.session = session
+        self.cost = cost
+        self.wake = wake
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the server's Retry-After hint (seconds, milliseconds or HTTP date) from an API error"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(error: Exception, attempt: int) -> Optional[float]:
+    """
+    Seconds to wait before retrying a failed request, or None if it should not be retried
+    
+    Backoff is exponential with full jitter, so concurrent retries spread
+    out; a longer Retry-After from the server takes precedence.
+    """
+    import openai  # Already loaded by the client that raised error
+    
+    if isinstance(error, openai.APIStatusError):
+        if error.status_code not in RETRYABLE_STATUS:
+            return None
+    elif not isinstance(error, openai.APIConnectionError):  # Includes timeouts
+        return None
+    
+    backoff = random.uniform(0, min(Config.OPENAI_RETRY_MAX_DELAY, Config.OPENAI_RETRY_BASE_DELAY * 2 ** attempt))
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        return min(Config.OPENAI_RETRY_MAX_DELAY, max(backoff, retry_after))
+    return backoff
+
+
+class RequestScheduler:
+    """
+    Process-wide scheduler for OpenAI requests
+    
+    Each request reserves one unit of the requests-per-minute bucket and its
+    estimated token cost (prompt plus max_tokens, as OpenAI counts it) from
+    the tokens-per-minute bucket before it is sent. Waiting requests are
+    queued per session and served round-robin, so one large document cannot
+    starve other users. Rate-limit responses halve throughput and pause all
+    requests for the server's Retry-After; successes restore it gradually.
+    Sync callers (threads) and async callers (any event loop) share one queue.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        burst_seconds: Optional[float] = None,
+        max_retries: Optional[int] = None
+    ):
+        """
+        Args:
+            requests_per_minute: Request quota (defaults to Config.OPENAI_REQUESTS_PER_MINUTE, 0 = unlimited)
+            tokens_per_minute: Token quota (defaults to Config.OPENAI_TOKENS_PER_MINUTE, 0 = unlimited)
+            burst_seconds: Bucket capacity in seconds of quota (defaults to Config.OPENAI_BURST_SECONDS)
+            max_retries: Retries per request (defaults to Config.OPENAI_MAX_RETRIES)
+        """
+        rpm = requests_per_minute if requests_per_minute is not None else Config.OPENAI_REQUESTS_PER_MINUTE
+        tpm = tokens_per_minute if tokens_per_minute is not None else Config.OPENAI_TOKENS_PER_MINUTE
+        burst_seconds = burst_seconds or Config.OPENAI_BURST_SECONDS
+        self.max_retries = max_retries if max_retries is not None else Config.OPENAI_MAX_RETRIES
+        
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(rpm, burst_seconds)
+        self._tokens = TokenBucket(tpm, burst_seconds)
+        self._queues: 'OrderedDict[str, deque]' = OrderedDict()  # Session order is the round-robin order
+        self._paused_until = 0.0
+        self._rate_factor = 1.0
+    
+    def _enqueue(self, ticket: _Ticket) -> None:
+        with self._lock:
+            self._queues.setdefault(ticket.session, deque()).append(ticket)
+    
+    def _head(self) -> Optional[_Ticket]:
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+    
+    def _try_grant(self, ticket: _Ticket) -> Optional[float]:
+        """
+        Admit ticket if it is next in line and within budget (call with the lock held)
+        
+        Returns:
+            0 if admitted, seconds to wait if it is next in line, None otherwise
+        """
+        if self._head() is not ticket:
+            return None
+        now = time.monotonic()
+        wait = max(
+            self._paused_until - now,
+            self._requests.wait_time(1, now, self._rate_factor),
+            self._tokens.wait_time(ticket.cost, now, self._rate_factor)
+        )
+        if wait > 0:
+            return wait
+        
+        self._requests.consume(1)
+        self._tokens.consume(ticket.cost)
+        # Served sessions move to the back of the rotation
+        queue = self._queues.pop(ticket.session)
+        queue.popleft()
+        if queue:
+            self._queues[ticket.session] = queue
+        self._wake_head()
+        return 0.0
+    
+    def _cancel(self, ticket: _Ticket) -> None:
+        with self._lock:
+            queue = self._queues.get(ticket.session)
+            if queue is None or ticket not in queue:
+                return
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.session]
+            self._wake_head()
+    
+    def _wake_head(self) -> None:
+        head = self._head()
+        if head is not None:
+            head.wake()
+    
+    def acquire(self, cost: int, session: str = 'default') -> None:
+        """Block until a request of the given token cost may be sent"""
+        event = threading.Event()
+        ticket = _Ticket(session, cost, event.set)
+        start = time.monotonic()
+        self._enqueue(ticket)
+        try:
+            while True:
+                # Clear before checking, so a wake-up after the check is not lost
+                event.clear()
+                with self._lock:
+                    wait = self._try_grant(ticket)
+                if wait == 0:
+                    break
+                event.wait(wait)
+        except BaseException:
+            self._cancel(ticket)
+            raise
+        metrics.observe('llm_queue_wait_seconds', time.monotonic() - start)
+    
+    async def acquire_async(self, cost: int, session: str = 'default') -> None:
+        """Wait without blocking the event loop until a request may be sent"""
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        
+        def wake():
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The waiter's loop has closed; its ticket is being cancelled
+        
+        ticket = _Ticket(session, cost, wake)
+        start = time.monotonic()
+        self._enqueue(ticket)
+        try:
+            while True:
+                event.clear()
+                with self._lock:
+                    wait = self._try_grant(ticket)
+                if wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._cancel(ticket)
+            raise
+        metrics.observe('llm_queue_wait_seconds', time.monotonic() - start)
+    
+    def record_success(self) -> None:
+        """Recover throughput gradually after rate limiting"""
+        with self._lock:
+            self._rate_factor = min(1.0, self._rate_factor + _RATE_RECOVERY_STEP)
+    
+    def record_failure(self, error: Exception, delay: float) -> None:
+        """Slow down (and pause everyone for Retry-After) when the API reports rate limiting"""
+        import openai
+        
+        metrics.inc('llm_retries_total', type=type(error).__name__)
+        if not isinstance(error, openai.RateLimitError):
+            return
+        with self._lock:
+            self._rate_factor = max(_MIN_RATE_FACTOR, self._rate_factor / 2)
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+    
+    def call(self, request: Callable[[], T], cost: int, session: str = 'default') -> T:
+        """
+        Send a request through the scheduler, retrying transient failures
+        
+        Args:
+            request: Performs one API call
+            cost: Estimated tokens (prompt plus max_tokens)
+            session: Fair-queuing key, e.g. the Streamlit session ID
+        """
+        attempt = 0
+        while True:
+            self.acquire(cost, session)
+            try:
+                result = request()
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                self.record_failure(e, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success()
+            return result
+    
+    async def call_async(self, request: Callable[[], Awaitable[T]], cost: int, session: str = 'default') -> T:
+        """Async counterpart of call(); request returns a new awaitable per attempt"""
+        attempt = 0
+        while True:
+            await self.acquire_async(cost, session)
+            try:
+                result = await request()
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None or attempt >= self.max_retries:
+                    raise
+                self.record_failure(e, delay)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success()
+            return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RequestScheduler:
+    """Return the process-wide request scheduler shared by all sessions"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+    return _scheduler
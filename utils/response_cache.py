@@ -0,0 +1,72 @@
+import json
+import hashlib
+from typing import Optional, Dict
+from config import Config
+from utils.state_backend import StateBackend, BackendError, get_state_backend
+
+
+class ResponseCache:
+    """Cache of LLM results with TTL and size-based eviction, kept in the shared state backend"""
+    
+    NAMESPACE = 'responses'
+    
+    def __init__(self, backend: Optional[StateBackend] = None, ttl: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Initialize the cache
+        
+        Args:
+            backend: Where results are stored (defaults to the process-wide state
+                backend, so every app process on the host, or with Redis on any
+                host, reuses the others' responses)
+            ttl: Seconds an entry stays valid
+            max_bytes: Total size budget; least recently used entries are evicted beyond it
+        """
+        self.backend = backend or get_state_backend()
+        self.ttl = ttl if ttl is not None else Config.RESPONSE_CACHE_TTL
+        self.max_bytes = max_bytes if max_bytes is not None else Config.RESPONSE_CACHE_MAX_BYTES
+    
+    @staticmethod
+    def make_key(text: str, **params) -> str:
+        """
+        Build a cache key from the document content hash and request parameters
+        
+        Args:
+            text: Document text (only its SHA-256 is part of the key)
+            params: Everything else that shapes the response, e.g. prompt, model, max_tokens
+        """
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        params_json = json.dumps(params, sort_keys=True, ensure_ascii=False)
+        return text_hash + ':' + hashlib.sha256(params_json.encode('utf-8')).hexdigest()
+    
+    def _count(self, name: str) -> None:
+        try:
+            self.backend.incr(self.NAMESPACE, name)
+        except BackendError:
+            pass
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key, or None on a miss or expired entry"""
+        try:
+            value = self.backend.get(self.NAMESPACE, key)
+            result = json.loads(value) if value is not None else None
+        except (BackendError, ValueError):
+            return None  # The cache is best-effort; fall through to the API
+        self._count('hits' if result is not None else 'misses')
+        return result
+    
+    def put(self, key: str, result: Dict) -> None:
+        """Store a result, then drop expired entries and enforce the size budget"""
+        value = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        try:
+            self.backend.put(self.NAMESPACE, key, value, ttl=self.ttl, max_bytes=self.max_bytes)
+        except BackendError:
+            pass
+    
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and, where the backend can tell, current entry count and size"""
+        counters = self.backend.counters(self.NAMESPACE)
+        stats = {'hits': counters.get('hits', 0), 'misses': counters.get('misses', 0)}
+        usage = self.backend.usage(self.NAMESPACE)
+        if usage is not None:
+            stats.update(entries=usage[0], size_bytes=usage[1])
+        return stats
@@ -0,0 +1,369 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Optional, Dict, Iterable, Tuple
+from config import Config
+
+
+class BackendError(Exception):
+    """A state backend could not be read or written"""
+
+
+class StateBackend(ABC):
+    """
+    Namespaced key-value store for state shared between app processes
+    
+    Values are bytes. Namespaces keep the callers apart ('responses',
+    'pages', 'extraction', 'jobs', ...); each caller owns the TTL and size
+    budget of its namespace and passes them on every write.
+    """
+    
+    # True when processes on other hosts see the same state
+    distributed = False
+    
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """Return a value, or None if it is missing or expired"""
+        return self.get_many(namespace, [key]).get(key)
+    
+    @abstractmethod
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return the values of the keys that exist, marking them as recently used"""
+        raise NotImplementedError
+    
+    def put(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None, max_bytes: Optional[int] = None) -> None:
+        """Store a value; see put_many()"""
+        self.put_many(namespace, [(key, value)], ttl, max_bytes)
+    
+    @abstractmethod
+    def put_many(
+        self,
+        namespace: str,
+        items: Iterable[Tuple[str, bytes]],
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ) -> None:
+        """
+        Store (key, value) pairs
+        
+        Args:
+            namespace: Namespace of the keys
+            items: (key, value) pairs
+            ttl: Seconds until the values expire (None keeps them until evicted)
+            max_bytes: Size budget of the namespace; least recently used values
+                are evicted beyond it
+        """
+        raise NotImplementedError
+    
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a value; missing keys are ignored"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def incr(self, namespace: str, name: str, amount: int = 1) -> int:
+        """Add to a counter, returning its new value"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    def counters(self, namespace: str) -> Dict[str, int]:
+        """Return all counters of a namespace"""
+        raise NotImplementedError
+    
+    def usage(self, namespace: str) -> Optional[Tuple[int, int]]:
+        """Return (entries, bytes) stored in a namespace, or None if the backend can't tell cheaply"""
+        return None
+
+
+class SQLiteBackend(StateBackend):
+    """
+    State in one SQLite database, shared by every process on a single host
+    
+    Expired values are dropped on write, and each write enforces its
+    namespace's size budget by evicting least recently used values.
+    """
+    
+    # Keeps each IN (...) lookup under SQLite's bound-parameter limit
+    _LOOKUP_BATCH = 500
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Open (or create) the database
+        
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = db_path or os.path.join(Config.CACHE_FOLDER, 'state.sqlite3')
+        
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, size INTEGER NOT NULL,'
+                ' expires_at REAL, last_access REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_last_access ON entries (namespace, last_access)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                ' namespace TEXT NOT NULL, name TEXT NOT NULL, value INTEGER NOT NULL, PRIMARY KEY (namespace, name))'
+            )
+    
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the backend safe to share across threads and processes
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            try:
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            raise BackendError(str(e)) from e
+    
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+        with self._connect() as conn:
+            for start in range(0, len(keys), self._LOOKUP_BATCH):
+                batch = keys[start:start + self._LOOKUP_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                found.update(conn.execute(
+                    f'SELECT key, value FROM entries WHERE namespace = ? AND key IN ({placeholders})'
+                    ' AND (expires_at IS NULL OR expires_at > ?)',
+                    [namespace, *batch, now]
+                ))
+            conn.executemany('UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?',
+                             [(now, namespace, key) for key in found])
+        return {key: bytes(value) for key, value in found.items()}
+    
+    def put_many(
+        self,
+        namespace: str,
+        items: Iterable[Tuple[str, bytes]],
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, size, expires_at, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(namespace, key, value, len(value), expires_at, now) for key, value in items]
+            )
+            conn.execute('DELETE FROM entries WHERE namespace = ? AND expires_at <= ?', (namespace, now))
+            if max_bytes is None:
+                return
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?',
+                                 (namespace,)).fetchone()[0]
+            if total > max_bytes:
+                evicted = []
+                for key, size in conn.execute(
+                    'SELECT key, size FROM entries WHERE namespace = ? ORDER BY last_access', (namespace,)
+                ):
+                    if total <= max_bytes:
+                        break
+                    evicted.append((namespace, key))
+                    total -= size
+                conn.executemany('DELETE FROM entries WHERE namespace = ? AND key = ?', evicted)
+    
+    def delete(self, namespace: str, key: str) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+    
+    def incr(self, namespace: str, name: str, amount: int = 1) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                'INSERT INTO counters (namespace, name, value) VALUES (?, ?, ?) '
+                'ON CONFLICT(namespace, name) DO UPDATE SET value = value + excluded.value RETURNING value',
+                (namespace, name, amount)
+            ).fetchone()[0]
+    
+    def counters(self, namespace: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            return dict(conn.execute('SELECT name, value FROM counters WHERE namespace = ?', (namespace,)))
+    
+    def usage(self, namespace: str) -> Optional[Tuple[int, int]]:
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE namespace = ?'
+                ' AND (expires_at IS NULL OR expires_at > ?)',
+                (namespace, time.time())
+            ).fetchone()
+
+
+class RedisBackend(StateBackend):
+    """
+    State in a Redis-compatible server, shared by app processes on any host
+    
+    Keys are '<prefix><namespace>:<key>'. Namespaces written with a size
+    budget are also indexed: a hash of value sizes, a sorted set of last
+    access times and a running byte total, which put_many() uses to evict
+    least recently used values. Values that expired on their own stay in
+    the index until they are evicted from it. Run the server with a
+    maxmemory limit and maxmemory-policy allkeys-lru as a backstop.
+    """
+    
+    distributed = True
+    
+    # Least recently used values are fetched this many at a time when evicting
+    _EVICT_BATCH = 100
+    
+    def __init__(self, url: Optional[str] = None, prefix: Optional[str] = None):
+        """
+        Connect to the server (lazily, on first use)
+        
+        Args:
+            url: redis:// or rediss:// URL (defaults to Config.REDIS_URL)
+            prefix: Prefix of every key (defaults to Config.REDIS_KEY_PREFIX)
+        """
+        import redis  # Only needed for STATE_BACKEND=redis
+        
+        self._errors = (redis.RedisError,)
+        self.prefix = prefix if prefix is not None else Config.REDIS_KEY_PREFIX
+        # RESP2 works with every Redis-compatible server, not only those speaking RESP3
+        self.client = redis.Redis.from_url(url or Config.REDIS_URL, protocol=2, socket_timeout=Config.REDIS_TIMEOUT,
+                                           socket_connect_timeout=Config.REDIS_TIMEOUT)
+    
+    def _key(self, namespace: str, key: str) -> str:
+        return f'{self.prefix}{namespace}:{key}'
+    
+    def _index_keys(self, namespace: str) -> Tuple[str, str, str]:
+        """Keys of a namespace's size hash, last-access sorted set and byte total"""
+        return f'{self.prefix}sizes:{namespace}', f'{self.prefix}lru:{namespace}', f'{self.prefix}bytes:{namespace}'
+    
+    @contextmanager
+    def _errors_as_backend_errors(self):
+        try:
+            yield
+        except self._errors as e:
+            raise BackendError(str(e)) from e
+    
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        with self._errors_as_backend_errors():
+            values = self.client.mget([self._key(namespace, key) for key in keys])
+            found = {key: value for key, value in zip(keys, values) if value is not None}
+            if found:
+                # Only namespaces with a size budget are indexed; XX leaves the others alone
+                now = time.time()
+                self.client.zadd(self._index_keys(namespace)[1], {key: now for key in found}, xx=True)
+        return found
+    
+    def put_many(
+        self,
+        namespace: str,
+        items: Iterable[Tuple[str, bytes]],
+        ttl: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ) -> None:
+        items = dict(items)
+        if not items:
+            return
+        expire = max(1, math.ceil(ttl)) if ttl is not None else None
+        with self._errors_as_backend_errors():
+            if max_bytes is None:
+                pipeline = self.client.pipeline(transaction=False)
+                for key, value in items.items():
+                    pipeline.set(self._key(namespace, key), value, ex=expire)
+                pipeline.execute()
+                return
+            
+            sizes_key, lru_key, total_key = self._index_keys(namespace)
+            old_sizes = self.client.hmget(sizes_key, list(items))
+            now = time.time()
+            pipeline = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipeline.set(self._key(namespace, key), value, ex=expire)
+            pipeline.hset(sizes_key, mapping={key: len(value) for key, value in items.items()})
+            pipeline.zadd(lru_key, {key: now for key in items})
+            pipeline.incrby(total_key, sum(len(value) for value in items.values()) -
+                            sum(int(size) for size in old_sizes if size is not None))
+            total = pipeline.execute()[-1]
+            if total > max_bytes:
+                self._evict(namespace, total, max_bytes)
+    
+    def _evict(self, namespace: str, total: int, max_bytes: int) -> None:
+        """Delete least recently used values of an indexed namespace until it fits max_bytes"""
+        sizes_key, lru_key, total_key = self._index_keys(namespace)
+        while total > max_bytes:
+            keys = [key.decode('utf-8') for key in self.client.zrange(lru_key, 0, self._EVICT_BATCH - 1)]
+            if not keys:
+                return
+            evicted = []
+            freed = 0
+            for key, size in zip(keys, self.client.hmget(sizes_key, keys)):
+                if total - freed <= max_bytes:
+                    break
+                evicted.append(key)
+                freed += int(size or 0)
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.delete(*[self._key(namespace, key) for key in evicted])
+            pipeline.hdel(sizes_key, *evicted)
+            pipeline.zrem(lru_key, *evicted)
+            pipeline.incrby(total_key, -freed)
+            total = pipeline.execute()[-1]
+    
+    def delete(self, namespace: str, key: str) -> None:
+        sizes_key, lru_key, total_key = self._index_keys(namespace)
+        with self._errors_as_backend_errors():
+            size = self.client.hget(sizes_key, key)
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.delete(self._key(namespace, key))
+            if size is not None:
+                pipeline.hdel(sizes_key, key)
+                pipeline.zrem(lru_key, key)
+                pipeline.incrby(total_key, -int(size))
+            pipeline.execute()
+    
+    def incr(self, namespace: str, name: str, amount: int = 1) -> int:
+        with self._errors_as_backend_errors():
+            return self.client.hincrby(f'{self.prefix}counters:{namespace}', name, amount)
+    
+    def counters(self, namespace: str) -> Dict[str, int]:
+        with self._errors_as_backend_errors():
+            counters = self.client.hgetall(f'{self.prefix}counters:{namespace}')
+        return {name.decode('utf-8'): int(value) for name, value in counters.items()}
+    
+    def usage(self, namespace: str) -> Optional[Tuple[int, int]]:
+        """Entries and bytes of a namespace written with a size budget (None for others)"""
+        sizes_key, _, total_key = self._index_keys(namespace)
+        with self._errors_as_backend_errors():
+            entries, total = self.client.hlen(sizes_key), self.client.get(total_key)
+        return (entries, int(total or 0)) if entries else None
+
+
+def create_backend(kind: Optional[str] = None) -> StateBackend:
+    """
+    Create a state backend
+    
+    Args:
+        kind: 'sqlite' or 'redis' (defaults to Config.STATE_BACKEND)
+    """
+    kind = kind or Config.STATE_BACKEND
+    if kind == 'sqlite':
+        return SQLiteBackend()
+    if kind == 'redis':
+        return RedisBackend()
+    raise ValueError(f"Unknown state backend: {kind}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend() -> StateBackend:
+    """Return the process-wide state backend"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+    return _backend
@@ -0,0 +1,229 @@
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Optional, Dict, List, Tuple
+import numpy as np
+from config import Config
+from utils.token_budget import count_tokens
+
+
+_WORD = re.compile(r'\w+')
+# A trailing page number: "page 3", "p. 3 of 9", "3/9", "- 3 -", "| 3", or a
+# line that is only a number. A number after a plain word ("Article 3",
+# "Section 12") is part of the line's text, not a page number
+_PAGE_NUMBER = re.compile(
+    r'(?:(?:^|\bpage |\bpg\.? |\bp\. )\d+(?: ?(?:of|/) ?\d+)?'
+    r'|\b\d+ ?(?:of|/) ?\d+'
+    r'|(?:^|[|·•–—-] ?)[-–—]? ?\d+(?: ?[-–—])?)$'
+)
+
+# MinHash parameters: 64 hash functions in 16 LSH bands of 4 rows
+_MINHASH_PERMUTATIONS = 64
+_LSH_BANDS = 16
+_MERSENNE_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32, so a*x + b fits in uint64
+_rng = np.random.default_rng(1)
+_HASH_A = _rng.integers(1, 2 ** 32, _MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, 2 ** 32, _MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+SHINGLE_WORDS = 5  # Words per shingle for near-duplicate detection
+UNIT_MAX_WORDS = 120  # Paragraph-less text is grouped into units of about this many words
+TFIDF_DIMENSIONS = 2048  # Hashed vocabulary size for TF-IDF vectors
+TEXTRANK_MAX_UNITS = 2000  # Above this, units are scored by centroid similarity instead
+
+
+def _normalize_line(line: str) -> str:
+    """Lines that differ only in a trailing page number count as repeats of each other"""
+    normalized = ' '.join(line.lower().split())
+    match = _PAGE_NUMBER.search(normalized)
+    return normalized[:match.start()] + '#' if match else normalized
+
+
+def strip_repeated_lines(lines: List[str]) -> Tuple[List[str], int]:
+    """
+    Remove running headers and footers
+    
+    A line is treated as one when it is short, repeats at least
+    Config.HEADER_MIN_REPEATS times (ignoring a trailing page number, so
+    "Page 3 of 9" matches "Page 4 of 9", but "Article 3" does not match
+    "Article 4") and never repeats within
+    Config.HEADER_MIN_GAP_LINES lines, the way a page header does; table
+    cells and list items that repeat back to back are kept.
+    
+    Returns:
+        (remaining lines, number of lines removed)
+    """
+    positions = defaultdict(list)
+    for index, line in enumerate(lines):
+        normalized = _normalize_line(line)
+        if normalized and len(normalized.split()) <= Config.HEADER_MAX_WORDS:
+            positions[normalized].append(index)
+    
+    repeated = set()
+    for indexes in positions.values():
+        if len(indexes) >= Config.HEADER_MIN_REPEATS:
+            if min(b - a for a, b in zip(indexes, indexes[1:])) >= Config.HEADER_MIN_GAP_LINES:
+                repeated.update(indexes)
+    
+    return [line for index, line in enumerate(lines) if index not in repeated], len(repeated)
+
+
+def split_units(lines: List[str]) -> List[str]:
+    """
+    Group lines into paragraphs: at blank lines, or every UNIT_MAX_WORDS
+    words for PDF text that has none
+    """
+    units = []
+    current = []
+    words = 0
+    for line in lines:
+        if not line.strip():
+            if current:
+                units.append('\n'.join(current))
+                current, words = [], 0
+            continue
+        current.append(line)
+        words += len(line.split())
+        if words >= UNIT_MAX_WORDS:
+            units.append('\n'.join(current))
+            current, words = [], 0
+    if current:
+        units.append('\n'.join(current))
+    return units
+
+
+def minhash_signatures(units: List[str]) -> np.ndarray:
+    """MinHash signature per unit over word shingles, shape (units, _MINHASH_PERMUTATIONS)"""
+    signatures = np.empty((len(units), _MINHASH_PERMUTATIONS), dtype=np.uint64)
+    for row, unit in enumerate(units):
+        words = [word.lower() for word in _WORD.findall(unit)]
+        shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # All permutations at once: (shingles, 1) against (permutations,)
+        signatures[row] = ((hashes[:, None] * _HASH_A + _HASH_B) % _MERSENNE_PRIME).min(axis=0)
+    return signatures
+
+
+def find_duplicates(units: List[str], threshold: Optional[float] = None) -> List[int]:
+    """
+    Indexes of units that nearly duplicate an earlier unit
+    
+    Candidate pairs come from locality-sensitive hashing of the MinHash
+    bands, then are confirmed by their estimated Jaccard similarity.
+    """
+    threshold = threshold if threshold is not None else Config.DEDUP_THRESHOLD
+    if len(units) < 2:
+        return []
+    signatures = minhash_signatures(units)
+    rows = _MINHASH_PERMUTATIONS // _LSH_BANDS
+    
+    duplicates = set()
+    for band in range(_LSH_BANDS):
+        buckets = defaultdict(list)
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        for index in range(len(units)):
+            if index not in duplicates:
+                buckets[band_values[index].tobytes()].append(index)
+        for members in buckets.values():
+            for position, index in enumerate(members[1:], start=1):
+                earlier = np.array(members[:position])
+                similarity = (signatures[earlier] == signatures[index]).mean(axis=1)
+                if similarity.max() >= threshold:
+                    duplicates.add(index)
+    return sorted(duplicates)
+
+
+def tfidf_matrix(units: List[str]) -> np.ndarray:
+    """L2-normalized TF-IDF vectors over a hashed vocabulary, shape (units, TFIDF_DIMENSIONS)"""
+    counts = np.zeros((len(units), TFIDF_DIMENSIONS), dtype=np.float32)
+    for row, unit in enumerate(units):
+        for word, count in Counter(word.lower() for word in _WORD.findall(unit)).items():
+            counts[row, zlib.crc32(word.encode('utf-8')) % TFIDF_DIMENSIONS] += count
+    
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(units)) / (1 + document_frequency)) + 1
+    vectors = np.log1p(counts) * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def score_units(units: List[str], damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    """
+    Centrality of each unit within the document
+    
+    TextRank (PageRank over the cosine-similarity graph) for up to
+    TEXTRANK_MAX_UNITS units; beyond that the n-by-n similarity matrix gets
+    large, so units are scored by similarity to the document centroid.
+    """
+    vectors = tfidf_matrix(units)
+    if len(units) > TEXTRANK_MAX_UNITS:
+        centroid = vectors.mean(axis=0)
+        return vectors @ centroid
+    
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    transition = similarity / np.where(out_weight == 0, 1, out_weight)
+    scores = np.full(len(units), 1 / len(units), dtype=np.float32)
+    for _ in range(iterations):
+        scores = (1 - damping) / len(units) + damping * (transition.T @ scores)
+    return scores
+
+
+def select_units(units: List[str], target_tokens: int) -> List[int]:
+    """
+    Indexes of the most central units within target_tokens, in document order
+    
+    The first unit (title, parties, abstract) is always kept.
+    """
+    scores = score_units(units)
+    tokens = np.array([count_tokens(unit) for unit in units])
+    chosen = [0]
+    used = tokens[0]
+    for index in np.argsort(-scores):
+        if index != 0 and used + tokens[index] <= target_tokens:
+            chosen.append(int(index))
+            used += tokens[index]
+    return sorted(chosen)
+
+
+def compress_text(text: str, ratio: Optional[float] = None) -> Tuple[str, Dict]:
+    """
+    Shrink a document before summarization, locally and without the API
+    
+    Removes running headers and footers and near-duplicate paragraphs,
+    then, if ratio is set, keeps the most central paragraphs (TextRank over
+    TF-IDF vectors) until about that share of the tokens remains.
+    
+    Args:
+        text: Document text
+        ratio: Share of tokens to keep with extractive selection, e.g. 0.5
+            (defaults to Config.COMPRESSION_RATIO; 0 or None skips selection)
+    
+    Returns:
+        (compressed text, stats) where stats has 'original_tokens',
+        'compressed_tokens', 'boilerplate_lines', 'duplicate_paragraphs'
+        and 'selected_paragraphs' (None when selection was skipped)
+    """
+    ratio = ratio if ratio is not None else Config.COMPRESSION_RATIO
+    original_tokens = count_tokens(text)
+    
+    lines, boilerplate_lines = strip_repeated_lines(text.split('\n'))
+    units = split_units(lines)
+    duplicates = set(find_duplicates(units))
+    units = [unit for index, unit in enumerate(units) if index not in duplicates]
+    
+    selected = None
+    if ratio and 0 < ratio < 1 and len(units) > 1:
+        keep = select_units(units, int(original_tokens * ratio))
+        selected = len(keep)
+        units = [units[index] for index in keep]
+    
+    compressed = '\n\n'.join(units)
+    return compressed, {
+        'original_tokens': original_tokens,
+        'compressed_tokens': count_tokens(compressed),
+        'boilerplate_lines': boilerplate_lines,
+        'duplicate_paragraphs': len(duplicates),
+        'selected_paragraphs': selected
+    }
@@ -0,0 +1,239 @@
+import re
+import math
+import threading
+from collections import Counter
+from typing import Optional, Dict, List, Tuple
+from config import Config
+
+
+# Marks where text was left out of a fitted prompt
+OMISSION_MARKER = "\n\n[...]\n\n"
+
+# Fitting policies for text over the prompt budget
+INPUT_POLICIES = ('reject', 'truncate', 'salient')
+
+# Role and formatting tokens added per chat message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_WORD = re.compile(r'\w{3,}')
+
+
+class TokenBudgetError(ValueError):
+    """Raised when a request cannot fit the model's context or the prompt budget"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate the token count of text.
+    ASCII text averages about 4 characters per token; other scripts
+    (e.g. Khmer) are counted at roughly one token per character.
+    """
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def get_encoding():
+    """
+    Return the tiktoken encoding for Config.AI_MODEL, or None
+    
+    tiktoken is optional: without it (or without its encoding files, which
+    are downloaded on first use) token counts fall back to estimate_tokens().
+    """
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            _encoding_loaded = True
+            try:
+                import tiktoken
+                try:
+                    _encoding = tiktoken.encoding_for_model(Config.AI_MODEL)
+                except KeyError:
+                    _encoding = tiktoken.get_encoding(Config.TOKENIZER_ENCODING)
+            except Exception:
+                _encoding = None
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with the model's tokenizer when available, else estimate them"""
+    encoding = get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """Count the prompt tokens of a chat request"""
+    return sum(count_tokens(message['content']) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def prompt_budget(max_tokens: int, reserved_tokens: int = 0) -> int:
+    """
+    Tokens of document text a single request may carry
+    
+    The model's context must hold the prompt and max_tokens of output;
+    Config.MAX_PROMPT_TOKENS additionally caps spend per request.
+    
+    Args:
+        max_tokens: Response length requested
+        reserved_tokens: Prompt tokens used by instructions and the system message
+    """
+    return min(Config.MODEL_CONTEXT_TOKENS - max_tokens, Config.MAX_PROMPT_TOKENS) - reserved_tokens
+
+
+def check_request(messages: List[Dict], max_tokens: int) -> int:
+    """
+    Count a request's prompt tokens and fail fast if it cannot fit the context window
+    
+    Returns:
+        Prompt token count
+    """
+    prompt_tokens = count_message_tokens(messages)
+    if prompt_tokens + max_tokens > Config.MODEL_CONTEXT_TOKENS:
+        raise TokenBudgetError(
+            f"Request needs {prompt_tokens:,} prompt + {max_tokens:,} response tokens, "
+            f"over the {Config.MODEL_CONTEXT_TOKENS:,}-token context of {Config.AI_MODEL}"
+        )
+    return prompt_tokens
+
+
+def _take_tokens(text: str, count: int, from_end: bool = False) -> str:
+    """Return the first (or last) count tokens of text"""
+    encoding = get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[-count:] if from_end else tokens[:count]) if count > 0 else ''
+    
+    # Without a tokenizer, cut proportionally to the estimated tokens per character
+    chars = int(len(text) * count / max(1, estimate_tokens(text)))
+    return text[len(text) - chars:] if from_end else text[:chars]
+
+
+def truncate_head_tail(text: str, budget: int, head_share: float = 0.7) -> str:
+    """Keep the beginning and end of text within budget tokens, dropping the middle"""
+    text_budget = budget - count_tokens(OMISSION_MARKER)
+    head = _take_tokens(text, int(text_budget * head_share))
+    tail_tokens = text_budget - count_tokens(head)
+    while True:
+        tail = _take_tokens(text, tail_tokens, from_end=True)
+        fitted = head.rstrip() + OMISSION_MARKER + tail.lstrip()
+        # Tokens can merge differently across the joins; give up tail tokens until it fits
+        excess = count_tokens(fitted) - budget
+        if excess <= 0 or tail_tokens <= 0:
+            return fitted
+        tail_tokens -= excess
+
+
+def _split_sections(text: str, section_tokens: int) -> List[str]:
+    """Split text on paragraph boundaries into sections of about section_tokens"""
+    sections = []
+    current = []
+    current_tokens = 0
+    for paragraph in text.split('\n'):
+        paragraph_tokens = estimate_tokens(paragraph)
+        if current and current_tokens + paragraph_tokens > section_tokens:
+            sections.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+    if current:
+        sections.append('\n'.join(current))
+    return [section for section in sections if section.strip()]
+
+
+def select_salient_sections(text: str, budget: int, section_tokens: int = 400) -> str:
+    """
+    Keep the sections that best represent the document, within budget tokens
+    
+    Sections are scored by how many of the document's frequent terms they
+    contain (a TF-IDF-like centrality score), and the opening section is
+    always kept for context. Chosen sections stay in document order, with
+    omission markers where text was dropped.
+    """
+    sections = _split_sections(text, section_tokens)
+    section_words = [Counter(word.lower() for word in _WORD.findall(section)) for section in sections]
+    document_frequency = Counter()
+    for words in section_words:
+        document_frequency.update(words.keys())
+    
+    section_count = len(sections)
+    
+    def score(index: int) -> float:
+        words = section_words[index]
+        if not words:
+            return 0.0
+        # Terms spread across the document matter; ubiquitous boilerplate does not
+        weight = sum(math.log1p(document_frequency[word]) * math.log(1 + section_count / document_frequency[word])
+                     for word in words)
+        return weight / math.sqrt(sum(words.values()))
+    
+    ranked = sorted(range(1, section_count), key=score, reverse=True)
+    marker_tokens = count_tokens(OMISSION_MARKER)
+    chosen = []
+    used = 0
+    for index in [0] + ranked:
+        tokens = count_tokens(sections[index]) + marker_tokens
+        if used + tokens > budget:
+            continue
+        chosen.append(index)
+        used += tokens
+    
+    if not chosen:
+        return truncate_head_tail(text, budget)
+    
+    parts = []
+    previous = -1
+    for index in sorted(chosen):
+        if index != previous + 1 and parts:
+            parts.append(OMISSION_MARKER.strip())
+        parts.append(sections[index])
+        previous = index
+    if previous != section_count - 1:
+        parts.append(OMISSION_MARKER.strip())
+    return '\n\n'.join(parts)
+
+
+def fit_text(text: str, budget: int, policy: Optional[str] = None) -> Tuple[str, Dict]:
+    """
+    Fit document text into a prompt budget
+    
+    Args:
+        text: Document text
+        budget: Maximum tokens of text (see prompt_budget())
+        policy: 'reject', 'truncate' (keep head and tail) or 'salient'
+            (keep the most representative sections); defaults to Config.INPUT_POLICY
+    
+    Returns:
+        (text to send, info) where info has 'input_tokens', 'sent_tokens'
+        and 'policy' (None when the text fit unchanged)
+    
+    Raises:
+        TokenBudgetError: If the text is over budget and the policy is 'reject'
+    """
+    policy = policy or Config.INPUT_POLICY
+    if policy not in INPUT_POLICIES:
+        raise ValueError(f"Unknown input policy: {policy}")
+    
+    input_tokens = count_tokens(text)
+    if input_tokens <= budget:
+        return text, {'input_tokens': input_tokens, 'sent_tokens': input_tokens, 'policy': None}
+    
+    if policy == 'reject':
+        raise TokenBudgetError(
+            f"Document is {input_tokens:,} tokens, over the {budget:,}-token prompt budget"
+        )
+    if policy == 'truncate':
+        fitted = truncate_head_tail(text, budget)
+    else:
+        fitted = select_salient_sections(text, budget)
+    return fitted, {'input_tokens': input_tokens, 'sent_tokens': count_tokens(fitted), 'policy': policy}
+
+
+def price_tokens(input_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of a number of prompt and response tokens for Config.AI_MODEL"""
+    return (input_tokens * Config.MODEL_INPUT_PRICE_PER_1M + output_tokens * Config.MODEL_OUTPUT_PRICE_PER_1M) / 1_000_000
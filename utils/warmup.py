@@ -0,0 +1,66 @@
+import time
+import importlib
+import threading
+from typing import Optional, Dict, Iterable
+from config import Config
+from utils import metrics
+
+
+# Libraries imported on first use, slowest first: they make up most of a cold
+# start, so the app imports them in the background once it is serving
+CONVERSION_MODULES = ('pdf2docx', 'utils.docx_merge')
+HEAVY_MODULES = ('openai',) + CONVERSION_MODULES + ('pypdf', 'pdfplumber', 'httpx', 'utils.text_compressor')
+
+
+def preload(modules: Iterable[str] = HEAVY_MODULES) -> Dict[str, Optional[float]]:
+    """
+    Import modules that are not loaded yet
+    
+    Args:
+        modules: Module names
+    
+    Returns:
+        Seconds spent importing each module (0 if it was already loaded,
+        None if it is not installed)
+    """
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            timings[name] = None
+            continue
+        timings[name] = round(time.perf_counter() - start, 4)
+        metrics.observe('module_import_seconds', timings[name], module=name)
+    return timings
+
+
+_warmup = None
+_warmup_lock = threading.Lock()
+
+
+def start_warmup(conversion_pool: Optional[bool] = None) -> None:
+    """
+    Preload HEAVY_MODULES in a daemon thread; a no-op if already started
+    
+    Args:
+        conversion_pool: Then start the conversion worker processes too, so
+            they are forked with the libraries loaded (defaults to
+            Config.WARM_CONVERSION_POOL)
+    """
+    global _warmup
+    conversion_pool = Config.WARM_CONVERSION_POOL if conversion_pool is None else conversion_pool
+    with _warmup_lock:
+        if _warmup is not None:
+            return
+        
+        def run():
+            preload()
+            if conversion_pool:
+                from utils.conversion_jobs import get_job_manager
+                
+                get_job_manager().prewarm()
+        
+        _warmup = threading.Thread(target=run, name='warmup', daemon=True)
+        _warmup.start()